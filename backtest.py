@@ -0,0 +1,367 @@
+"""
+Walk-forward backtesting for the XAUUSD random forest.
+
+``predors`` and ``backtestor`` are the notebook's functions, unchanged, so scripts can import
+them instead of copying cells. ``parallel_backtestor`` runs the same walk-forward folds on a
+process pool: the feature matrix and target are placed once in shared memory and every worker
+maps them, so nothing but fold bounds and predictions cross process boundaries. For a fixed
+``random_state`` it returns exactly the same frame as ``backtestor``.
+
+``sliding_window_backtestor`` and ``warm_start_backtestor`` are cheaper alternatives to the
+full refit per fold; ``compare_walk_forward_modes`` reports their precision next to it.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import precision_score
+
+TARGET = "<TRGT>"
+
+
+def predors(train, test, predictors, model):
+    model.fit(train[predictors], train["<TRGT>"])
+    prcsn = model.predict(test[predictors])
+    prcsn = pd.Series(prcsn, index = test.index, name = "Predictions")
+    cmbnd = pd.concat([test["<TRGT>"], prcsn], axis = 1)
+    return cmbnd
+
+
+def backtestor(data, model, predictors, start = 2500, step = 250):
+    all_predictions = []
+
+    for i in range(start, data.shape[0], step):
+        train = data.iloc[0:i].copy()
+        test = data.iloc[i:(i + step)].copy()
+        predictions = predors(train, test, predictors, model)
+        all_predictions.append(predictions)
+    return pd.concat(all_predictions)
+
+
+def fold_bounds(n_rows: int, start: int = 2500, step: int = 250) -> list:
+    """Return ``(train_end, test_end)`` for each walk-forward fold, as ``backtestor`` iterates them."""
+    return [(i, min(i + step, n_rows)) for i in range(start, n_rows, step)]
+
+
+def predict_labels(model, X: np.ndarray, threshold: float = None) -> np.ndarray:
+    """
+    Class predictions, optionally thresholding the class-1 probability.
+
+    With ``threshold=None`` this is ``model.predict``; otherwise a row is 1 when
+    ``predict_proba(X)[:, 1] >= threshold`` (the notebook's ``predict`` rule with 0.6).
+    """
+    if threshold is None:
+        return model.predict(X)
+    return (model.predict_proba(X)[:, 1] >= threshold).astype(np.int64)
+
+
+# -----------------------------------------------------------------------------------------
+#  Shared-memory worker side
+# -----------------------------------------------------------------------------------------
+
+_worker = {}
+
+
+def attach_shared(spec: dict) -> None:
+    """Pool initializer: map the shared feature matrix and target into this worker."""
+    for name, (shm_name, shape, dtype) in spec["arrays"].items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _worker[name + "_shm"] = shm
+        _worker[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    _worker["model"] = spec["model"]
+    _worker["threshold"] = spec["threshold"]
+
+
+def worker_state() -> dict:
+    """Arrays (by name), ``model`` and ``threshold`` attached in this worker by :func:`attach_shared`."""
+    return _worker
+
+
+def _run_fold(bounds: tuple) -> tuple:
+    """Fit a fresh clone of the model on rows ``[0, train_end)`` and predict the test rows."""
+    train_end, test_end = bounds
+    X, y = _worker["X"], _worker["y"]
+
+    model = clone(_worker["model"])
+    model.fit(X[:train_end], y[:train_end])
+    return train_end, predict_labels(model, X[train_end:test_end], _worker["threshold"])
+
+
+class SharedArrays:
+    """
+    Context manager that copies arrays into named shared-memory blocks.
+
+    ``spec`` describes the blocks so pool initializers can attach to them by name; the blocks
+    are unlinked on exit.
+    """
+
+    def __init__(self, **arrays):
+        self.arrays = arrays
+        self.blocks = []
+        self.spec = {}
+
+    def __enter__(self):
+        for name, values in self.arrays.items():
+            values = np.ascontiguousarray(values)
+            shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)[...] = values
+            self.blocks.append(shm)
+            self.spec[name] = (shm.name, values.shape, values.dtype.str)
+        return self
+
+    def __exit__(self, *exc):
+        for shm in self.blocks:
+            shm.close()
+            shm.unlink()
+        self.blocks = []
+
+
+def parallel_backtestor(data, model, predictors, start=2500, step=250, n_jobs=None, threshold=None):
+    """
+    Process-parallel ``backtestor``.
+
+    Folds are dispatched largest-first (later folds train on more rows) so the pool stays
+    busy until the end, and each worker fits with ``n_jobs=1`` to avoid oversubscribing cores.
+
+    Args:
+        data (pd.DataFrame): Frame with the predictor columns and ``<TRGT>``.
+        model: Unfitted sklearn classifier; cloned per fold.
+        predictors (list): Feature columns, in model input order.
+        start (int): First training size.
+        step (int): Test rows per fold.
+        n_jobs (int): Worker processes (default: all cores).
+        threshold (float): Optional class-1 probability threshold (see :func:`predict_labels`).
+
+    Returns:
+        pd.DataFrame: ``<TRGT>`` and ``Predictions`` for every test row, as ``backtestor``.
+    """
+    X = np.ascontiguousarray(data[predictors].to_numpy(dtype=np.float32))
+    y = data[TARGET].to_numpy()
+    folds = fold_bounds(len(data), start, step)
+    if not folds:
+        raise ValueError(f"Not enough rows ({len(data)}) for a walk-forward starting at {start}")
+
+    fold_model = clone(model)
+    if "n_jobs" in fold_model.get_params():
+        fold_model.set_params(n_jobs=1)
+
+    n_jobs = n_jobs or os.cpu_count() or 1
+    results = {}
+    with SharedArrays(X=X, y=y) as shared:
+        spec = {"arrays": shared.spec, "model": fold_model, "threshold": threshold}
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(folds)),
+                                 initializer=attach_shared, initargs=(spec,)) as pool:
+            for train_end, labels in pool.map(_run_fold, sorted(folds, reverse=True)):
+                results[train_end] = labels
+
+    predictions = np.concatenate([results[train_end] for train_end, _ in folds])
+    tested = data.iloc[start:]
+    return pd.concat([tested[TARGET],
+                      pd.Series(predictions.astype(y.dtype), index=tested.index, name="Predictions")], axis=1)
+
+
+# -----------------------------------------------------------------------------------------
+#  Incremental walk-forward modes
+# -----------------------------------------------------------------------------------------
+
+def sliding_window_backtestor(data, model, predictors, window=10000, start=2500, step=250, threshold=None):
+    """
+    Walk-forward with a fixed-size training window.
+
+    Each fold trains on at most the ``window`` rows before it instead of the whole history,
+    so per-fold cost is bounded and total cost grows linearly with history length.
+
+    Returns:
+        pd.DataFrame: ``<TRGT>`` and ``Predictions``, as ``backtestor``.
+    """
+    X = np.ascontiguousarray(data[predictors].to_numpy(dtype=np.float32))
+    y = data[TARGET].to_numpy()
+
+    predictions = []
+    for train_end, test_end in fold_bounds(len(data), start, step):
+        train_start = max(0, train_end - window)
+        fold_model = clone(model)
+        fold_model.fit(X[train_start:train_end], y[train_start:train_end])
+        predictions.append(predict_labels(fold_model, X[train_end:test_end], threshold))
+
+    tested = data.iloc[start:]
+    return pd.concat([tested[TARGET], pd.Series(np.concatenate(predictions).astype(y.dtype),
+                                                index=tested.index, name="Predictions")], axis=1)
+
+
+class AgingForest:
+    """
+    Ensemble that grows by whole batches of trees and evicts the oldest ones.
+
+    Every call to :meth:`grow` fits ``trees_per_fold`` new trees (a clone of ``model`` with that
+    many estimators) on the given rows and appends them; once more than ``max_trees`` are held,
+    the oldest are dropped. Probabilities are the (optionally age-decayed) mean of the trees'
+    probabilities, the same averaging ``RandomForestClassifier.predict_proba`` does.
+    """
+
+    def __init__(self, model, trees_per_fold=20, max_trees=200, decay=1.0):
+        self.model = model
+        self.trees_per_fold = trees_per_fold
+        self.max_trees = max_trees
+        self.decay = decay
+        self.generation = 0
+        self.trees = []         # (generation, classes, tree)
+
+    def grow(self, X, y) -> "AgingForest":
+        forest = clone(self.model).set_params(n_estimators=self.trees_per_fold)
+        forest.fit(X, y)
+        classes = np.searchsorted([0, 1], forest.classes_)
+        self.trees.extend((self.generation, classes, tree) for tree in forest.estimators_)
+        self.generation += 1
+        if len(self.trees) > self.max_trees:
+            self.trees = self.trees[-self.max_trees:]
+        return self
+
+    def predict_proba(self, X) -> np.ndarray:
+        proba = np.zeros((len(X), 2), dtype=np.float64)
+        total = 0.0
+        for generation, classes, tree in self.trees:
+            weight = self.decay ** (self.generation - 1 - generation)
+            proba[:, classes] += weight * tree.predict_proba(X)
+            total += weight
+        return proba / total
+
+    def predict(self, X) -> np.ndarray:
+        return (self.predict_proba(X)[:, 1] > 0.5).astype(np.int64)
+
+
+def warm_start_backtestor(data, model, predictors, start=2500, step=250, trees_per_fold=20,
+                          max_trees=200, fit_window=None, decay=1.0, threshold=None):
+    """
+    Walk-forward where each fold adds trees instead of refitting the forest.
+
+    The first fold fits ``trees_per_fold`` trees on the initial ``start`` rows; every later fold
+    fits ``trees_per_fold`` more trees on the bars that became available since the previous
+    fold (or on the last ``fit_window`` bars, if given) and evicts the oldest trees beyond
+    ``max_trees`` (see :class:`AgingForest`).
+
+    Returns:
+        pd.DataFrame: ``<TRGT>`` and ``Predictions``, as ``backtestor``.
+    """
+    X = np.ascontiguousarray(data[predictors].to_numpy(dtype=np.float32))
+    y = data[TARGET].to_numpy()
+
+    forest = AgingForest(model, trees_per_fold=trees_per_fold, max_trees=max_trees, decay=decay)
+    predictions = []
+    fitted_end = 0
+    for train_end, test_end in fold_bounds(len(data), start, step):
+        fit_start = fitted_end if fit_window is None else max(0, train_end - fit_window)
+        forest.grow(X[fit_start:train_end], y[fit_start:train_end])
+        fitted_end = train_end
+
+        if threshold is None:
+            labels = forest.predict(X[train_end:test_end])
+        else:
+            labels = (forest.predict_proba(X[train_end:test_end])[:, 1] >= threshold).astype(np.int64)
+        predictions.append(labels)
+
+    tested = data.iloc[start:]
+    return pd.concat([tested[TARGET], pd.Series(np.concatenate(predictions).astype(y.dtype),
+                                                index=tested.index, name="Predictions")], axis=1)
+
+
+def compare_walk_forward_modes(data, model, predictors, start=2500, step=250, window=10000,
+                               trees_per_fold=20, max_trees=200, fit_window=None) -> pd.DataFrame:
+    """
+    Run full-refit, sliding-window and warm-start walk-forwards side by side.
+
+    Returns:
+        pd.DataFrame: Precision, wall time and rows fed to ``fit`` (summed over folds) per mode.
+    """
+    folds = fold_bounds(len(data), start, step)
+    modes = [
+        ("full_refit", lambda: backtestor(data, clone(model), predictors, start, step),
+         sum(train_end for train_end, _ in folds)),
+        (f"sliding_window_{window}",
+         lambda: sliding_window_backtestor(data, model, predictors, window, start, step),
+         sum(min(window, train_end) for train_end, _ in folds)),
+        (f"warm_start_{trees_per_fold}x{max_trees}",
+         lambda: warm_start_backtestor(data, model, predictors, start, step, trees_per_fold, max_trees, fit_window),
+         start + (len(folds) - 1) * step if fit_window is None
+         else sum(min(fit_window, train_end) for train_end, _ in folds)),
+    ]
+
+    rows = []
+    for name, run, fitted_rows in modes:
+        started = time.perf_counter()
+        result = run()
+        rows.append({"mode": name,
+                     "precision": precision_score(result[TARGET], result["Predictions"], zero_division=0),
+                     "seconds": time.perf_counter() - started,
+                     "fitted_rows": fitted_rows})
+
+    report = pd.DataFrame(rows)
+    report["speedup"] = report["seconds"].iloc[0] / report["seconds"]
+    return report
+
+
+def benchmark(data, model, predictors, jobs=(1, 2, 4, 8, 16, 32), start=2500, step=250, sequential=True) -> pd.DataFrame:
+    """
+    Time ``backtestor`` and ``parallel_backtestor`` at several worker counts.
+
+    Returns:
+        pd.DataFrame: One row per run with seconds, speedup over the sequential loop,
+        precision and whether the predictions match ``backtestor`` exactly.
+    """
+    rows = []
+    reference = None
+    if sequential:
+        started = time.perf_counter()
+        reference = backtestor(data, clone(model), predictors, start, step)
+        seconds = time.perf_counter() - started
+        rows.append({"engine": "backtestor", "n_jobs": 1, "seconds": seconds,
+                     "precision": precision_score(reference[TARGET], reference["Predictions"]),
+                     "identical": True})
+
+    for n_jobs in jobs:
+        if n_jobs > (os.cpu_count() or 1):
+            continue
+        started = time.perf_counter()
+        result = parallel_backtestor(data, model, predictors, start, step, n_jobs=n_jobs)
+        seconds = time.perf_counter() - started
+        rows.append({"engine": "parallel_backtestor", "n_jobs": n_jobs, "seconds": seconds,
+                     "precision": precision_score(result[TARGET], result["Predictions"]),
+                     "identical": None if reference is None else bool(result.equals(reference))})
+
+    report = pd.DataFrame(rows)
+    report["speedup"] = report["seconds"].iloc[0] / report["seconds"]
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from sklearn.ensemble import RandomForestClassifier
+
+    from bar_store import load_bars
+    from feature_engine import FEATURE_NAMES, feature_frame
+
+    parser = argparse.ArgumentParser(description="Walk-forward backtest scaling benchmark")
+    parser.add_argument("path", nargs="?", default="XAUUSDm_H1_201801020600_202412310000.csv",
+                        help="MT5 CSV export or bar store directory")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--skip-sequential", action="store_true", help="Do not run the notebook loop")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Compare full-refit, sliding-window and warm-start modes instead")
+    args = parser.parse_args()
+
+    data = feature_frame(load_bars(args.path))
+    model = RandomForestClassifier(n_estimators=100, min_samples_split=50, random_state=1,
+                                   max_depth=15, min_samples_leaf=20)
+
+    print(f"🔄 Walk-forward on {len(data):,} rows, {len(fold_bounds(len(data)))} folds")
+    if args.incremental:
+        print(compare_walk_forward_modes(data, model, FEATURE_NAMES).to_string(index=False))
+        raise SystemExit(0)
+    report = benchmark(data, model, FEATURE_NAMES, jobs=args.jobs, sequential=not args.skip_sequential)
+    print(report.to_string(index=False))
@@ -0,0 +1,393 @@
+"""
+Binary columnar bar store for MT5 price history.
+
+An MT5 export (tab-delimited ``<DATE> <TIME> <OPEN> ... <SPREAD>``) is converted once into a
+directory of raw little-endian column files plus a small ``meta.json``:
+
+    XAUUSDm_H1/
+        meta.json       # row count, column dtypes, symbol/timeframe labels
+        time.i64        # bar open time, int64 epoch seconds (UTC as exported by MT5)
+        open.f32        # float32 prices
+        high.f32
+        low.f32
+        close.f32
+        tickvol.i64     # tick volume
+
+Columns are memory-mapped on load, so opening a multi-year M1 history costs milliseconds and
+only the pages actually touched are read from disk. New bars are appended to the end of each
+column file; ``meta.json`` is replaced atomically afterwards, so a reader never sees a row that
+was only partly written.
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+# Column name -> numpy dtype. Only what the features and the EA logic actually use.
+COLUMNS = {
+    "time": np.dtype("<i8"),
+    "open": np.dtype("<f4"),
+    "high": np.dtype("<f4"),
+    "low": np.dtype("<f4"),
+    "close": np.dtype("<f4"),
+    "tickvol": np.dtype("<i8"),
+}
+
+# MT5 export header -> store column
+MT5_COLUMNS = {
+    "<OPEN>": "open",
+    "<HIGH>": "high",
+    "<LOW>": "low",
+    "<CLOSE>": "close",
+    "<TICKVOL>": "tickvol",
+}
+
+META_FILE = "meta.json"
+STORE_VERSION = 1
+
+
+def _column_path(store_dir: str, name: str) -> str:
+    suffix = "i64" if COLUMNS[name].kind == "i" else "f32"
+    return os.path.join(store_dir, f"{name}.{suffix}")
+
+
+def to_epoch_seconds(value) -> int:
+    """
+    Convert a timestamp-like value to int64 epoch seconds.
+
+    Accepts ints (already epoch seconds), strings such as ``"2024-01-02"`` or MT5's
+    ``"2024.01.02 06:00"``, ``datetime``, ``np.datetime64`` and ``pd.Timestamp``.
+    Naive values are interpreted as UTC, which is how MT5 exports broker server time.
+    """
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, str):
+        value = value.replace(".", "-", 2) if value[:4].isdigit() and value[4:5] == "." else value
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return int(ts.value // 1_000_000_000)
+
+
+def parse_mt5_times(dates: pd.Series, times: pd.Series = None) -> np.ndarray:
+    """
+    Parse MT5 ``<DATE>``/``<TIME>`` string columns into int64 epoch seconds.
+
+    Args:
+        dates (pd.Series): Values like ``"2018.01.02"``.
+        times (pd.Series): Values like ``"06:00:00"``; omitted for daily exports.
+
+    Returns:
+        np.ndarray: int64 epoch seconds.
+    """
+    if times is None:
+        stamps = pd.to_datetime(dates, format="%Y.%m.%d")
+    else:
+        stamps = pd.to_datetime(dates + " " + times, format="%Y.%m.%d %H:%M:%S")
+    return stamps.to_numpy(dtype="datetime64[s]").astype(np.int64)
+
+
+class BarStore:
+    """
+    Memory-mapped columnar store of OHLC bars for one symbol/timeframe.
+
+    Use :func:`import_mt5_csv` to build a store from an MT5 export, :meth:`open` to load an
+    existing one, :meth:`append` to add newer bars and :meth:`slice` to read a time range.
+    """
+
+    def __init__(self, store_dir: str, meta: dict):
+        self.store_dir = store_dir
+        self.meta = meta
+        self._columns = {}
+
+    # -------------------------------------------------------------------------------------
+    #  Construction
+    # -------------------------------------------------------------------------------------
+
+    @classmethod
+    def create(cls, store_dir: str, symbol: str = "", timeframe: str = "") -> "BarStore":
+        """Create an empty store directory (fails if a store already exists there)."""
+        os.makedirs(store_dir, exist_ok=True)
+        if os.path.exists(os.path.join(store_dir, META_FILE)):
+            raise FileExistsError(f"Bar store already exists: {store_dir}")
+
+        for name in COLUMNS:
+            open(_column_path(store_dir, name), "wb").close()
+
+        meta = {
+            "version": STORE_VERSION,
+            "rows": 0,
+            "symbol": symbol,
+            "timeframe": timeframe,
+            "columns": {name: dtype.str for name, dtype in COLUMNS.items()},
+        }
+        store = cls(store_dir, meta)
+        store._write_meta()
+        return store
+
+    @classmethod
+    def open(cls, store_dir: str) -> "BarStore":
+        """Open an existing store. Column files are mapped lazily on first access."""
+        meta_path = os.path.join(store_dir, META_FILE)
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(f"No bar store found at: {store_dir}")
+
+        with open(meta_path, "r") as file:
+            meta = json.load(file)
+
+        if meta.get("version") != STORE_VERSION:
+            raise ValueError(f"Unsupported bar store version {meta.get('version')} in {store_dir}")
+        return cls(store_dir, meta)
+
+    # -------------------------------------------------------------------------------------
+    #  Reading
+    # -------------------------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return int(self.meta["rows"])
+
+    @property
+    def symbol(self) -> str:
+        return self.meta.get("symbol", "")
+
+    @property
+    def timeframe(self) -> str:
+        return self.meta.get("timeframe", "")
+
+    def column(self, name: str) -> np.ndarray:
+        """Return a read-only memory-mapped view of one column (committed rows only)."""
+        if name not in COLUMNS:
+            raise KeyError(f"Unknown bar store column: {name}")
+
+        if name not in self._columns:
+            rows = len(self)
+            if rows == 0:
+                self._columns[name] = np.empty(0, dtype=COLUMNS[name])
+            else:
+                self._columns[name] = np.memmap(_column_path(self.store_dir, name),
+                                                dtype=COLUMNS[name], mode="r", shape=(rows,))
+        return self._columns[name]
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.column(name)
+
+    @property
+    def first_time(self):
+        return int(self.column("time")[0]) if len(self) else None
+
+    @property
+    def last_time(self):
+        return int(self.column("time")[-1]) if len(self) else None
+
+    def index_range(self, start=None, end=None) -> tuple:
+        """
+        Row range ``[lo, hi)`` of bars with ``start <= time < end``.
+
+        Uses a binary search over the memory-mapped time column, so only a handful of pages
+        are touched regardless of history length.
+        """
+        times = self.column("time")
+        lo = 0 if start is None else int(np.searchsorted(times, to_epoch_seconds(start), side="left"))
+        hi = len(self) if end is None else int(np.searchsorted(times, to_epoch_seconds(end), side="left"))
+        return lo, max(lo, hi)
+
+    def slice(self, start=None, end=None) -> dict:
+        """
+        Read bars in ``[start, end)`` as a dict of column arrays.
+
+        The returned arrays are views into the memory map; copy them if they must outlive the
+        store or be modified.
+        """
+        lo, hi = self.index_range(start, end)
+        return {name: self.column(name)[lo:hi] for name in COLUMNS}
+
+    def to_frame(self, start=None, end=None) -> pd.DataFrame:
+        """
+        Load bars into a DataFrame using the notebook's MT5 column names.
+
+        The frame has ``<OPEN>``, ``<HIGH>``, ``<LOW>``, ``<CLOSE>`` and ``<TICKVOL>`` columns
+        (float64 prices, as ``pd.read_csv`` would give) and a ``<DATE>`` column holding
+        ``datetime64`` bar times, so the existing notebook cells keep working unchanged.
+        """
+        bars = self.slice(start, end)
+        frame = pd.DataFrame({"<DATE>": bars["time"].astype("datetime64[s]")})
+        for mt5_name, name in MT5_COLUMNS.items():
+            values = bars[name]
+            frame[mt5_name] = values.astype(np.float64) if values.dtype.kind == "f" else np.asarray(values)
+        return frame
+
+    # -------------------------------------------------------------------------------------
+    #  Writing
+    # -------------------------------------------------------------------------------------
+
+    def append(self, bars: dict) -> int:
+        """
+        Append bars that are strictly newer than the last stored bar.
+
+        Each column file is first truncated to the committed row count (discarding the tail
+        of any interrupted append), the new values are appended and flushed, and only then is
+        ``meta.json`` atomically replaced with the new row count.
+
+        Args:
+            bars (dict): Column name -> array-like, all the same length. Every column in
+                ``COLUMNS`` is required; ``time`` must be strictly increasing.
+
+        Returns:
+            int: Number of rows appended.
+
+        Raises:
+            ValueError: If columns are missing, lengths differ or times are not increasing.
+        """
+        missing = [name for name in COLUMNS if name not in bars]
+        if missing:
+            raise ValueError(f"Missing bar columns: {missing}")
+
+        arrays = {name: np.ascontiguousarray(bars[name], dtype=COLUMNS[name]) for name in COLUMNS}
+        count = len(arrays["time"])
+        if any(len(values) != count for values in arrays.values()):
+            raise ValueError("All bar columns must have the same length")
+        if count == 0:
+            return 0
+
+        times = arrays["time"]
+        if count > 1 and np.any(np.diff(times) <= 0):
+            raise ValueError("Bar times must be strictly increasing")
+        if len(self) and times[0] <= self.last_time:
+            raise ValueError(
+                f"First appended bar ({times[0]}) is not newer than the last stored bar ({self.last_time})")
+
+        rows = len(self)
+        for name, values in arrays.items():
+            path = _column_path(self.store_dir, name)
+            with open(path, "r+b") as file:
+                file.truncate(rows * COLUMNS[name].itemsize)
+                file.seek(0, os.SEEK_END)
+                file.write(values.tobytes())
+                file.flush()
+                os.fsync(file.fileno())
+
+        self.meta["rows"] = rows + count
+        self._write_meta()
+        self._columns.clear()
+        return count
+
+    def _write_meta(self) -> None:
+        meta_path = os.path.join(self.store_dir, META_FILE)
+        tmp_path = meta_path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self.meta, file, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, meta_path)
+
+
+def import_mt5_csv(csv_path: str, store_dir: str, symbol: str = "", timeframe: str = "",
+                   chunksize: int = 1_000_000) -> BarStore:
+    """
+    Convert an MT5 tab-delimited bar export into a bar store.
+
+    The CSV is read in chunks, so memory stays bounded for multi-year M1 exports. If the store
+    already exists, only bars newer than its last bar are appended, which makes re-importing a
+    refreshed export cheap.
+
+    Args:
+        csv_path (str): Path to the MT5 export (e.g. 'XAUUSDm_H1_201801020600_202412310000.csv').
+        store_dir (str): Target store directory.
+        symbol (str): Optional symbol label stored in the metadata.
+        timeframe (str): Optional timeframe label stored in the metadata.
+        chunksize (int): Rows parsed per chunk.
+
+    Returns:
+        BarStore: The opened store.
+    """
+    if os.path.exists(os.path.join(store_dir, META_FILE)):
+        store = BarStore.open(store_dir)
+    else:
+        store = BarStore.create(store_dir, symbol=symbol, timeframe=timeframe)
+
+    header = pd.read_csv(csv_path, delimiter="\t", nrows=0).columns
+    has_time = "<TIME>" in header
+    usecols = ["<DATE>"] + (["<TIME>"] if has_time else []) + list(MT5_COLUMNS)
+    dtypes = {"<DATE>": str, "<TIME>": str, "<TICKVOL>": np.int64,
+              "<OPEN>": np.float64, "<HIGH>": np.float64, "<LOW>": np.float64, "<CLOSE>": np.float64}
+
+    reader = pd.read_csv(csv_path, delimiter="\t", usecols=usecols,
+                         dtype={c: dtypes[c] for c in usecols}, chunksize=chunksize)
+    for chunk in reader:
+        times = parse_mt5_times(chunk["<DATE>"], chunk["<TIME>"] if has_time else None)
+        bars = {"time": times}
+        for mt5_name, name in MT5_COLUMNS.items():
+            bars[name] = chunk[mt5_name].to_numpy()
+
+        if len(store):
+            keep = times > store.last_time
+            bars = {name: values[keep] for name, values in bars.items()}
+        store.append(bars)
+
+    return store
+
+
+def load_bars(path: str, start=None, end=None) -> pd.DataFrame:
+    """
+    Load bars from either a bar store directory or an MT5 CSV export.
+
+    Convenience entry point for notebooks and scripts that should work with both formats.
+    """
+    if os.path.isdir(path):
+        return BarStore.open(path).to_frame(start, end)
+
+    data = pd.read_csv(path, delimiter="\t")
+    data["<DATE>"] = pd.to_datetime(data["<DATE>"] + " " + data["<TIME>"], format="%Y.%m.%d %H:%M:%S") \
+        if "<TIME>" in data.columns else pd.to_datetime(data["<DATE>"], format="%Y.%m.%d")
+    data = data.drop(columns=[c for c in ("<TIME>", "<VOL>", "<SPREAD>") if c in data.columns])
+    if start is not None or end is not None:
+        epoch = data["<DATE>"].to_numpy(dtype="datetime64[s]").astype(np.int64)
+        mask = np.ones(len(data), dtype=bool)
+        if start is not None:
+            mask &= epoch >= to_epoch_seconds(start)
+        if end is not None:
+            mask &= epoch < to_epoch_seconds(end)
+        data = data[mask].reset_index(drop=True)
+    return data
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Convert MT5 bar exports into a memory-mapped bar store")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_import = sub.add_parser("import", help="Import (or incrementally update from) an MT5 CSV export")
+    p_import.add_argument("csv_path")
+    p_import.add_argument("store_dir")
+    p_import.add_argument("--symbol", default="")
+    p_import.add_argument("--timeframe", default="")
+
+    p_info = sub.add_parser("info", help="Show store contents and load time")
+    p_info.add_argument("store_dir")
+
+    args = parser.parse_args()
+
+    if args.command == "import":
+        started = time.perf_counter()
+        store = import_mt5_csv(args.csv_path, args.store_dir, symbol=args.symbol, timeframe=args.timeframe)
+        elapsed = time.perf_counter() - started
+        print(f"✅ Imported {args.csv_path} -> {args.store_dir}")
+        print(f"📊 Rows: {len(store):,} in {elapsed:.2f}s")
+    else:
+        started = time.perf_counter()
+        store = BarStore.open(args.store_dir)
+        close = store.column("close")
+        elapsed = time.perf_counter() - started
+        print(f"📁 Store: {args.store_dir} ({store.symbol} {store.timeframe})")
+        print(f"📊 Rows: {len(store):,}")
+        if len(store):
+            first = datetime.fromtimestamp(store.first_time, tz=timezone.utc).strftime("%Y-%m-%d %H:%M")
+            last = datetime.fromtimestamp(store.last_time, tz=timezone.utc).strftime("%Y-%m-%d %H:%M")
+            print(f"🕒 Range: {first} -> {last}")
+            print(f"📈 Last close: {close[-1]:.2f}")
+        print(f"⚡ Open + map time: {elapsed * 1000:.2f} ms")
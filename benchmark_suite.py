@@ -0,0 +1,228 @@
+"""
+Scaling benchmark of the training/serving pipeline on synthetic MT5 exports.
+
+For each size (10k .. 10M bars) a tab-delimited MT5-format CSV of synthetic M1 bars is
+generated (once, cached under ``--data-dir``) and every stage is run under a
+``profiling.Profiler``:
+
+    load          bar_store.load_bars on the CSV
+    features      feature_engine.build_dataset
+    fit           forest fit on up to FIT_ROWS rows
+    backtest      parallel walk-forward over the last BACKTEST_ROWS rows
+    convert       skl2onnx conversion of the fitted forest
+    session_load  onnxruntime InferenceSession creation
+    session_run   batch scoring of every feature row
+
+One JSON record per stage and size is appended to a history file together with the git
+commit, so throughput can be tracked across commits. A stage is flagged as a regression when
+its throughput falls more than ``tolerance`` below the median of the previous runs on the
+same host.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from profiling import Profiler
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+DEFAULT_HISTORY = os.path.join("benchmarks", "history.jsonl")
+DEFAULT_DATA_DIR = os.path.join(".cache", "benchmarks")
+STAGES = ["load", "features", "fit", "backtest", "convert", "session_load", "session_run"]
+
+FIT_ROWS = 200_000
+BACKTEST_ROWS = 20_000
+SCORE_BATCH = 65536
+
+
+def write_synthetic_mt5_csv(path: str, n_bars: int, seed: int = 1) -> str:
+    """Write ``n_bars`` synthetic M1 bars in the MT5 export layout (``<DATE> <TIME> ... <SPREAD>``)."""
+    from feature_engine import synthetic_bars
+
+    bars = synthetic_bars(n_bars, seed)
+    times = np.datetime64("2005-01-03T00:00:00") + np.arange(n_bars).astype("timedelta64[m]")
+    stamps = pd.Series(np.datetime_as_string(times, unit="s"))
+    frame = pd.DataFrame({
+        "<DATE>": stamps.str.slice(0, 10).str.replace("-", ".", regex=False),
+        "<TIME>": stamps.str.slice(11, 19),
+        "<OPEN>": bars["<OPEN>"],
+        "<HIGH>": bars["<HIGH>"],
+        "<LOW>": bars["<LOW>"],
+        "<CLOSE>": bars["<CLOSE>"],
+        "<TICKVOL>": bars["<TICKVOL>"],
+        "<VOL>": 0,
+        "<SPREAD>": 20,
+    })
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    frame.to_csv(tmp_path, sep="\t", index=False, float_format="%.3f")
+    os.replace(tmp_path, path)
+    return path
+
+
+def synthetic_csv(data_dir: str, n_bars: int, seed: int = 1) -> str:
+    """Path of the cached synthetic export for ``n_bars``, generating it if missing."""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"synthetic_M1_{n_bars}_{seed}.csv")
+    if not os.path.exists(path):
+        write_synthetic_mt5_csv(path, n_bars, seed)
+    return path
+
+
+def git_revision() -> dict:
+    """Current commit and whether the working tree has uncommitted changes."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    return {"commit": commit, "dirty": dirty}
+
+
+def run_size(csv_path: str, n_bars: int, stages: list = None, profiler: Profiler = None) -> list:
+    """Run the selected stages on one synthetic export and return the profiler records."""
+    from sklearn.ensemble import RandomForestClassifier
+
+    from backtest import parallel_backtestor
+    from bar_store import load_bars
+    from feature_engine import FEATURE_NAMES, TARGET, build_dataset
+    from onnx_export import export_forest
+    from onnx_utils import make_session
+
+    stages = stages or STAGES
+    profiler = profiler or Profiler()
+    enabled = set(stages)
+
+    with profiler.stage("load", items=n_bars):
+        data = load_bars(csv_path)
+    with profiler.stage("features", items=n_bars):
+        X, y, rows = build_dataset(data)
+
+    model = RandomForestClassifier(n_estimators=50, max_depth=15, min_samples_split=50,
+                                   min_samples_leaf=20, random_state=1, n_jobs=-1)
+    fit_rows = min(len(X), FIT_ROWS)
+    if enabled & {"fit", "convert", "session_load", "session_run"}:
+        with profiler.stage("fit", items=fit_rows):
+            model.fit(X[-fit_rows:], y[-fit_rows:])
+
+    if "backtest" in enabled:
+        tail = min(len(X), BACKTEST_ROWS)
+        frame = pd.DataFrame(X[-tail:], columns=FEATURE_NAMES)
+        frame[TARGET] = y[-tail:]
+        fold_model = RandomForestClassifier(n_estimators=20, max_depth=10, min_samples_leaf=20, random_state=1)
+        with profiler.stage("backtest", items=tail - tail // 2):
+            parallel_backtestor(frame, fold_model, FEATURE_NAMES, start=tail // 2, step=max(tail // 20, 1))
+
+    if enabled & {"convert", "session_load", "session_run"}:
+        with profiler.stage("convert", items=model.n_estimators):
+            payload = export_forest(model, len(FEATURE_NAMES), zipmap=False).SerializeToString()
+        with profiler.stage("session_load", items=1):
+            session = make_session(payload)
+        if "session_run" in enabled:
+            input_name = session.get_inputs()[0].name
+            with profiler.stage("session_run", items=len(X)):
+                for start in range(0, len(X), SCORE_BATCH):
+                    session.run(None, {input_name: X[start:start + SCORE_BATCH]})
+
+    # Drop the stages that only ran because a later stage needed them
+    return [record for record in profiler.records if record["stage"] in enabled]
+
+
+def read_history(path: str) -> list:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def append_history(path: str, records: list) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as file:
+        for record in records:
+            file.write(json.dumps(record, default=str) + "\n")
+
+
+def find_regressions(history: list, records: list, tolerance: float = 0.2, window: int = 5) -> pd.DataFrame:
+    """
+    Compare each new record's throughput with the median of up to ``window`` previous runs
+    of the same stage, size and host.
+
+    Returns:
+        pd.DataFrame: stage, bars, throughput, baseline, ratio and ``regression`` flag.
+    """
+    rows = []
+    for record in records:
+        previous = [old for old in history
+                    if old["stage"] == record["stage"] and old["bars"] == record["bars"]
+                    and old["host"] == record["host"] and old["run_id"] != record["run_id"]
+                    and old.get("items_per_s")]
+        previous = previous[-window:]
+        baseline = float(np.median([old["items_per_s"] for old in previous])) if previous else None
+        throughput = record.get("items_per_s")
+        ratio = throughput / baseline if baseline and throughput else None
+        rows.append({"stage": record["stage"], "bars": record["bars"], "items_per_s": throughput,
+                     "baseline": baseline, "ratio": ratio, "baseline_runs": len(previous),
+                     "regression": bool(ratio is not None and ratio < 1.0 - tolerance)})
+    return pd.DataFrame(rows)
+
+
+def run_suite(sizes: list = None, stages: list = None, history_path: str = DEFAULT_HISTORY,
+              data_dir: str = DEFAULT_DATA_DIR, tolerance: float = 0.2, trace_memory: bool = False,
+              verbose: bool = True) -> pd.DataFrame:
+    """
+    Benchmark every size, append the results to ``history_path`` and flag regressions.
+
+    Returns:
+        pd.DataFrame: One row per stage and size with timings, memory, throughput and the
+        comparison against earlier runs.
+    """
+    sizes = sizes or DEFAULT_SIZES
+    run = {"run_id": uuid.uuid4().hex[:12], "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+           "host": platform.node(), "python": platform.python_version(), "cpus": os.cpu_count(),
+           **git_revision()}
+
+    history = read_history(history_path)
+    records = []
+    for n_bars in sizes:
+        csv_path = synthetic_csv(data_dir, n_bars)
+        profiler = Profiler(trace_memory=trace_memory)
+        for record in run_size(csv_path, n_bars, stages, profiler):
+            records.append({**run, "bars": n_bars, **record})
+            if verbose:
+                print(f"⏱️  {n_bars:>10,} bars  {record['stage']:<13} {record['wall_s']:8.3f}s  "
+                      f"{record.get('items_per_s') or 0:>14,.0f} items/s")
+
+    append_history(history_path, records)
+    comparison = find_regressions(history + records, records, tolerance)
+    report = pd.DataFrame(records)[["stage", "bars", "items", "wall_s", "cpu_s", "rss_peak_mb", "rss_growth_mb"]
+                                   + (["peak_traced_mb"] if trace_memory else [])]
+    return report.merge(comparison, on=["stage", "bars"])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pipeline scaling benchmark on synthetic MT5 data")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="JSONL file results are appended to")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="Where synthetic exports are cached")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed throughput drop vs baseline")
+    parser.add_argument("--trace-memory", action="store_true", help="Track peak allocations per stage")
+    args = parser.parse_args()
+
+    report = run_suite(args.sizes, args.stages, args.history, args.data_dir, args.tolerance, args.trace_memory)
+    print(report.to_string(index=False))
+    regressions = report[report["regression"]]
+    if len(regressions):
+        print(f"\n❌ {len(regressions)} stage(s) regressed by more than {args.tolerance:.0%}:")
+        print(regressions[["stage", "bars", "items_per_s", "baseline", "ratio"]].to_string(index=False))
+        raise SystemExit(1)
+    print("\n✅ No throughput regressions")
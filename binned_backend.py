@@ -0,0 +1,484 @@
+"""
+Histogram-binned training backends as an alternative to the exact-split forest.
+
+The notebook fits ``RandomForestClassifier`` on float64 feature columns, and every split search
+sorts the raw values of each candidate feature. :class:`QuantileBinner` maps each feature once
+to at most 255 quantile bins and stores the codes as a C-ordered ``uint8`` array. That is
+storage only: sklearn's estimators convert the codes back to floats on every ``fit``, so
+training does not use less memory. The gain is in split search, which only considers bin
+boundaries. Trees are then grown on the bin codes:
+
+    forest          the notebook's forest on float32 features (reference)
+    binned_forest   the same forest on bin codes: splits only between bins, far fewer candidates
+    hist_gb         ``HistGradientBoostingClassifier`` on bin codes (histogram split search)
+
+:func:`make_backend` returns an unfitted sklearn classifier for any of them. It takes raw features,
+so it can replace the model passed to ``predors``/``backtestor`` or the final-fit cell:
+
+    final_model = make_backend("hist_gb")
+    final_model.fit(X_train, y_train)
+    onnx_model = export_backend(final_model, len(FEATURE_NAMES))
+
+:func:`binned_backtestor` bins the whole matrix once and fits every walk-forward fold on views
+of the codes. A split ``code <= k`` is the same test as ``x <= edge[k]`` on the raw feature.
+:func:`export_backend` therefore writes an ordinary ``TreeEnsembleClassifier`` with float32
+thresholds. The EA keeps feeding raw features and needs no binning step. :func:`benchmark`
+compares fit time, memory, walk-forward precision and ONNX parity of the backends.
+"""
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import onnx
+import pandas as pd
+from onnx import TensorProto, helper
+from sklearn.base import BaseEstimator, ClassifierMixin, clone
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.metrics import precision_score
+
+from backtest import TARGET, predict_labels
+
+# The notebook's final_model
+FOREST_PARAMS = {"n_estimators": 100, "min_samples_split": 50, "random_state": 1,
+                 "max_depth": 15, "min_samples_leaf": 20}
+
+HIST_GB_PARAMS = {"max_iter": 200, "learning_rate": 0.05, "max_leaf_nodes": 31, "min_samples_leaf": 20,
+                  "l2_regularization": 1.0, "early_stopping": False, "random_state": 1}
+
+BACKENDS = ["forest", "binned_forest", "hist_gb"]
+
+
+# -----------------------------------------------------------------------------------------
+#  Quantile binning
+# -----------------------------------------------------------------------------------------
+
+class QuantileBinner:
+    """
+    Per-feature quantile bins with ``uint8`` codes.
+
+    ``edges_[j]`` holds the sorted float32 upper bin edges of feature ``j``. The code of a value
+    is the number of edges below it, so ``code <= k`` exactly when ``x <= edges_[j][k]``. A
+    feature with at most ``max_bins`` distinct values gets one bin per value.
+
+    Args:
+        max_bins (int): Bins per feature, at most 256 (``uint8`` codes).
+        subsample (int): Rows sampled to compute the quantiles (``None`` = all rows).
+        random_state (int): Seed for the subsample.
+    """
+
+    def __init__(self, max_bins: int = 255, subsample: int = 200_000, random_state: int = 1):
+        if not 2 <= max_bins <= 256:
+            raise ValueError(f"max_bins must be between 2 and 256, got {max_bins}")
+        self.max_bins = max_bins
+        self.subsample = subsample
+        self.random_state = random_state
+        self.edges_ = None
+
+    @property
+    def fitted(self) -> bool:
+        return self.edges_ is not None
+
+    def fit(self, X) -> "QuantileBinner":
+        X = np.asarray(X, dtype=np.float32)
+        if self.subsample is not None and len(X) > self.subsample:
+            rows = np.random.default_rng(self.random_state).choice(len(X), self.subsample, replace=False)
+            X = X[np.sort(rows)]
+
+        levels = np.linspace(0.0, 1.0, self.max_bins + 1)[1:-1]
+        self.edges_ = []
+        for j in range(X.shape[1]):
+            distinct = np.unique(X[:, j])
+            if len(distinct) <= self.max_bins:
+                edges = distinct[:-1]
+            else:
+                edges = np.unique(np.quantile(X[:, j], levels, method="nearest"))
+                edges = edges[edges < distinct[-1]]
+            self.edges_.append(np.ascontiguousarray(edges, dtype=np.float32))
+        return self
+
+    def transform(self, X) -> np.ndarray:
+        """``(n, p)`` C-ordered ``uint8`` codes, filled column by column."""
+        if not self.fitted:
+            raise RuntimeError("QuantileBinner is not fitted")
+        columns = X.columns if isinstance(X, pd.DataFrame) else None
+        if columns is None:
+            X = np.asarray(X)
+        if X.shape[1] != len(self.edges_):
+            raise ValueError(f"Expected {len(self.edges_)} features, got {X.shape[1]}")
+
+        codes = np.empty(X.shape, dtype=np.uint8)
+        for j, edges in enumerate(self.edges_):
+            values = X[columns[j]].to_numpy() if columns is not None else X[:, j]
+            codes[:, j] = np.searchsorted(edges, values.astype(np.float32, copy=False), side="left")
+        return codes
+
+    def fit_transform(self, X) -> np.ndarray:
+        return self.fit(X).transform(X)
+
+    def edge(self, feature: int, threshold: float) -> float:
+        """Raw float32 threshold equivalent to the code split ``code <= threshold``."""
+        return float(self.edges_[feature][int(np.floor(threshold))])
+
+    @property
+    def n_bins(self) -> list:
+        return [len(edges) + 1 for edges in self.edges_]
+
+
+# -----------------------------------------------------------------------------------------
+#  Estimators
+# -----------------------------------------------------------------------------------------
+
+class BinnedClassifier(ClassifierMixin, BaseEstimator):
+    """
+    Classifier that fits ``estimator`` on quantile-bin codes of raw features.
+
+    ``fit`` fits a fresh :class:`QuantileBinner` on the training rows, unless ``binner`` is
+    already fitted. In that case every fit only encodes rows, so one binner (fitted on the
+    first training window) bins the data once for a whole walk-forward. ``predict_proba`` encodes with
+    the same edges.
+
+    Args:
+        estimator: Unfitted tree-based sklearn classifier (``RandomForestClassifier`` or
+            ``HistGradientBoostingClassifier``); cloned on fit.
+        binner (QuantileBinner): Optional pre-fitted binner.
+        max_bins (int): Bins per feature when the binner is fitted here.
+    """
+
+    def __init__(self, estimator=None, binner=None, max_bins: int = 255):
+        self.estimator = estimator
+        self.binner = binner
+        self.max_bins = max_bins
+
+    def fit(self, X, y) -> "BinnedClassifier":
+        if self.binner is not None and self.binner.fitted:
+            self.binner_ = self.binner
+        else:
+            self.binner_ = QuantileBinner(self.max_bins).fit(X)
+        self.fit_codes(self.binner_.transform(X), y)
+        return self
+
+    def fit_codes(self, codes: np.ndarray, y) -> "BinnedClassifier":
+        """Fit on codes already produced by ``binner_`` (the walk-forward path)."""
+        estimator = self.estimator if self.estimator is not None else RandomForestClassifier(**FOREST_PARAMS)
+        self.estimator_ = clone(estimator).fit(codes, y)
+        self.classes_ = self.estimator_.classes_
+        return self
+
+    def predict_proba(self, X) -> np.ndarray:
+        return self.estimator_.predict_proba(self.binner_.transform(X))
+
+    def predict(self, X) -> np.ndarray:
+        return self.estimator_.predict(self.binner_.transform(X))
+
+
+def make_backend(name: str, max_bins: int = 255, **params):
+    """
+    Unfitted classifier for backend ``name`` (one of ``BACKENDS``).
+
+    ``params`` override the backend's defaults (``FOREST_PARAMS`` or ``HIST_GB_PARAMS``).
+    """
+    if name == "forest":
+        return RandomForestClassifier(**{**FOREST_PARAMS, **params})
+    if name == "binned_forest":
+        return BinnedClassifier(RandomForestClassifier(**{**FOREST_PARAMS, **params}), max_bins=max_bins)
+    if name == "hist_gb":
+        return BinnedClassifier(HistGradientBoostingClassifier(**{"max_bins": max_bins, **HIST_GB_PARAMS, **params}),
+                                max_bins=max_bins)
+    raise ValueError(f"Unknown backend {name!r}, expected one of {BACKENDS}")
+
+
+def binned_backtestor(data, model, predictors=None, start=2500, step=250, threshold=None, binner=None,
+                      full_history_bins: bool = False):
+    """
+    Walk-forward where the feature matrix is binned once and folds are ``uint8`` views.
+
+    The bin edges come from ``binner`` or ``model.binner`` when fitted. Otherwise they are
+    fitted on the first ``start`` rows (the first training window), so no fold's codes depend
+    on later bars. ``full_history_bins=True`` fits them on all rows instead: quantiles use no
+    labels, but they then see the distribution of the bars being predicted.
+
+    Args:
+        data: A ``fold_engine.FoldMatrix``, or a frame with the predictor columns and ``<TRGT>``.
+        model (BinnedClassifier): Refitted on the codes of every fold, as in ``backtestor``.
+        predictors (list): Feature columns (only needed when ``data`` is a frame).
+        start (int): First training size.
+        step (int): Test rows per fold.
+        threshold (float): Optional class-1 probability threshold (see ``predict_labels``).
+        binner (QuantileBinner): Optional pre-fitted binner.
+        full_history_bins (bool): Fit the edges on every row (look-ahead) when no binner is given.
+
+    Returns:
+        pd.DataFrame: ``<TRGT>`` and ``Predictions`` for every test row, as ``backtestor``.
+    """
+    from fold_engine import FoldMatrix
+
+    matrix = data if isinstance(data, FoldMatrix) else FoldMatrix.from_frame(data, predictors)
+    folds = matrix.folds(start, step)
+    if not folds:
+        raise ValueError(f"Not enough rows ({len(matrix)}) for a walk-forward starting at {start}")
+
+    binner = binner or (model.binner if model.binner is not None and model.binner.fitted else None)
+    binner = binner or QuantileBinner(model.max_bins).fit(matrix.X if full_history_bins else matrix.X[:start])
+    codes = binner.transform(matrix.X)
+    model.binner_ = binner
+
+    predictions = np.empty(len(matrix) - start, dtype=matrix.y.dtype)
+    for train_end, test_end in folds:
+        model.fit_codes(codes[:train_end], matrix.y[:train_end])
+        predictions[train_end - start:test_end - start] = predict_labels(
+            model.estimator_, codes[train_end:test_end], threshold)
+
+    index = matrix.index[start:]
+    return pd.concat([pd.Series(matrix.y[start:], index=index, name=TARGET),
+                      pd.Series(predictions, index=index, name="Predictions")], axis=1)
+
+
+# -----------------------------------------------------------------------------------------
+#  ONNX export
+# -----------------------------------------------------------------------------------------
+
+def _forest_trees(forest, binner: QuantileBinner):
+    """Yield ``(nodes, leaf_weights)`` per tree; thresholds are mapped back to raw edges."""
+    n_trees = len(forest.estimators_)
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        nodes, leaves = [], {}
+        for node_id in range(tree.node_count):
+            left, right = int(tree.children_left[node_id]), int(tree.children_right[node_id])
+            if left == -1:
+                value = tree.value[node_id, 0]
+                proba = value / value.sum()
+                nodes.append((node_id, "LEAF", 0, 0.0, 0, 0))
+                leaves[node_id] = [(c, float(p) / n_trees) for c, p in enumerate(proba)]
+            else:
+                feature = int(tree.feature[node_id])
+                nodes.append((node_id, "BRANCH_LEQ", feature, binner.edge(feature, tree.threshold[node_id]),
+                              left, right))
+        yield nodes, leaves
+
+
+def _hist_gb_trees(model, binner: QuantileBinner):
+    """Yield ``(nodes, leaf_weights)`` per boosting iteration; leaves carry the raw score."""
+    for (predictor,) in model._predictors:
+        nodes, leaves = [], {}
+        for node_id, node in enumerate(predictor.nodes):
+            if node["is_leaf"]:
+                nodes.append((node_id, "LEAF", 0, 0.0, 0, 0))
+                leaves[node_id] = [(0, float(node["value"]))]
+            else:
+                feature = int(node["feature_idx"])
+                nodes.append((node_id, "BRANCH_LEQ", feature, binner.edge(feature, node["num_threshold"]),
+                              int(node["left"]), int(node["right"])))
+        yield nodes, leaves
+
+
+def export_binned(model: BinnedClassifier, n_features: int, target_opset: int = 11) -> onnx.ModelProto:
+    """
+    Export a fitted :class:`BinnedClassifier` as one ``TreeEnsembleClassifier`` on raw features.
+
+    Every code split ``code <= k`` becomes ``x <= edges[k]`` (see :class:`QuantileBinner`), so the
+    model takes the same float input as the notebook export. Gradient boosting keeps its raw
+    scores in the leaves with the baseline as ``base_values`` and a ``LOGISTIC`` post-transform,
+    as skl2onnx writes it. (skl2onnx's converter fails on this sklearn's tree attributes.)
+
+    Returns:
+        onnx.ModelProto: Input ``float_input [None, n_features]``; outputs ``label [None]`` and
+        ``probabilities [None, 2]`` (no ZipMap).
+    """
+    estimator = model.estimator_
+    extra = {"post_transform": "NONE"}
+    if isinstance(estimator, HistGradientBoostingClassifier):
+        if estimator.n_trees_per_iteration_ != 1:
+            raise ValueError("Only binary HistGradientBoostingClassifier models can be exported")
+        trees = _hist_gb_trees(estimator, model.binner_)
+        extra = {"post_transform": "LOGISTIC",
+                 "base_values": [float(np.ravel(estimator._baseline_prediction)[0])]}
+    elif hasattr(estimator, "estimators_"):
+        trees = _forest_trees(estimator, model.binner_)
+    else:
+        raise TypeError(f"Cannot export {type(estimator).__name__}")
+
+    cols = {name: [] for name in ("nodes_treeids", "nodes_nodeids", "nodes_modes", "nodes_featureids",
+                                  "nodes_values", "nodes_truenodeids", "nodes_falsenodeids",
+                                  "class_treeids", "class_nodeids", "class_ids", "class_weights")}
+    for t, (nodes, leaves) in enumerate(trees):
+        for node_id, mode, feature, value, true_id, false_id in nodes:
+            cols["nodes_treeids"].append(t)
+            cols["nodes_nodeids"].append(node_id)
+            cols["nodes_modes"].append(mode.encode())
+            cols["nodes_featureids"].append(feature)
+            cols["nodes_values"].append(value)
+            cols["nodes_truenodeids"].append(true_id)
+            cols["nodes_falsenodeids"].append(false_id)
+            for class_id, weight in leaves.get(node_id, []):
+                cols["class_treeids"].append(t)
+                cols["class_nodeids"].append(node_id)
+                cols["class_ids"].append(class_id)
+                cols["class_weights"].append(weight)
+
+    node = helper.make_node("TreeEnsembleClassifier", ["float_input"], ["label", "probabilities"],
+                            domain="ai.onnx.ml", classlabels_int64s=[int(c) for c in model.classes_],
+                            **extra, **cols)
+    graph = helper.make_graph(
+        [node], "binned_" + type(estimator).__name__,
+        [helper.make_tensor_value_info("float_input", TensorProto.FLOAT, [None, n_features])],
+        [helper.make_tensor_value_info("label", TensorProto.INT64, [None]),
+         helper.make_tensor_value_info("probabilities", TensorProto.FLOAT, [None, len(model.classes_)])])
+    proto = helper.make_model(graph, opset_imports=[helper.make_opsetid("", target_opset),
+                                                    helper.make_opsetid("ai.onnx.ml", 1)],
+                              producer_name="binned_backend")
+    proto.ir_version = 7
+    onnx.checker.check_model(proto)
+    return proto
+
+
+def export_backend(model, n_features: int, target_opset: int = 11) -> onnx.ModelProto:
+    """ONNX export for any :func:`make_backend` model (the plain forest goes through skl2onnx)."""
+    if isinstance(model, BinnedClassifier):
+        return export_binned(model, n_features, target_opset)
+    from onnx_export import export_forest
+
+    return export_forest(model, n_features, zipmap=False, target_opset=target_opset)
+
+
+# -----------------------------------------------------------------------------------------
+#  Benchmark
+# -----------------------------------------------------------------------------------------
+
+def _measure(path, n_bars: int, backend: str, start: int, step: int, threshold, export_rows: int,
+             export_dir, trace_memory: bool) -> dict:
+    """Run one backend's walk-forward, final fit and export in this (fresh) process."""
+    from fold_engine import FoldMatrix, fold_backtestor
+    from onnx_utils import make_session, probabilities
+    from profiling import Profiler
+
+    if path:
+        from bar_store import load_bars
+        bars = load_bars(path)
+    else:
+        from feature_engine import synthetic_bars
+        bars = synthetic_bars(n_bars)
+    matrix = FoldMatrix.from_bars(bars)
+    del bars
+    folds = matrix.folds(start, step)
+    model = make_backend(backend)
+
+    binned = isinstance(model, BinnedClassifier)
+    storage_bytes = len(matrix) * matrix.X.shape[1] if binned else matrix.X.nbytes
+
+    def walk_forward(profiler):
+        with profiler.stage("walk_forward", items=len(folds)):
+            # binned_backtestor fits the edges on the first training window (no look-ahead)
+            engine = binned_backtestor if binned else fold_backtestor
+            result = engine(matrix, clone(model), start=start, step=step, threshold=threshold)
+        return result, profiler.records[-1]
+
+    # Timed without tracing, which slows allocation-heavy fits; the peak comes from a second, traced run
+    result, record = walk_forward(Profiler())
+    peak_alloc_mb = walk_forward(Profiler(trace_memory=True))[1]["peak_traced_mb"] if trace_memory else None
+
+    # Final fit on everything but the last export_rows, which check the ONNX export
+    X_fit, y_fit = matrix.train(len(matrix) - export_rows)
+    X_check = matrix.X[len(matrix) - export_rows:]
+    final = make_backend(backend)
+    started = time.perf_counter()
+    final.fit(X_fit, y_fit)
+    final_seconds = time.perf_counter() - started
+
+    proto = export_backend(final, matrix.X.shape[1])
+    payload = proto.SerializeToString()
+    onnx_proba = probabilities(make_session(payload).run(None, {"float_input": X_check}))[:, 1]
+    reference = final.predict_proba(X_check)[:, 1]
+    deviation = np.abs(onnx_proba - reference)
+    if export_dir:
+        os.makedirs(export_dir, exist_ok=True)
+        with open(os.path.join(export_dir, f"{backend}.onnx"), "wb") as f:
+            f.write(payload)
+
+    predicted = result["Predictions"].to_numpy()
+    return {"backend": backend, "rows": len(matrix), "folds": len(folds),
+            "walk_forward_s": record["wall_s"], "fold_s": record["wall_s"] / max(len(folds), 1),
+            "final_fit_s": final_seconds, "storage_mb": storage_bytes / 1024 ** 2,
+            "peak_alloc_mb": peak_alloc_mb, "rss_growth_mb": record["rss_growth_mb"],
+            "precision": precision_score(result[TARGET], predicted, zero_division=0),
+            "n_positive": int(predicted.sum()),
+            "onnx_kb": len(payload) / 1024, "onnx_max_abs_dev": float(deviation.max()),
+            "onnx_label_agreement": float(((onnx_proba > 0.5) == (reference > 0.5)).mean())}
+
+
+def benchmark(path: str = None, backends: list = None, n_bars: int = 50_000, start: int = 2500,
+              step: int = 250, threshold: float = None, export_rows: int = 2000,
+              export_dir: str = None, trace_memory: bool = True) -> pd.DataFrame:
+    """
+    Walk-forward fit time, memory and precision plus ONNX parity for each backend.
+
+    Each backend runs in its own spawned process (as ``fold_engine.memory_report`` does), so
+    peak RSS is not inherited. ``walk_forward_s`` and ``rss_growth_mb`` come from an untraced
+    walk-forward. With ``trace_memory`` the walk-forward is run a second time under tracemalloc
+    for ``peak_alloc_mb``, so tracing never slows the timed run.
+
+    ``storage_mb`` is only the size of the stored feature matrix: float32 for ``forest``,
+    ``uint8`` codes otherwise, which the estimators convert back to floats on every fit.
+    Binned backends take their bin edges from the first ``start`` rows, like the forest's first
+    training window, so the codes carry no look-ahead. ``onnx_max_abs_dev`` compares the
+    exported final model with sklearn on the last ``export_rows`` rows, which that final fit
+    does not see.
+
+    Args:
+        path (str): MT5 CSV / bar store; synthetic bars when omitted.
+        backends (list): Subset of ``BACKENDS``.
+        n_bars (int): Synthetic bars (ignored with ``path``).
+        start (int): First training size.
+        step (int): Test rows per fold.
+        threshold (float): Optional class-1 probability threshold for the walk-forward labels.
+        export_rows (int): Rows held out from the final fit to check the ONNX export.
+        export_dir (str): Save ``<backend>.onnx`` there.
+        trace_memory (bool): Measure ``peak_alloc_mb`` in a second, traced walk-forward per
+            backend (doubles the walk-forward time; timings are unaffected).
+
+    Returns:
+        pd.DataFrame: One row per backend, with ``speedup`` over the first one.
+    """
+    backends = backends or BACKENDS
+    rows = []
+    context = multiprocessing.get_context("spawn")
+    for backend in backends:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            rows.append(pool.submit(_measure, path, n_bars, backend, start, step, threshold,
+                                    export_rows, export_dir, trace_memory).result())
+    report = pd.DataFrame(rows)
+    report["speedup"] = report["walk_forward_s"].iloc[0] / report["walk_forward_s"]
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark histogram-binned training backends against the forest")
+    parser.add_argument("path", nargs="?", default="XAUUSDm_H1_201801020600_202412310000.csv",
+                        help="MT5 CSV export or bar store directory ('synthetic' for random-walk bars)")
+    parser.add_argument("--backends", nargs="+", default=BACKENDS, choices=BACKENDS)
+    parser.add_argument("--bars", type=int, default=50_000, help="Synthetic bars")
+    parser.add_argument("--start", type=int, default=2500, help="First training size")
+    parser.add_argument("--step", type=int, default=250, help="Test rows per fold")
+    parser.add_argument("--threshold", type=float, default=None, help="Class-1 probability threshold")
+    parser.add_argument("--export-rows", type=int, default=2000, help="Rows held out to check the ONNX export")
+    parser.add_argument("--export-dir", default=None, help="Save each backend's final model as <backend>.onnx")
+    parser.add_argument("--no-trace-memory", dest="trace_memory", action="store_false",
+                        help="Skip the traced walk-forward that measures peak_alloc_mb (halves the run time)")
+    parser.add_argument("--out", default=None, help="Write the report as CSV")
+    args = parser.parse_args()
+
+    path = None if args.path == "synthetic" else args.path
+    source = os.path.basename(path) if path else f"{args.bars:,} synthetic bars"
+    print(f"📊 Benchmarking {', '.join(args.backends)} on {source} (start {args.start}, step {args.step})")
+    report = benchmark(path, args.backends, args.bars, args.start, args.step, args.threshold,
+                       args.export_rows, args.export_dir, args.trace_memory)
+    with pd.option_context("display.width", 200, "display.max_columns", 20):
+        print(report.to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+    if args.out:
+        report.to_csv(args.out, index=False)
+        print(f"📝 Saved report to: {args.out}")
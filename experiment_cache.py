@@ -0,0 +1,421 @@
+"""
+Content-addressed, size-bounded disk cache for experiment artifacts.
+
+Keys are hashes of what an artifact was computed from: the bar/feature data, the predictor
+list, estimator class and hyperparameters and the fold bounds. Three kinds of values are
+stored under ``<root>/objects``:
+
+    *.npy   feature matrices, targets and fold predictions (memory-mapped on read)
+    *.pkl   fitted per-fold models and other picklable objects
+
+``index.json`` records size and last access per key; when the cache grows past ``max_bytes``
+the least recently used entries are evicted. Re-running an unchanged walk-forward experiment
+therefore only reads cached predictions. Several processes may share one cache: every index
+write re-reads ``index.json`` under an exclusive lock on ``index.lock`` (``fcntl``, POSIX only)
+and applies its change to the current entries, so concurrent writers do not drop each other's.
+Puts are written at once. Hits only update ``last_access`` in memory; those times are merged
+into the index every ``TOUCH_FLUSH_EVERY`` hits, on the next put and on ``close``. An entry
+whose file has gone (evicted by another process, deleted by hand) is dropped when reading it fails.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+
+try:
+    import fcntl
+except ImportError:  # Windows: index updates are not locked
+    fcntl = None
+
+DEFAULT_ROOT = os.path.join(".cache", "experiments")
+DEFAULT_MAX_BYTES = 4 * 1024 ** 3
+INDEX_FILE = "index.json"
+# Hits whose last-access times are kept in memory before they are merged into the index
+TOUCH_FLUSH_EVERY = 256
+LOCK_FILE = "index.lock"
+
+
+# -----------------------------------------------------------------------------------------
+#  Hashing
+# -----------------------------------------------------------------------------------------
+
+def hash_array(values: np.ndarray) -> str:
+    """Hash an array's dtype, shape and contents."""
+    values = np.ascontiguousarray(values)
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"{values.dtype.str}{values.shape}".encode())
+    digest.update(memoryview(values).cast("B"))
+    return digest.hexdigest()
+
+
+def _normalize(part):
+    """Turn a key part into something JSON-serializable and order-independent."""
+    if isinstance(part, np.ndarray):
+        return {"array": hash_array(part)}
+    if isinstance(part, pd.DataFrame):
+        return {"frame": [list(map(str, part.columns)), hash_array(part.to_numpy())]}
+    if isinstance(part, pd.Series):
+        return {"series": hash_array(part.to_numpy())}
+    if hasattr(part, "get_params"):
+        return {"estimator": type(part).__name__,
+                "params": {k: _normalize(v) for k, v in sorted(part.get_params(deep=False).items())}}
+    if isinstance(part, dict):
+        return {str(k): _normalize(v) for k, v in sorted(part.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(part, (list, tuple)):
+        return [_normalize(v) for v in part]
+    if isinstance(part, (np.integer, np.floating)):
+        return part.item()
+    if part is None or isinstance(part, (str, int, float, bool)):
+        return part
+    return repr(part)
+
+
+def make_key(*parts) -> str:
+    """Build a cache key from arrays, frames, estimators, lists, dicts and scalars."""
+    payload = json.dumps(_normalize(list(parts)), sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode(), digest_size=20).hexdigest()
+
+
+def chained_segment_hashes(X: np.ndarray, y: np.ndarray, bounds: list) -> list:
+    """
+    Prefix hashes of ``(X, y)`` up to each boundary, computed in one pass.
+
+    ``hashes[k]`` covers rows ``[0, bounds[k])`` and is built by chaining per-segment hashes,
+    so appending rows leaves all earlier prefix hashes (and fold keys) unchanged.
+    """
+    hashes = []
+    previous, begin = "", 0
+    for end in bounds:
+        digest = hashlib.blake2b(previous.encode(), digest_size=20)
+        digest.update(hash_array(X[begin:end]).encode())
+        digest.update(hash_array(y[begin:end]).encode())
+        previous = digest.hexdigest()
+        hashes.append(previous)
+        begin = end
+    return hashes
+
+
+# -----------------------------------------------------------------------------------------
+#  Cache
+# -----------------------------------------------------------------------------------------
+
+class ExperimentCache:
+    """
+    Disk-backed LRU cache of arrays and pickled objects keyed by content hashes.
+
+    Call :meth:`close` (or use it as a context manager) to write the last-access times of
+    recent hits; otherwise they are written when the cache is garbage-collected.
+
+    Args:
+        root (str): Cache directory.
+        max_bytes (int): Total size above which least recently used entries are evicted.
+    """
+
+    def __init__(self, root: str = DEFAULT_ROOT, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.objects_dir = os.path.join(root, "objects")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self.index = self._read_index()
+        self._touched = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # --- index -----------------------------------------------------------------------------
+
+    def _read_index(self) -> dict:
+        path = os.path.join(self.root, INDEX_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r") as file:
+            return json.load(file)
+
+    def _write_index(self) -> None:
+        path = os.path.join(self.root, INDEX_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as file:
+            # json.dumps uses the C encoder; json.dump to a file streams through the Python one
+            file.write(json.dumps(self.index))
+        os.replace(tmp_path, path)
+
+    @contextmanager
+    def _updating_index(self):
+        """Reload the index under the cache lock; the block's changes are written on exit."""
+        with open(os.path.join(self.root, LOCK_FILE), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self.index = self._read_index()
+                self._merge_touches()
+                yield self.index
+                self._write_index()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.objects_dir, f"{key}.{ext}")
+
+    def _merge_touches(self) -> None:
+        for key, last_access in self._touched.items():
+            entry = self.index.get(key)
+            if entry is not None:
+                entry["last_access"] = max(entry["last_access"], last_access)
+        self._touched.clear()
+
+    def _touch(self, key: str) -> None:
+        now = time.time()
+        self.index[key]["last_access"] = now
+        self._touched[key] = now
+        if len(self._touched) >= TOUCH_FLUSH_EVERY:
+            self.flush()
+
+    def _forget(self, key: str) -> None:
+        """Drop an entry whose file no longer exists."""
+        self._touched.pop(key, None)
+        with self._updating_index() as index:
+            index.pop(key, None)
+
+    def _register(self, key: str, ext: str, kind: str) -> None:
+        with self._updating_index() as index:
+            index[key] = {"ext": ext, "kind": kind, "size": os.path.getsize(self._path(key, ext)),
+                          "created": time.time(), "last_access": time.time()}
+            self._evict()
+
+    def _evict(self) -> None:
+        total = self.size_bytes
+        if total <= self.max_bytes:
+            return
+        for key in sorted(self.index, key=lambda k: self.index[k]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            entry = self.index.pop(key)
+            try:
+                os.remove(self._path(key, entry["ext"]))
+            except FileNotFoundError:
+                pass
+            total -= entry["size"]
+            self.evictions += 1
+
+    # --- public API ------------------------------------------------------------------------
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
+    def object_path(self, key: str):
+        """File holding ``key`` (for readers in other processes), or ``None`` if it is not cached."""
+        entry = self.index.get(key)
+        if entry is None or not os.path.exists(self._path(key, entry["ext"])):
+            return None
+        return self._path(key, entry["ext"])
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(entry["size"] for entry in self.index.values())
+
+    def get_array(self, key: str):
+        """Return a read-only memory-mapped array, or ``None`` on a miss."""
+        entry = self.index.get(key)
+        if entry is None or entry["ext"] != "npy":
+            self.misses += 1
+            return None
+        try:
+            values = np.load(self._path(key, "npy"), mmap_mode="r")
+        except FileNotFoundError:
+            self._forget(key)
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touch(key)
+        return values
+
+    def put_array(self, key: str, values: np.ndarray, kind: str = "array") -> None:
+        tmp_path = self._path(key, f"{os.getpid()}.tmp.npy")
+        np.save(tmp_path, np.ascontiguousarray(values))
+        os.replace(tmp_path, self._path(key, "npy"))
+        self._register(key, "npy", kind)
+
+    def get_object(self, key: str):
+        """Return the unpickled object, or ``None`` on a miss."""
+        entry = self.index.get(key)
+        if entry is None or entry["ext"] != "pkl":
+            self.misses += 1
+            return None
+        try:
+            file = open(self._path(key, "pkl"), "rb")
+        except FileNotFoundError:
+            self._forget(key)
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touch(key)
+        with file:
+            return pickle.load(file)
+
+    def put_object(self, key: str, value, kind: str = "object") -> None:
+        tmp_path = self._path(key, f"{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as file:
+            pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._path(key, "pkl"))
+        self._register(key, "pkl", kind)
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this instance plus current size and entries per kind."""
+        kinds = {}
+        for entry in self.index.values():
+            kinds[entry["kind"]] = kinds.get(entry["kind"], 0) + 1
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self.index),
+            "entries_by_kind": kinds,
+            "size_bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+    def flush(self) -> None:
+        """Merge the last-access times of recent hits into ``index.json``."""
+        if self._touched:
+            with self._updating_index():
+                pass
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self) -> "ExperimentCache":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __del__(self):
+        try:
+            self.flush()
+        except Exception:
+            # Interpreter shutdown or a removed cache directory: the access times are only a hint
+            pass
+
+    def clear(self) -> None:
+        self._touched.clear()
+        with self._updating_index() as index:
+            for key, entry in list(index.items()):
+                try:
+                    os.remove(self._path(key, entry["ext"]))
+                except FileNotFoundError:
+                    pass
+            index.clear()
+
+
+# -----------------------------------------------------------------------------------------
+#  Cached pipeline steps
+# -----------------------------------------------------------------------------------------
+
+def cached_features(cache: ExperimentCache, data: pd.DataFrame) -> tuple:
+    """
+    ``feature_engine.build_dataset`` with the result cached by the input bars' hash.
+
+    Returns:
+        tuple: ``(X, y, rows)``; on a hit the arrays are memory-mapped from the cache.
+    """
+    from feature_engine import FEATURE_NAMES, build_dataset
+
+    bars = data[["<OPEN>", "<HIGH>", "<LOW>", "<CLOSE>", "<TICKVOL>"]]
+    key = make_key("features", bars, FEATURE_NAMES)
+    keys = {name: make_key(key, name) for name in ("X", "y", "rows")}
+
+    if all(k in cache for k in keys.values()):
+        cached = tuple(cache.get_array(keys[name]) for name in ("X", "y", "rows"))
+        if all(values is not None for values in cached):
+            return cached
+
+    cache.misses += 1
+    X, y, rows = build_dataset(data)
+    for name, values in zip(("X", "y", "rows"), (X, y, rows)):
+        cache.put_array(keys[name], values, kind="features")
+    return X, y, rows
+
+
+def fold_keys(data, model, predictors, start=2500, step=250) -> list:
+    """
+    Cache keys of every walk-forward fold, as used by :func:`cached_backtestor`.
+
+    A fold's key covers the rows up to the end of its test window, the predictors and the
+    estimator's class and parameters. Fitted models are stored under
+    ``make_key(fold_key, "model")``, so one fit serves every decision threshold; predicted
+    labels depend on it and are stored under ``make_key(fold_key, "predictions", threshold)``.
+
+    Returns:
+        list: ``((train_end, test_end), fold_key)`` per fold.
+    """
+    from backtest import TARGET, fold_bounds
+
+    X = np.ascontiguousarray(data[predictors].to_numpy(dtype=np.float32))
+    y = data[TARGET].to_numpy()
+    folds = fold_bounds(len(data), start, step)
+    prefix_hashes = chained_segment_hashes(X, y, [start] + [test_end for _, test_end in folds])
+    settings = make_key(list(predictors), model)
+    return [((train_end, test_end), make_key("fold", prefix, train_end, test_end, settings))
+            for (train_end, test_end), prefix in zip(folds, prefix_hashes[1:])]
+
+
+def cached_backtestor(cache: ExperimentCache, data, model, predictors, start=2500, step=250,
+                      threshold=None, store_models=True):
+    """
+    ``backtestor`` with per-fold models and predictions cached.
+
+    Folds whose predictions are cached are not refitted, and new bars appended to ``data``
+    only cost the new folds (see :func:`fold_keys`).
+
+    Returns:
+        pd.DataFrame: ``<TRGT>`` and ``Predictions``, as ``backtestor``.
+    """
+    from backtest import TARGET, predict_labels
+
+    X = np.ascontiguousarray(data[predictors].to_numpy(dtype=np.float32))
+    y = data[TARGET].to_numpy()
+
+    predictions = []
+    for (train_end, test_end), fold_key in fold_keys(data, model, predictors, start, step):
+        labels = cache.get_array(make_key(fold_key, "predictions", threshold))
+        if labels is None:
+            fold_model = cache.get_object(make_key(fold_key, "model")) if store_models else None
+            if fold_model is None:
+                fold_model = clone(model).fit(X[:train_end], y[:train_end])
+                if store_models:
+                    cache.put_object(make_key(fold_key, "model"), fold_model, kind="model")
+            labels = predict_labels(fold_model, X[train_end:test_end], threshold)
+            cache.put_array(make_key(fold_key, "predictions", threshold), labels, kind="predictions")
+        predictions.append(np.asarray(labels))
+
+    tested = data.iloc[start:]
+    return pd.concat([tested[TARGET], pd.Series(np.concatenate(predictions).astype(y.dtype),
+                                                index=tested.index, name="Predictions")], axis=1)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or clear the experiment cache")
+    parser.add_argument("--root", default=DEFAULT_ROOT)
+    parser.add_argument("--clear", action="store_true")
+    args = parser.parse_args()
+
+    cache = ExperimentCache(args.root)
+    if args.clear:
+        cache.clear()
+        print(f"🧹 Cleared {args.root}")
+    stats = cache.stats()
+    print(f"📁 Cache: {args.root}")
+    print(f"📊 Entries: {stats['entries']} {stats['entries_by_kind']}")
+    print(f"💾 Size: {stats['size_bytes'] / 1024 ** 2:.1f} MB / {stats['max_bytes'] / 1024 ** 2:.0f} MB")
@@ -0,0 +1,287 @@
+"""
+Vectorized feature engine for the XAUUSD random forest.
+
+Computes exactly the 19 features of the notebook's ``final_predictors`` (same order, same
+definitions) directly on NumPy arrays:
+
+    <CLOSE>, <TICKVOL>, <OPEN>, <HIGH>, <LOW>,
+    BODY_SIZE, UPPER_WICK, LOWER_WICK, CLOSE_POSITION,
+    Close_Ratio_N, Trend_N   for N in 2, 5, 55, 125, 750
+
+Rolling windows are evaluated from cumulative sums in O(n) regardless of window length and
+every feature is written straight into one preallocated, C-ordered float32 matrix, which is
+what both ``RandomForestClassifier.fit`` (it converts to float32 internally) and the ONNX
+session (``FloatTensorType``) consume, so no further copies are needed.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+HORIZONS = [2, 5, 55, 125, 750]
+
+BASE_FEATURES = ["<CLOSE>", "<TICKVOL>", "<OPEN>", "<HIGH>", "<LOW>"]
+CANDLE_FEATURES = ["BODY_SIZE", "UPPER_WICK", "LOWER_WICK", "CLOSE_POSITION"]
+TREND_FEATURES = [name for h in HORIZONS for name in (f"Close_Ratio_{h}", f"Trend_{h}")]
+
+# Same order as the notebook's final_predictors and the EA's PrepareFeatures
+FEATURE_NAMES = BASE_FEATURES + CANDLE_FEATURES + TREND_FEATURES
+
+TARGET = "<TRGT>"
+
+# Rows filled per staging block in compute_features
+BLOCK_ROWS = 65536
+
+
+def compute_target(close: np.ndarray) -> np.ndarray:
+    """
+    Next-bar direction target, identical to ``(data["<NexH>"] > data["<CLOSE>"]).astype(int)``.
+
+    The last bar has no next close and gets 0, as in the notebook.
+    """
+    close = np.asarray(close)
+    target = np.zeros(len(close), dtype=np.int8)
+    np.greater(close[1:], close[:-1], out=target[:-1])
+    return target
+
+
+def compute_features(open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                     tickvol: np.ndarray, out: np.ndarray = None, target: np.ndarray = None,
+                     block_rows: int = BLOCK_ROWS) -> np.ndarray:
+    """
+    Compute the 19 model features for every bar.
+
+    Rows whose windows are not yet full (or whose candle range is zero, making
+    ``CLOSE_POSITION`` undefined) contain NaN, exactly where the notebook's DataFrame has NaN
+    before ``dropna()``. Use :func:`valid_rows` to get the mask of usable rows.
+
+    The rolling windows are read from two global prefix sums (close and target); the matrix
+    itself is filled in row blocks through a small feature-major staging buffer, so every
+    write into ``out`` is a contiguous run of whole rows.
+
+    Args:
+        open_, high, low, close, tickvol (np.ndarray): Bar columns, any numeric dtype.
+        out (np.ndarray): Optional preallocated ``(n, 19)`` float32 C-ordered matrix.
+        target (np.ndarray): Optional precomputed :func:`compute_target` result.
+        block_rows (int): Rows per staging block.
+
+    Returns:
+        np.ndarray: The ``(n, 19)`` float32 feature matrix (``out`` if given).
+    """
+    n = len(close)
+    width = len(FEATURE_NAMES)
+    if out is None:
+        out = np.empty((n, width), dtype=np.float32)
+    elif out.shape != (n, width) or out.dtype != np.float32 or not out.flags.c_contiguous:
+        raise ValueError(f"out must be a C-contiguous float32 array of shape ({n}, {width})")
+    if n == 0:
+        return out
+
+    if target is None:
+        target = compute_target(close)
+
+    # Prefix sums shared by all horizons (close relative to its first value for precision)
+    offset = float(close[0])
+    close_csum = np.empty(n + 1, dtype=np.float64)
+    close_csum[0] = 0.0
+    np.cumsum(np.asarray(close, dtype=np.float64) - offset, out=close_csum[1:])
+    target_csum = np.empty(n + 1, dtype=np.int64)
+    target_csum[0] = 0
+    np.cumsum(target, out=target_csum[1:])
+
+    stage = np.empty((width, min(block_rows, n)), dtype=np.float32)
+    for start in range(0, n, block_rows):
+        stop = min(start + block_rows, n)
+        rows = stop - start
+        block = stage[:, :rows]
+
+        o = np.asarray(open_[start:stop], dtype=np.float64)
+        h = np.asarray(high[start:stop], dtype=np.float64)
+        l = np.asarray(low[start:stop], dtype=np.float64)
+        c = np.asarray(close[start:stop], dtype=np.float64)
+
+        block[0] = c
+        block[1] = tickvol[start:stop]
+        block[2] = o
+        block[3] = h
+        block[4] = l
+
+        block[5] = np.abs(c - o)
+        block[6] = h - np.maximum(o, c)
+        block[7] = np.minimum(o, c) - l
+        with np.errstate(divide="ignore", invalid="ignore"):
+            block[8] = (c - l) / (h - l)
+
+        row = 9
+        for horizon in HORIZONS:
+            # Close_Ratio: defined from index horizon - 1 (full window including the bar)
+            first = min(max(horizon - 1 - start, 0), rows)
+            block[row, :first] = np.nan
+            t = np.arange(start + first, stop)
+            mean = (close_csum[t + 1] - close_csum[t + 1 - horizon]) / horizon + offset
+            with np.errstate(divide="ignore", invalid="ignore"):
+                block[row, first:] = c[first:] / mean
+
+            # Trend: sum of the previous `horizon` targets, defined from index horizon
+            first = min(max(horizon - start, 0), rows)
+            block[row + 1, :first] = np.nan
+            t = t[t >= horizon] if len(t) else t
+            block[row + 1, first:] = target_csum[t] - target_csum[t - horizon]
+            row += 2
+
+        out[start:stop] = block.T
+
+    return out
+
+
+def valid_rows(features: np.ndarray, drop_last: bool = True) -> np.ndarray:
+    """
+    Boolean mask of rows the notebook keeps after ``dropna()``.
+
+    A row is dropped if any feature is NaN/inf (window warm-up, zero-range candles) and, by
+    default, the last row, whose ``<NexH>`` (and therefore target) is unknown.
+    """
+    mask = np.isfinite(features).all(axis=1)
+    if drop_last and len(mask):
+        mask[-1] = False
+    return mask
+
+
+def build_dataset(data, drop_last: bool = True) -> tuple:
+    """
+    Build the model matrix and target from bars.
+
+    Args:
+        data: A DataFrame with the notebook's ``<OPEN> <HIGH> <LOW> <CLOSE> <TICKVOL>``
+            columns, or a dict of ``open/high/low/close/tickvol`` arrays (e.g. ``BarStore.slice``).
+        drop_last (bool): Drop the final bar whose next close is unknown.
+
+    Returns:
+        tuple: ``(X, y, rows)`` where ``X`` is the float32 feature matrix of valid rows,
+        ``y`` the int8 target and ``rows`` the integer positions of those rows in ``data``.
+    """
+    if isinstance(data, pd.DataFrame):
+        columns = [data[name].to_numpy() for name in ("<OPEN>", "<HIGH>", "<LOW>", "<CLOSE>", "<TICKVOL>")]
+    else:
+        columns = [data[name] for name in ("open", "high", "low", "close", "tickvol")]
+
+    target = compute_target(columns[3])
+    features = compute_features(*columns, target=target)
+    rows = np.flatnonzero(valid_rows(features, drop_last=drop_last))
+    return np.ascontiguousarray(features[rows]), target[rows], rows
+
+
+def feature_frame(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Return ``data`` with ``<TRGT>`` and the 19 feature columns added and NaN rows dropped.
+
+    A drop-in replacement for the notebook's target, feature and candle-pattern cells.
+    """
+    X, y, rows = build_dataset(data)
+    frame = data.iloc[rows].copy()
+    frame[TARGET] = y.astype(int)
+    for j, name in enumerate(FEATURE_NAMES):
+        if name not in BASE_FEATURES:
+            frame[name] = X[:, j]
+    return frame
+
+
+def compute_features_pandas(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reference implementation: the notebook's feature cells, verbatim.
+
+    Kept for parity checks and as the baseline in :func:`benchmark`.
+    """
+    data = data.copy()
+    data["<NexH>"] = data["<CLOSE>"].shift(-1)
+    data["<TRGT>"] = (data["<NexH>"] > data["<CLOSE>"]).astype(int)
+
+    new_predictors = []
+    numeric_columns = data.select_dtypes(include=[float, int]).columns
+    for i in HORIZONS:
+        rolling_averages = data[numeric_columns].rolling(i).mean()
+        ratio_column = f"Close_Ratio_{i}"
+        data[ratio_column] = data["<CLOSE>"] / rolling_averages["<CLOSE>"]
+        trend_column = f"Trend_{i}"
+        data[trend_column] = data["<TRGT>"].shift(1).rolling(i).sum()
+        new_predictors += [ratio_column, trend_column]
+    data = data.dropna()
+
+    data = data.copy()
+    data['BODY_SIZE'] = abs(data['<CLOSE>'] - data['<OPEN>'])
+    data['UPPER_WICK'] = data['<HIGH>'] - data[['<OPEN>', '<CLOSE>']].max(axis=1)
+    data['LOWER_WICK'] = data[['<OPEN>', '<CLOSE>']].min(axis=1) - data['<LOW>']
+    data['PRICE_RANGE'] = data['<HIGH>'] - data['<LOW>']
+    data['CLOSE_POSITION'] = (data['<CLOSE>'] - data['<LOW>']) / data['PRICE_RANGE']
+    return data.dropna()
+
+
+def synthetic_bars(n_bars: int, seed: int = 1) -> pd.DataFrame:
+    """Random-walk OHLCV bars with the notebook's column names (for benchmarks)."""
+    rng = np.random.default_rng(seed)
+    close = 1300.0 * np.exp(np.cumsum(rng.normal(0.0, 0.002, n_bars)))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    spread = np.abs(rng.normal(0.0, 0.001, (2, n_bars)))
+    return pd.DataFrame({
+        "<OPEN>": open_.round(3),
+        "<HIGH>": (np.maximum(open_, close) * (1 + spread[0])).round(3),
+        "<LOW>": (np.minimum(open_, close) * (1 - spread[1])).round(3),
+        "<CLOSE>": close.round(3),
+        "<TICKVOL>": rng.integers(100, 5000, n_bars),
+    })
+
+
+def benchmark(n_bars: int = 10_000_000, compare_pandas: bool = True) -> dict:
+    """
+    Time the vectorized engine against the notebook's pandas cells on synthetic bars.
+
+    Returns:
+        dict: Timings in seconds, throughput in bars/s and the max absolute feature difference.
+    """
+    data = synthetic_bars(n_bars)
+    columns = [data[name].to_numpy() for name in ("<OPEN>", "<HIGH>", "<LOW>", "<CLOSE>", "<TICKVOL>")]
+    out = np.empty((n_bars, len(FEATURE_NAMES)), dtype=np.float32)
+
+    started = time.perf_counter()
+    compute_features(*columns, out=out)
+    engine_seconds = time.perf_counter() - started
+
+    result = {
+        "bars": n_bars,
+        "engine_seconds": engine_seconds,
+        "engine_bars_per_second": n_bars / engine_seconds,
+    }
+
+    if compare_pandas:
+        started = time.perf_counter()
+        reference = compute_features_pandas(data)
+        pandas_seconds = time.perf_counter() - started
+
+        rows = reference.index.to_numpy()
+        diff = np.abs(out[rows] - reference[FEATURE_NAMES].to_numpy(dtype=np.float32))
+        scale = np.maximum(np.abs(reference[FEATURE_NAMES].to_numpy()), 1.0)
+        result.update({
+            "pandas_seconds": pandas_seconds,
+            "pandas_bars_per_second": n_bars / pandas_seconds,
+            "speedup": pandas_seconds / engine_seconds,
+            "max_relative_difference": float((diff / scale).max()),
+        })
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized feature engine")
+    parser.add_argument("--bars", type=int, default=10_000_000, help="Synthetic bars to generate")
+    parser.add_argument("--skip-pandas", action="store_true", help="Only time the vectorized engine")
+    args = parser.parse_args()
+
+    print(f"🔧 Benchmarking feature engine on {args.bars:,} synthetic bars...")
+    stats = benchmark(args.bars, compare_pandas=not args.skip_pandas)
+    print(f"⚡ Engine: {stats['engine_seconds']:.3f}s ({stats['engine_bars_per_second']:,.0f} bars/s)")
+    if "pandas_seconds" in stats:
+        print(f"🐼 Pandas: {stats['pandas_seconds']:.3f}s ({stats['pandas_bars_per_second']:,.0f} bars/s)")
+        print(f"🚀 Speedup: {stats['speedup']:.1f}x")
+        print(f"🎯 Max relative difference vs pandas: {stats['max_relative_difference']:.2e}")
@@ -0,0 +1,382 @@
+"""
+Walk-forward permutation importance and backward feature elimination for the forest.
+
+The notebook chooses between ``extended_predictors`` and ``final_predictors`` with two full
+``backtestor`` runs and reads ``feature_importances_``, which is impurity-based and favours
+continuous, high-cardinality columns such as the raw prices. Here a feature's importance is
+the drop in walk-forward precision when its values are shuffled inside each test window:
+
+    importance(f) = precision(all folds) - mean_r precision(all folds, column f permuted, repeat r)
+
+Each fold is one process-pool task. The worker takes the fold's fitted model from the
+:class:`~experiment_cache.ExperimentCache` (the same per-fold models ``cached_backtestor``
+stores) or fits it when it is missing, then scores the unshuffled test rows and every
+``(feature, repeat)`` shuffle in a single ``predict_proba`` call. The feature matrix lives in
+shared memory (``backtest.SharedArrays``); new models and the per-fold probabilities are
+cached by fold key.
+
+:func:`backward_elimination` drops the least important feature, re-scores the smaller set on
+the same folds and repeats. Every step is cached, so re-running a selection, or extending it
+to fewer features, only fits what has not been fitted before. The chosen subset can be exported
+as a narrower ONNX model (:func:`export_subset`).
+"""
+
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+
+from backtest import TARGET, SharedArrays, attach_shared, worker_state
+from experiment_cache import DEFAULT_ROOT, ExperimentCache, fold_keys, make_key
+
+DEFAULT_REPEATS = 5
+DEFAULT_MIN_FEATURES = 3
+METRICS = ["precision", "auc"]
+
+
+# -----------------------------------------------------------------------------------------
+#  Scoring
+# -----------------------------------------------------------------------------------------
+
+def positive_labels(proba: np.ndarray, threshold: float = None) -> np.ndarray:
+    """
+    Labels from class-1 probabilities, as ``backtest.predict_labels``.
+
+    Without a threshold this is the forest's ``predict`` (argmax, ties to class 0).
+    """
+    return proba > 0.5 if threshold is None else proba >= threshold
+
+
+def score(y_true: np.ndarray, proba: np.ndarray, threshold: float = None) -> dict:
+    """Pooled precision, positive count and ROC AUC of class-1 probabilities."""
+    predicted = positive_labels(proba, threshold)
+    n_positive = int(predicted.sum())
+    precision = float(y_true[predicted].mean()) if n_positive else 0.0
+    auc = float(roc_auc_score(y_true, proba)) if 0 < y_true.sum() < len(y_true) else np.nan
+    return {"precision": precision, "n_positive": n_positive, "auc": auc}
+
+
+def select_folds(folds: list, max_folds: int = None) -> list:
+    """Up to ``max_folds`` folds spread evenly over the history (always including the last)."""
+    if max_folds is None or max_folds >= len(folds):
+        return list(folds)
+    picks = np.unique(np.linspace(0, len(folds) - 1, max_folds).round().astype(int))
+    return [folds[i] for i in picks]
+
+
+# -----------------------------------------------------------------------------------------
+#  Worker side
+# -----------------------------------------------------------------------------------------
+
+def _permute_fold(task: tuple) -> tuple:
+    """
+    Worker task: load or fit one fold's model and score its test rows unshuffled and with
+    every column permuted ``n_repeats`` times.
+
+    Returns:
+        tuple: ``(train_end, result, fitted_model_or_None)``; ``result["proba"]`` has one row
+        for the unshuffled test rows followed by ``n_features * n_repeats`` shuffled rows.
+    """
+    (train_end, test_end), columns, model_path, n_repeats, seed = task
+    state = worker_state()
+    X, y = state["X"], state["y"]
+
+    fitted = None
+    if model_path is not None:
+        with open(model_path, "rb") as file:
+            model = pickle.load(file)
+    else:
+        model = clone(state["model"])
+        if "n_jobs" in model.get_params():
+            model.set_params(n_jobs=1)
+        fitted = model.fit(X[:train_end, columns], y[:train_end])
+
+    test = X[train_end:test_end, columns]
+    n_test, n_features = test.shape
+    rng = np.random.default_rng([seed, train_end])
+    batch = np.tile(test, (1 + n_features * n_repeats, 1))
+    for j in range(n_features):
+        for r in range(n_repeats):
+            block = 1 + j * n_repeats + r
+            batch[block * n_test:(block + 1) * n_test, j] = test[rng.permutation(n_test), j]
+
+    proba = model.predict_proba(batch)
+    classes = list(model.classes_)
+    positive = proba[:, classes.index(1)] if 1 in classes else np.zeros(len(batch))
+    result = {"proba": positive.astype(np.float32).reshape(-1, n_test),
+              "impurity": np.asarray(getattr(model, "feature_importances_", np.full(n_features, np.nan)))}
+    return train_end, result, fitted
+
+
+# -----------------------------------------------------------------------------------------
+#  Importance and elimination
+# -----------------------------------------------------------------------------------------
+
+def permutation_importance(data, predictors, model=None, cache: ExperimentCache = None, start: int = 2500,
+                           step: int = 250, threshold: float = None, max_folds: int = None,
+                           n_repeats: int = DEFAULT_REPEATS, seed: int = 1, n_jobs: int = None) -> pd.DataFrame:
+    """
+    Walk-forward permutation importance of every predictor.
+
+    Args:
+        data (pd.DataFrame): Frame with the predictor columns and ``<TRGT>``.
+        predictors (list): Feature columns, in model input order.
+        model: Unfitted classifier (default: the notebook's optimized forest).
+        cache (ExperimentCache): Fold models and probabilities (default: ``.cache/experiments``).
+        start, step (int): Walk-forward layout, as ``backtestor``.
+        threshold (float): Class-1 probability threshold for precision (None = ``predict``).
+        max_folds (int): Score an evenly spread subset of folds (None = every fold).
+        n_repeats (int): Shuffles per feature and fold.
+        seed (int): Seed of the shuffles.
+        n_jobs (int): Worker processes (default: all cores).
+
+    Returns:
+        pd.DataFrame: One row per predictor, most important first: mean/std precision and AUC
+        drop over repeats and the folds' mean impurity importance. ``attrs`` holds the
+        unshuffled ``precision``, ``auc``, ``n_positive``, ``folds`` and ``fitted`` (folds
+        that had no cached model).
+    """
+    model = model if model is not None else default_model()
+    cache = cache if cache is not None else ExperimentCache(DEFAULT_ROOT)
+    predictors = list(predictors)
+    with _fold_pool(data, predictors, model, n_jobs) as pool:
+        return _score_subset(data, predictors, np.arange(len(predictors)), pool, model, cache, start, step,
+                             threshold, max_folds, n_repeats, seed)
+
+
+@contextmanager
+def _fold_pool(data, predictors: list, model, n_jobs: int = None):
+    """Process pool whose workers map ``data[predictors]`` (float32) and the target from shared memory."""
+    X = np.ascontiguousarray(data[predictors].to_numpy(dtype=np.float32))
+    with SharedArrays(X=X, y=data[TARGET].to_numpy()) as shared:
+        spec = {"arrays": shared.spec, "model": model, "threshold": None}
+        with ProcessPoolExecutor(max_workers=n_jobs or os.cpu_count() or 1,
+                                 initializer=attach_shared, initargs=(spec,)) as pool:
+            yield pool
+
+
+def _score_subset(data, predictors: list, columns: np.ndarray, pool, model, cache: ExperimentCache,
+                  start: int, step: int, threshold: float, max_folds: int, n_repeats: int,
+                  seed: int) -> pd.DataFrame:
+    """:func:`permutation_importance` of ``predictors`` (columns ``columns`` of the pool's matrix)."""
+    y = data[TARGET].to_numpy()
+    keyed = dict(fold_keys(data, model, predictors, start, step))
+    folds = select_folds(list(keyed), max_folds)
+    if not folds:
+        raise ValueError(f"Not enough rows ({len(data)}) for a walk-forward starting at {start}")
+    result_keys = {bounds: make_key(keyed[bounds], "permutation", n_repeats, seed) for bounds in folds}
+
+    results = {}
+    tasks = []
+    for bounds in folds:
+        cached = cache.get_object(result_keys[bounds])
+        if cached is not None:
+            results[bounds[0]] = cached
+            continue
+        # Workers read cached models straight from disk; only this process updates the index
+        model_key = make_key(keyed[bounds], "model")
+        model_path = cache.object_path(model_key)
+        tasks.append((bounds, columns, model_path, n_repeats, seed))
+
+    fitted = 0
+    # Largest training sets first keeps the pool busy until the end
+    tasks.sort(key=lambda task: -task[0][0])
+    test_ends = dict(folds)
+    for train_end, result, fold_model in pool.map(_permute_fold, tasks, chunksize=1):
+        fold_key = keyed[(train_end, test_ends[train_end])]
+        if fold_model is not None:
+            cache.put_object(make_key(fold_key, "model"), fold_model, kind="model")
+            fitted += 1
+        cache.put_object(make_key(fold_key, "permutation", n_repeats, seed), result, kind="permutation")
+        results[train_end] = result
+
+    y_true = np.concatenate([y[train_end:test_end] for train_end, test_end in folds])
+    proba = np.concatenate([results[train_end]["proba"] for train_end, _ in folds], axis=1)
+    base = score(y_true, proba[0], threshold)
+
+    rows = []
+    for j, name in enumerate(predictors):
+        shuffled = [score(y_true, proba[1 + j * n_repeats + r], threshold) for r in range(n_repeats)]
+        precision_drop = base["precision"] - np.array([s["precision"] for s in shuffled])
+        auc_drop = base["auc"] - np.array([s["auc"] for s in shuffled])
+        impurity = np.mean([results[train_end]["impurity"][j] for train_end, _ in folds])
+        rows.append({"feature": name, "precision_drop": precision_drop.mean(),
+                     "precision_drop_std": precision_drop.std(), "auc_drop": auc_drop.mean(),
+                     "auc_drop_std": auc_drop.std(), "impurity": impurity})
+
+    table = (pd.DataFrame(rows).sort_values(["precision_drop", "auc_drop"], ascending=False)
+             .reset_index(drop=True))
+    table.attrs.update({**base, "folds": len(folds), "fitted": fitted})
+    return table
+
+
+def backward_elimination(data, predictors, model=None, cache: ExperimentCache = None, start: int = 2500,
+                         step: int = 250, threshold: float = None, max_folds: int = None,
+                         n_repeats: int = DEFAULT_REPEATS, min_features: int = DEFAULT_MIN_FEATURES,
+                         metric: str = "precision", tolerance: float = 0.0, seed: int = 1,
+                         n_jobs: int = None, verbose: bool = True) -> pd.DataFrame:
+    """
+    Drop the least important feature until ``min_features`` remain.
+
+    Every step scores the current set with :func:`permutation_importance` on the same folds
+    (one shared-memory pool serves all steps) and removes the feature whose shuffling costs
+    the least ``metric`` (``"precision"`` or ``"auc"`` drop).
+
+    Args:
+        min_features (int): Smallest subset evaluated.
+        metric (str): Importance used to pick the feature to drop.
+        tolerance (float): The selected subset is the smallest one whose precision is within
+            ``tolerance`` of the best step.
+
+    See :func:`permutation_importance` for the remaining arguments.
+
+    Returns:
+        pd.DataFrame: One row per step: ``n_features``, ``precision``, ``auc``,
+        ``n_positive``, ``dropped`` (the feature removed after the step), ``features``,
+        ``fitted`` and ``seconds``. ``attrs["selected"]`` is the chosen subset,
+        ``attrs["importance"]`` the importance table of the full set.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of {METRICS}, got {metric!r}")
+    model = model if model is not None else default_model()
+    cache = cache if cache is not None else ExperimentCache(DEFAULT_ROOT)
+    predictors = list(predictors)
+    columns = pd.Series(np.arange(len(predictors)), index=predictors)
+
+    steps = []
+    importance = None
+    current = list(predictors)
+    with _fold_pool(data, predictors, model, n_jobs) as pool:
+        while True:
+            started = time.perf_counter()
+            table = _score_subset(data, current, columns[current].to_numpy(), pool, model, cache, start, step,
+                                  threshold, max_folds, n_repeats, seed)
+            importance = table if importance is None else importance
+            ranked = table.sort_values([f"{metric}_drop", "precision_drop" if metric == "auc" else "auc_drop"])
+            dropped = ranked["feature"].iloc[0] if len(current) > min_features else None
+            steps.append({"n_features": len(current), "precision": table.attrs["precision"],
+                          "auc": table.attrs["auc"], "n_positive": table.attrs["n_positive"],
+                          "dropped": dropped, "features": list(current), "fitted": table.attrs["fitted"],
+                          "seconds": time.perf_counter() - started})
+            if verbose:
+                print(f"🔁 {len(current):>2} features: precision {table.attrs['precision']:.4f}, "
+                      f"AUC {table.attrs['auc']:.4f}, {table.attrs['fitted']} folds fitted "
+                      f"({steps[-1]['seconds']:.1f}s)" + (f" -> drop {dropped}" if dropped else ""))
+            if dropped is None:
+                break
+            current.remove(dropped)
+
+    path = pd.DataFrame(steps)
+    best = path["precision"].max()
+    chosen = path[path["precision"] >= best - tolerance].sort_values("n_features").iloc[0]
+    path.attrs.update({"selected": list(chosen["features"]), "importance": importance,
+                       "folds": importance.attrs["folds"]})
+    return path
+
+
+# -----------------------------------------------------------------------------------------
+#  Export
+# -----------------------------------------------------------------------------------------
+
+def default_model():
+    """The notebook's optimized forest (``training_pipeline.DEFAULT_MODEL_PARAMS``)."""
+    from training_pipeline import DEFAULT_MODEL_PARAMS
+
+    return RandomForestClassifier(**DEFAULT_MODEL_PARAMS)
+
+
+def export_subset(data, features: list, out_dir: str, model=None, symbol: str = "XAUUSD",
+                  precision: float = None, target_opset: int = 11) -> dict:
+    """
+    Fit ``model`` on all rows of ``features`` and export it with an input of ``len(features)``.
+
+    Writes ``model.onnx`` and ``feature_names.txt`` (the EA's feature layout file) to ``out_dir``.
+
+    Returns:
+        dict: Paths, input width, ONNX size and the ONNX/sklearn max probability difference.
+    """
+    from onnx_export import export_forest
+    from onnx_utils import make_session, probabilities
+    from training_pipeline import write_feature_names
+
+    model = clone(model if model is not None else default_model())
+    X = np.ascontiguousarray(data[features].to_numpy(dtype=np.float32))
+    model.fit(X, data[TARGET].to_numpy())
+
+    os.makedirs(out_dir, exist_ok=True)
+    payload = export_forest(model, len(features), zipmap=False, target_opset=target_opset).SerializeToString()
+    model_path = os.path.join(out_dir, "model.onnx")
+    with open(model_path, "wb") as file:
+        file.write(payload)
+    names_path = os.path.join(out_dir, "feature_names.txt")
+    write_feature_names(names_path, features, symbol, precision if precision is not None else float("nan"))
+
+    check = X[-min(len(X), 1000):]
+    session = make_session(payload)
+    onnx_proba = probabilities(session.run(None, {session.get_inputs()[0].name: check}))
+    return {"model_path": model_path, "feature_names_path": names_path, "n_features": len(features),
+            "onnx_kb": len(payload) / 1024,
+            "onnx_max_abs_diff": float(np.abs(onnx_proba - model.predict_proba(check)).max())}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from bar_store import load_bars
+    from feature_engine import FEATURE_NAMES, feature_frame
+
+    parser = argparse.ArgumentParser(description="Permutation importance and backward elimination for the XAUUSD forest")
+    parser.add_argument("path", nargs="?", default="XAUUSDm_H1_201801020600_202412310000.csv",
+                        help="MT5 CSV export or bar store directory")
+    parser.add_argument("--folds", type=int, default=24, help="Evenly spread folds to score (0 = all)")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--min-features", type=int, default=DEFAULT_MIN_FEATURES)
+    parser.add_argument("--metric", choices=METRICS, default="precision")
+    parser.add_argument("--tolerance", type=float, default=0.0,
+                        help="Prefer the smallest subset within this precision of the best")
+    parser.add_argument("--threshold", type=float, default=None)
+    parser.add_argument("--trees", type=int, default=None, help="Override n_estimators")
+    parser.add_argument("--jobs", type=int, default=None)
+    parser.add_argument("--cache", default=DEFAULT_ROOT)
+    parser.add_argument("--export", default=None, help="Fit and export the selected subset to this directory")
+    parser.add_argument("--out", default="feature_selection.csv")
+    args = parser.parse_args()
+
+    data = feature_frame(load_bars(args.path))
+    model = default_model()
+    if args.trees:
+        model.set_params(n_estimators=args.trees)
+    cache = ExperimentCache(args.cache)
+    print(f"🎯 Backward elimination over {len(FEATURE_NAMES)} features on {len(data):,} rows")
+
+    started = time.perf_counter()
+    path = backward_elimination(data, FEATURE_NAMES, model, cache, threshold=args.threshold,
+                                max_folds=args.folds or None, n_repeats=args.repeats,
+                                min_features=args.min_features, metric=args.metric,
+                                tolerance=args.tolerance, n_jobs=args.jobs)
+    importance = path.attrs["importance"]
+
+    print(f"\n📊 Permutation importance ({path.attrs['folds']} folds x {args.repeats} shuffles):")
+    print(importance.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    selected = path.attrs["selected"]
+    best = path[path["n_features"] == len(selected)].iloc[0]
+    print(f"\n🏆 Selected {len(selected)}/{len(FEATURE_NAMES)} features, precision {best['precision']:.4f} "
+          f"(all features: {path['precision'].iloc[0]:.4f}): {selected}")
+    cache.close()
+    stats = cache.stats()
+    print(f"⏱️  {time.perf_counter() - started:.1f}s, {int(path['fitted'].sum())} fold fits, "
+          f"cache hit rate {stats['hit_rate']:.1%}")
+    path.drop(columns="features").assign(features=path["features"].map(" ".join)).to_csv(args.out, index=False)
+    print(f"📝 Saved elimination path to: {args.out}")
+
+    if args.export:
+        report = export_subset(data, selected, args.export, model, precision=best["precision"])
+        print(f"📦 Exported {report['n_features']}-input model to {report['model_path']} "
+              f"({report['onnx_kb']:.0f} KB, max |ONNX - sklearn| {report['onnx_max_abs_diff']:.2e})")
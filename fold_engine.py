@@ -0,0 +1,236 @@
+"""
+Walk-forward folds as views into one contiguous feature matrix.
+
+``backtestor`` copies ``data.iloc[0:i]`` and ``data.iloc[i:i+step]`` for every fold, and
+``predors`` then builds ``train[predictors]`` from the copy, which sklearn converts to float32
+once more. Every fold therefore materialises the whole history seen so far, several times, so
+memory traffic grows quadratically with history length / fold count.
+
+:class:`FoldMatrix` holds the predictors once as a C-ordered float32 matrix plus the label
+vector. A fold is a pair of row ranges, and ``X[:train_end]`` / ``X[train_end:test_end]`` are
+plain NumPy views. They are already the dtype and layout the forest wants, so ``fit`` and
+``predict`` get them without a copy. :func:`fold_backtestor` returns exactly the frame
+``backtestor`` returns.
+
+:func:`memory_report` runs both engines in fresh processes for increasing fold counts and
+reports peak allocations, peak RSS and the feature bytes each walk-forward copies.
+"""
+
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from backtest import TARGET, backtestor, fold_bounds, predict_labels
+
+
+class FoldMatrix:
+    """
+    Predictors as one C-ordered float32 matrix, the target as one label vector.
+
+    Args:
+        X (np.ndarray): ``(n, p)`` features; converted to C-ordered float32 if it is not already.
+        y (np.ndarray): ``(n,)`` labels.
+        index: Row labels used for the prediction frame (default ``RangeIndex``).
+    """
+
+    def __init__(self, X: np.ndarray, y: np.ndarray, index=None):
+        self.X = np.ascontiguousarray(X, dtype=np.float32)
+        self.y = np.ascontiguousarray(y)
+        self.index = index if index is not None else pd.RangeIndex(len(self.y))
+        if len(self.X) != len(self.y):
+            raise ValueError(f"X has {len(self.X)} rows but y has {len(self.y)}")
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame, predictors: list, target: str = TARGET) -> "FoldMatrix":
+        """Fill the matrix column by column, so no float64 copy of the predictor block is made."""
+        X = np.empty((len(data), len(predictors)), dtype=np.float32)
+        for j, name in enumerate(predictors):
+            X[:, j] = data[name].to_numpy()
+        return cls(X, data[target].to_numpy(), data.index)
+
+    @classmethod
+    def from_bars(cls, data) -> "FoldMatrix":
+        """Build straight from bars with ``feature_engine.build_dataset`` (no feature frame at all)."""
+        from feature_engine import build_dataset
+
+        X, y, rows = build_dataset(data)
+        index = data.index[rows] if isinstance(data, pd.DataFrame) else pd.Index(rows)
+        return cls(X, y.astype(np.int64), index)
+
+    def __len__(self) -> int:
+        return len(self.y)
+
+    @property
+    def nbytes(self) -> int:
+        return self.X.nbytes + self.y.nbytes
+
+    def folds(self, start: int = 2500, step: int = 250) -> list:
+        return fold_bounds(len(self), start, step)
+
+    def train(self, train_end: int) -> tuple:
+        """``(X, y)`` views of rows ``[0, train_end)``."""
+        return self.X[:train_end], self.y[:train_end]
+
+    def test(self, train_end: int, test_end: int) -> tuple:
+        """``(X, y)`` views of rows ``[train_end, test_end)``."""
+        return self.X[train_end:test_end], self.y[train_end:test_end]
+
+
+def fold_backtestor(data, model, predictors=None, start=2500, step=250, threshold=None):
+    """
+    ``backtestor`` over :class:`FoldMatrix` views.
+
+    Like ``backtestor`` the same estimator is refitted for every fold; predictions are written
+    into one preallocated array instead of concatenating per-fold frames.
+
+    Args:
+        data: A :class:`FoldMatrix`, or a frame with the predictor columns and ``<TRGT>``.
+        model: Unfitted sklearn classifier.
+        predictors (list): Feature columns (only needed when ``data`` is a frame).
+        start (int): First training size.
+        step (int): Test rows per fold.
+        threshold (float): Optional class-1 probability threshold (see ``predict_labels``).
+
+    Returns:
+        pd.DataFrame: ``<TRGT>`` and ``Predictions`` for every test row, as ``backtestor``.
+    """
+    matrix = data if isinstance(data, FoldMatrix) else FoldMatrix.from_frame(data, predictors)
+    folds = matrix.folds(start, step)
+    if not folds:
+        raise ValueError(f"Not enough rows ({len(matrix)}) for a walk-forward starting at {start}")
+
+    predictions = np.empty(len(matrix) - start, dtype=matrix.y.dtype)
+    for train_end, test_end in folds:
+        model.fit(*matrix.train(train_end))
+        X_test, _ = matrix.test(train_end, test_end)
+        predictions[train_end - start:test_end - start] = predict_labels(model, X_test, threshold)
+
+    index = matrix.index[start:]
+    return pd.concat([pd.Series(matrix.y[start:], index=index, name=TARGET),
+                      pd.Series(predictions, index=index, name="Predictions")], axis=1)
+
+
+# -----------------------------------------------------------------------------------------
+#  Memory report
+# -----------------------------------------------------------------------------------------
+
+ENGINES = ["backtestor", "fold_engine"]
+
+
+def copied_bytes(data: pd.DataFrame, predictors: list, folds: list, engine: str) -> int:
+    """
+    Feature/target bytes a walk-forward materialises outside the estimator, summed over folds.
+
+    For ``backtestor`` that is the two ``iloc`` copies, the predictor frames ``predors`` selects
+    from them and sklearn's float32 conversion of those; the fold engine hands out views.
+    """
+    if engine != "backtestor":
+        return 0
+    row_bytes = int(data.memory_usage(index=True).sum()) // max(len(data), 1)
+    predictor_row = len(predictors) * (data[predictors].to_numpy().itemsize + 4)
+    # Each fold copies rows [0, test_end) once as a frame and once more as predictors
+    return sum(test_end for _, test_end in folds) * (row_bytes + predictor_row)
+
+
+def _measure(path, n_bars: int, engine: str, n_folds: int, start: int, model_params: dict) -> dict:
+    """Run one walk-forward in this (fresh) process and return its timings and memory."""
+    from sklearn.ensemble import RandomForestClassifier
+
+    from feature_engine import FEATURE_NAMES, feature_frame, synthetic_bars
+    from profiling import Profiler
+
+    if path:
+        from bar_store import load_bars
+        bars = load_bars(path)
+    else:
+        bars = synthetic_bars(n_bars)
+    data = feature_frame(bars)
+    del bars
+    step = max((len(data) - start) // n_folds, 1)
+    folds = fold_bounds(len(data), start, step)
+    model = RandomForestClassifier(**model_params)
+
+    profiler = Profiler(trace_memory=True)
+    if engine == "backtestor":
+        with profiler.stage(engine, items=len(folds)):
+            backtestor(data, model, FEATURE_NAMES, start, step)
+    else:
+        matrix = FoldMatrix.from_frame(data, FEATURE_NAMES)
+        with profiler.stage(engine, items=len(folds)):
+            fold_backtestor(matrix, model, start=start, step=step)
+    record = profiler.records[-1]
+
+    return {"engine": engine, "rows": len(data), "folds": len(folds), "step": step,
+            "seconds": record["wall_s"], "peak_alloc_mb": record["peak_traced_mb"],
+            "rss_peak_mb": record["rss_peak_mb"], "rss_growth_mb": record["rss_growth_mb"],
+            "copied_mb": copied_bytes(data, FEATURE_NAMES, folds, engine) / 1024 ** 2}
+
+
+def memory_report(path: str = None, n_bars: int = 100_000, fold_counts=(10, 40, 160),
+                  engines: list = None, start: int = 2500, model_params: dict = None) -> pd.DataFrame:
+    """
+    Peak memory of ``backtestor`` vs :func:`fold_backtestor` as the number of folds grows.
+
+    Every run gets its own spawned process so peak RSS is not inherited from earlier runs.
+    ``peak_alloc_mb`` is the tracemalloc peak during the walk-forward (NumPy/pandas buffers
+    included) and ``copied_mb`` the feature bytes copied across all folds (see :func:`copied_bytes`).
+
+    Args:
+        path (str): MT5 CSV / bar store to use; synthetic bars when omitted.
+        n_bars (int): Synthetic bars (ignored with ``path``).
+        fold_counts: Fold counts to run (step = remaining rows / folds).
+        engines (list): Subset of ``ENGINES``.
+        start (int): First training size.
+        model_params (dict): ``RandomForestClassifier`` parameters (default: a tiny forest,
+            since only the data handling around ``fit`` is compared).
+
+    Returns:
+        pd.DataFrame: One row per engine and fold count.
+    """
+    engines = engines or ENGINES
+    model_params = model_params or {"n_estimators": 2, "max_depth": 4, "min_samples_leaf": 20,
+                                    "random_state": 1, "n_jobs": 1}
+    rows = []
+    context = multiprocessing.get_context("spawn")
+    for n_folds in fold_counts:
+        for engine in engines:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                rows.append(pool.submit(_measure, path, n_bars, engine, n_folds, start, model_params).result())
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from sklearn.ensemble import RandomForestClassifier
+
+    from bar_store import load_bars
+    from feature_engine import FEATURE_NAMES, feature_frame
+
+    parser = argparse.ArgumentParser(description="Zero-copy walk-forward folds and memory report")
+    parser.add_argument("path", nargs="?", default=None, help="MT5 CSV export or bar store (default: synthetic)")
+    parser.add_argument("--bars", type=int, default=100_000, help="Synthetic bars when no path is given")
+    parser.add_argument("--folds", type=int, nargs="+", default=[10, 40, 160])
+    parser.add_argument("--check", action="store_true", help="Verify predictions match backtestor")
+    args = parser.parse_args()
+
+    if args.check:
+        from feature_engine import synthetic_bars
+
+        data = feature_frame(load_bars(args.path) if args.path else synthetic_bars(20_000))
+        model = RandomForestClassifier(n_estimators=20, max_depth=8, random_state=1)
+        started = time.perf_counter()
+        reference = backtestor(data, model, FEATURE_NAMES)
+        reference_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        result = fold_backtestor(data, model, FEATURE_NAMES)
+        seconds = time.perf_counter() - started
+        print(f"{'✅' if result.equals(reference) else '❌'} fold_backtestor identical to backtestor "
+              f"({reference_seconds:.2f}s -> {seconds:.2f}s)")
+
+    print(f"🧠 Memory per walk-forward, each run in a fresh process (folds: {args.folds})")
+    report = memory_report(args.path, args.bars, args.folds)
+    print(report.to_string(index=False))
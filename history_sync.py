@@ -0,0 +1,215 @@
+"""
+Incremental MT5 history sync into local bar stores.
+
+Replaces hand-refreshed exports such as ``XAUUSDm_H1_201801020600_202412310000.csv``: for each
+``(symbol, timeframe)`` job the last stored bar is read from its ``bar_store.BarStore``, only
+the missing range is requested with chunked ``copy_rates_range`` calls, overlapping and
+still-forming bars are dropped, and every chunk is appended atomically (see
+``BarStore.append``). Re-running the sync is cheap and an interrupted run leaves a valid store.
+
+    history/
+        XAUUSDm_H1/     # one bar store per job
+        XAUUSDm_M15/
+
+The ``MetaTrader5`` module is passed in, so the sync runs against ``mt5_stub`` on machines
+without a terminal.
+"""
+
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from bar_store import META_FILE, BarStore, to_epoch_seconds
+
+DEFAULT_ROOT = "history"
+DEFAULT_START = "2018-01-01"
+DEFAULT_CHUNK_BARS = 50_000
+
+# Timeframe label -> (MetaTrader5 constant name, bar length in seconds)
+TIMEFRAMES = {
+    "M1": ("TIMEFRAME_M1", 60),
+    "M5": ("TIMEFRAME_M5", 300),
+    "M15": ("TIMEFRAME_M15", 900),
+    "M30": ("TIMEFRAME_M30", 1800),
+    "H1": ("TIMEFRAME_H1", 3600),
+    "H4": ("TIMEFRAME_H4", 14400),
+    "D1": ("TIMEFRAME_D1", 86400),
+}
+
+
+def store_path(root: str, symbol: str, timeframe: str) -> str:
+    return os.path.join(root, f"{symbol}_{timeframe}")
+
+
+def _utc(seconds: int) -> datetime:
+    return datetime.fromtimestamp(int(seconds), tz=timezone.utc)
+
+
+def forming_bar_time(mt5, symbol: str, mt5_timeframe: int):
+    """Open time of the terminal's current (still forming) bar, or None if it has no bars."""
+    rates = mt5.copy_rates_from_pos(symbol, mt5_timeframe, 0, 1)
+    if rates is None:
+        raise RuntimeError(f"copy_rates_from_pos({symbol}) failed: {mt5.last_error()}")
+    return int(rates["time"][-1]) if len(rates) else None
+
+
+def sync_symbol(mt5, store_dir: str, symbol: str, timeframe: str, start=DEFAULT_START, end=None,
+                chunk_bars: int = DEFAULT_CHUNK_BARS) -> dict:
+    """
+    Bring one bar store up to date from the terminal.
+
+    Args:
+        mt5: The ``MetaTrader5`` module (or ``mt5_stub``), already initialized.
+        store_dir (str): Bar store directory; created if missing.
+        symbol (str): Symbol as named by the broker (e.g. 'XAUUSDm').
+        timeframe (str): One of ``TIMEFRAMES``.
+        start: First bar time for an empty store.
+        end: Last bar time to fetch (default: the terminal's current time). The bar still
+            forming at ``end``, and the terminal's current bar, are never stored.
+        chunk_bars (int): Bars covered by each ``copy_rates_range`` request.
+
+    Returns:
+        dict: ``symbol``, ``timeframe``, ``fetched`` (rows returned by the terminal),
+        ``appended``, ``duplicates``, ``requests``, ``seconds``, ``bars_per_second`` and
+        ``last_time``.
+
+    Raises:
+        ValueError: Unknown timeframe.
+        RuntimeError: The terminal rejected a request.
+    """
+    if timeframe not in TIMEFRAMES:
+        raise ValueError(f"Unknown timeframe '{timeframe}', expected one of {list(TIMEFRAMES)}")
+    constant, seconds = TIMEFRAMES[timeframe]
+    mt5_timeframe = getattr(mt5, constant)
+
+    if os.path.exists(os.path.join(store_dir, META_FILE)):
+        store = BarStore.open(store_dir)
+    else:
+        store = BarStore.create(store_dir, symbol=symbol, timeframe=timeframe)
+
+    # Re-request the last stored bar so a gap at the boundary cannot go unnoticed; it is
+    # dropped again below together with any other overlap.
+    last_time = store.last_time if len(store) else None
+    begin = last_time if last_time is not None else to_epoch_seconds(start)
+    # "Now" is the terminal's server clock, which may differ from the local one: bars opening
+    # at or after the current bar's open are still forming
+    forming = forming_bar_time(mt5, symbol, mt5_timeframe)
+    closed_before = forming if forming is not None else int(time.time()) - seconds + 1
+    if end is not None:
+        closed_before = min(closed_before, to_epoch_seconds(end) - seconds + 1)
+
+    stats = {"symbol": symbol, "timeframe": timeframe, "fetched": 0, "appended": 0, "duplicates": 0,
+             "requests": 0}
+    started = time.perf_counter()
+    chunk_seconds = chunk_bars * seconds
+    for chunk_start in range(begin, closed_before, chunk_seconds):
+        chunk_end = min(chunk_start + chunk_seconds, closed_before)
+        rates = mt5.copy_rates_range(symbol, mt5_timeframe, _utc(chunk_start), _utc(chunk_end))
+        stats["requests"] += 1
+        if rates is None:
+            raise RuntimeError(f"copy_rates_range({symbol}, {timeframe}) failed: {mt5.last_error()}")
+        stats["fetched"] += len(rates)
+        if not len(rates):
+            continue
+
+        times = np.asarray(rates["time"], dtype=np.int64)
+        # Chunk bounds are inclusive on both ends: de-duplicate and drop what is already stored
+        times, first = np.unique(times, return_index=True)
+        closed = first[times < closed_before]
+        keep = closed[rates["time"][closed] > store.last_time] if len(store) else closed
+        # Forming bars are skipped, not duplicates
+        stats["duplicates"] += len(rates) - (len(first) - len(closed)) - len(keep)
+        if not len(keep):
+            continue
+
+        rows = rates[keep]
+        stats["appended"] += store.append({
+            "time": rows["time"], "open": rows["open"], "high": rows["high"], "low": rows["low"],
+            "close": rows["close"], "tickvol": rows["tick_volume"],
+        })
+
+    stats["seconds"] = time.perf_counter() - started
+    stats["bars_per_second"] = stats["fetched"] / stats["seconds"] if stats["seconds"] else 0.0
+    stats["last_time"] = _utc(store.last_time).strftime("%Y-%m-%d %H:%M") if len(store) else None
+    return stats
+
+
+def sync_history(jobs: list, root: str = DEFAULT_ROOT, mt5=None, account: str = None, start=DEFAULT_START,
+                 end=None, chunk_bars: int = DEFAULT_CHUNK_BARS, verbose: bool = True) -> pd.DataFrame:
+    """
+    Sync several ``(symbol, timeframe)`` jobs in one terminal session.
+
+    Args:
+        jobs (list): ``(symbol, timeframe)`` pairs.
+        root (str): Directory holding one bar store per job.
+        mt5: ``MetaTrader5`` module; imported if None.
+        account (str): Log in with ``mt5_login.login_mt5(account)`` first; otherwise the
+            terminal's current session is used via ``mt5.initialize()``.
+
+    Returns:
+        pd.DataFrame: One row of :func:`sync_symbol` statistics per job.
+    """
+    if mt5 is None:
+        import MetaTrader5 as mt5
+
+    if account is not None:
+        import mt5_login
+
+        mt5_login.login_mt5(account, verbose=False)
+        if not mt5_login.mt5_logged_in:
+            raise RuntimeError(f"Could not log in to MT5 with account '{account}'")
+    elif not mt5.initialize():
+        raise RuntimeError(f"MT5 initialize() failed: {mt5.last_error()}")
+
+    rows = []
+    try:
+        for symbol, timeframe in jobs:
+            stats = sync_symbol(mt5, store_path(root, symbol, timeframe), symbol, timeframe,
+                                start=start, end=end, chunk_bars=chunk_bars)
+            rows.append(stats)
+            if verbose:
+                print(f"✅ {symbol} {timeframe}: +{stats['appended']:,} bars "
+                      f"({stats['bars_per_second']:,.0f} bars/s, last {stats['last_time']})")
+    finally:
+        mt5.shutdown()
+    return pd.DataFrame(rows)
+
+
+def parse_jobs(specs: list) -> list:
+    """``["XAUUSDm:H1", "EURUSDm:M15"]`` -> ``[("XAUUSDm", "H1"), ("EURUSDm", "M15")]``."""
+    jobs = []
+    for spec in specs:
+        symbol, _, timeframe = spec.partition(":")
+        jobs.append((symbol, (timeframe or "H1").upper()))
+    return jobs
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Incrementally sync MT5 history into local bar stores")
+    parser.add_argument("jobs", nargs="*", default=["XAUUSDm:H1"], help="SYMBOL:TIMEFRAME pairs")
+    parser.add_argument("--root", default=DEFAULT_ROOT)
+    parser.add_argument("--account", default=None, help="Credentials name for mt5_login.login_mt5")
+    parser.add_argument("--start", default=DEFAULT_START, help="First bar for new stores")
+    parser.add_argument("--end", default=None)
+    parser.add_argument("--chunk-bars", type=int, default=DEFAULT_CHUNK_BARS)
+    parser.add_argument("--stub", action="store_true", help="Use mt5_stub instead of a real terminal")
+    args = parser.parse_args()
+
+    if args.stub:
+        import mt5_stub
+        mt5_stub.install()
+
+    import MetaTrader5
+
+    started = time.perf_counter()
+    report = sync_history(parse_jobs(args.jobs), root=args.root, mt5=MetaTrader5, account=args.account,
+                          start=args.start, end=args.end, chunk_bars=args.chunk_bars)
+    elapsed = time.perf_counter() - started
+    print(report.to_string(index=False))
+    print(f"📊 {report['fetched'].sum():,} bars fetched in {elapsed:.2f}s "
+          f"({report['fetched'].sum() / elapsed:,.0f} bars/s)")
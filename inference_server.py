@@ -0,0 +1,389 @@
+"""
+Micro-batching ONNX inference server for the exported forest.
+
+Many symbols/accounts send small scoring requests (usually one feature row) over a TCP or
+Unix socket. Requests that arrive within ``max_delay_ms`` of each other are coalesced into one
+``session.run`` call of up to ``max_batch_rows`` rows, which amortizes the per-call overhead of
+onnxruntime and the tree ensemble operator.
+
+Wire format (little-endian), one request/response pair at a time per connection:
+
+    request:   op:uint8  rows:uint32  cols:uint32  [rows * cols float32]
+    response:  status:uint8  rows:uint32  cols:uint32  [payload]
+
+``op`` 0 scores the rows and returns ``rows x n_classes`` float32 probabilities; ``op`` 1
+returns the server statistics as UTF-8 JSON (``rows`` = payload length). ``status`` 1 marks an
+error whose UTF-8 message is the payload.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from onnx_utils import make_session, probabilities
+
+HEADER = struct.Struct("<BII")
+OP_PREDICT = 0
+OP_STATS = 1
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+DEFAULT_MODEL = "xauusd_optimized_model.onnx"
+
+
+class MicroBatchServer:
+    """
+    asyncio server that batches concurrent requests into shared ``InferenceSession`` runs.
+
+    Args:
+        model_path (str): ONNX model to serve.
+        max_batch_rows (int): Upper bound on rows per ``session.run``.
+        max_delay_ms (float): Latency budget: how long the first queued request may wait for
+            others to join its batch.
+        intra_op_threads, inter_op_threads (int): onnxruntime thread pools (0 = default).
+        optimization (str): Graph optimization level (see ``onnx_utils.OPTIMIZATION_LEVELS``).
+    """
+
+    def __init__(self, model_path: str = DEFAULT_MODEL, max_batch_rows: int = 1024, max_delay_ms: float = 2.0,
+                 intra_op_threads: int = 1, inter_op_threads: int = 1, optimization: str = "all"):
+        self.session = make_session(model_path, intra_op_threads=intra_op_threads,
+                                    inter_op_threads=inter_op_threads, optimization=optimization)
+        self.input_name = self.session.get_inputs()[0].name
+        self.n_features = self.session.get_inputs()[0].shape[1]
+        self.max_batch_rows = max_batch_rows
+        self.max_delay = max_delay_ms / 1000.0
+
+        self.latencies = deque(maxlen=100_000)      # seconds, enqueue -> result
+        self.batch_rows = deque(maxlen=100_000)
+        self.rows_scored = 0
+        self.requests_served = 0
+        self.started_at = None
+
+        self._queue = None
+        self._servers = []
+        self._batcher = None
+        # One thread runs the session so the event loop keeps accepting requests meanwhile
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="onnx")
+
+    # -------------------------------------------------------------------------------------
+    #  Lifecycle
+    # -------------------------------------------------------------------------------------
+
+    async def start(self, host: str = "127.0.0.1", port: int = None, unix_path: str = None):
+        """Start listening on TCP ``host:port`` and/or a Unix socket. Returns the bound TCP port."""
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._batch_loop())
+        self.started_at = time.perf_counter()
+
+        bound_port = None
+        try:
+            if port is not None:
+                server = await asyncio.start_server(self._handle, host, port)
+                bound_port = server.sockets[0].getsockname()[1]
+                self._servers.append(server)
+            if unix_path is not None:
+                if os.path.exists(unix_path):
+                    os.remove(unix_path)
+                self._servers.append(await asyncio.start_unix_server(self._handle, unix_path))
+            if not self._servers:
+                raise ValueError("Provide a TCP port and/or a Unix socket path")
+        except BaseException:
+            # Leave nothing listening or pending behind a failed start
+            for server in self._servers:
+                server.close()
+            self._servers = []
+            self._batcher.cancel()
+            await asyncio.gather(self._batcher, return_exceptions=True)
+            raise
+        return bound_port
+
+    async def serve_forever(self):
+        await asyncio.gather(*(server.serve_forever() for server in self._servers))
+
+    async def stop(self):
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers = []
+        if self._batcher is not None:
+            self._batcher.cancel()
+        self._executor.shutdown(wait=False)
+
+    # -------------------------------------------------------------------------------------
+    #  Request handling
+    # -------------------------------------------------------------------------------------
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(HEADER.size)
+                except asyncio.IncompleteReadError:
+                    break
+                op, rows, cols = HEADER.unpack(header)
+
+                if op == OP_STATS:
+                    payload = json.dumps(self.stats()).encode()
+                    writer.write(HEADER.pack(STATUS_OK, len(payload), 0) + payload)
+                elif op == OP_PREDICT:
+                    body = await reader.readexactly(rows * cols * 4)
+                    if cols != self.n_features:
+                        self._write_error(writer, f"expected {self.n_features} features, got {cols}")
+                    elif rows == 0:
+                        self._write_error(writer, "no rows to score")
+                    else:
+                        X = np.frombuffer(body, dtype="<f4").reshape(rows, cols)
+                        future = asyncio.get_running_loop().create_future()
+                        await self._queue.put((X, future, time.perf_counter()))
+                        try:
+                            proba = await future
+                        except Exception as e:
+                            # Scoring failed (set by _batch_loop): report it, keep the connection
+                            self._write_error(writer, f"inference failed: {e}")
+                        else:
+                            writer.write(HEADER.pack(STATUS_OK, proba.shape[0], proba.shape[1]) + proba.tobytes())
+                else:
+                    self._write_error(writer, f"unknown op {op}")
+                await writer.drain()
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _write_error(writer: asyncio.StreamWriter, message: str) -> None:
+        payload = message.encode()
+        writer.write(HEADER.pack(STATUS_ERROR, len(payload), 0) + payload)
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            rows = len(batch[0][0])
+            deadline = loop.time() + self.max_delay
+
+            # Coalesce whatever arrives within the latency budget (or until the batch is full)
+            while rows < self.max_batch_rows:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                rows += len(item[0])
+
+            X = batch[0][0] if len(batch) == 1 else np.concatenate([item[0] for item in batch])
+            try:
+                proba = await loop.run_in_executor(self._executor, self._run, X)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            finished = time.perf_counter()
+            offset = 0
+            for X_item, future, enqueued in batch:
+                n = len(X_item)
+                if not future.done():
+                    future.set_result(proba[offset:offset + n])
+                offset += n
+                self.latencies.append(finished - enqueued)
+            self.batch_rows.append(rows)
+            self.rows_scored += rows
+            self.requests_served += len(batch)
+
+    def _run(self, X: np.ndarray) -> np.ndarray:
+        outputs = self.session.run(None, {self.input_name: X})
+        return np.ascontiguousarray(probabilities(outputs), dtype="<f4")
+
+    def stats(self) -> dict:
+        """Latency percentiles (ms), throughput and batch statistics since start."""
+        latencies = np.array(self.latencies) * 1000.0 if self.latencies else np.zeros(1)
+        elapsed = time.perf_counter() - self.started_at if self.started_at else 0.0
+        return {
+            "requests": self.requests_served,
+            "rows": self.rows_scored,
+            "batches": len(self.batch_rows),
+            "mean_batch_rows": float(np.mean(self.batch_rows)) if self.batch_rows else 0.0,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "rows_per_second": self.rows_scored / elapsed if elapsed else 0.0,
+            "uptime_seconds": elapsed,
+        }
+
+
+class InferenceClient:
+    """
+    Blocking client for :class:`MicroBatchServer`.
+
+    Args:
+        host, port: TCP address, or
+        unix_path (str): Unix socket path.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = None, unix_path: str = None, timeout: float = 30.0):
+        if unix_path is not None:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(unix_path)
+        else:
+            self.sock = socket.create_connection((host, port))
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.settimeout(timeout)
+
+    def _recv_exact(self, size: int) -> bytes:
+        chunks = bytearray()
+        while len(chunks) < size:
+            chunk = self.sock.recv(size - len(chunks))
+            if not chunk:
+                raise ConnectionError("Server closed the connection")
+            chunks.extend(chunk)
+        return bytes(chunks)
+
+    def _request(self, op: int, X: np.ndarray = None) -> tuple:
+        if X is None:
+            self.sock.sendall(HEADER.pack(op, 0, 0))
+        else:
+            X = np.ascontiguousarray(X, dtype="<f4")
+            self.sock.sendall(HEADER.pack(op, X.shape[0], X.shape[1]) + X.tobytes())
+
+        status, rows, cols = HEADER.unpack(self._recv_exact(HEADER.size))
+        size = rows if cols == 0 else rows * cols * 4
+        payload = self._recv_exact(size)
+        if status != STATUS_OK:
+            raise RuntimeError(f"Inference server error: {payload.decode()}")
+        return rows, cols, payload
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Score ``(rows, n_features)`` and return ``(rows, n_classes)`` probabilities."""
+        X = np.atleast_2d(X)
+        rows, cols, payload = self._request(OP_PREDICT, X)
+        return np.frombuffer(payload, dtype="<f4").reshape(rows, cols)
+
+    def stats(self) -> dict:
+        _, _, payload = self._request(OP_STATS)
+        return json.loads(payload)
+
+    def close(self):
+        self.sock.close()
+
+
+def run_in_thread(server: MicroBatchServer, port: int = 0, unix_path: str = None) -> tuple:
+    """
+    Start ``server`` on a background event loop (for notebooks and local load tests).
+
+    Returns:
+        tuple: ``(loop, thread, bound_port)``; stop with ``loop.call_soon_threadsafe(loop.stop)``.
+
+    Raises:
+        Exception: Whatever ``server.start`` raised (e.g. ``OSError`` for a port in use).
+    """
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    result = {}
+
+    def _run():
+        asyncio.set_event_loop(loop)
+        try:
+            result["port"] = loop.run_until_complete(server.start(port=port, unix_path=unix_path))
+        except BaseException as error:
+            result["error"] = error
+            loop.close()
+            return
+        finally:
+            ready.set()
+        loop.run_forever()
+
+    thread = threading.Thread(target=_run, daemon=True)
+    thread.start()
+    ready.wait()
+    if "error" in result:
+        thread.join()
+        raise result["error"]
+    return loop, thread, result["port"]
+
+
+def load_test(server: MicroBatchServer, X: np.ndarray, clients: int = 16, requests_per_client: int = 200,
+              rows_per_request: int = 1, unix_path: str = None) -> dict:
+    """
+    Hammer a server with concurrent localhost clients and return its statistics.
+
+    Each client thread sends ``requests_per_client`` sequential requests of
+    ``rows_per_request`` rows drawn from ``X``.
+    """
+    loop, thread, port = run_in_thread(server, port=None if unix_path else 0, unix_path=unix_path)
+
+    def _client(seed):
+        rng = np.random.default_rng(seed)
+        client = InferenceClient(port=port, unix_path=unix_path)
+        try:
+            for _ in range(requests_per_client):
+                rows = rng.integers(0, len(X) - rows_per_request + 1)
+                client.predict_proba(X[rows:rows + rows_per_request])
+        finally:
+            client.close()
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=_client, args=(seed,)) for seed in range(clients)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    stats = server.stats()
+    stats["client_wall_seconds"] = elapsed
+    stats["client_rows_per_second"] = clients * requests_per_client * rows_per_request / elapsed
+
+    asyncio.run_coroutine_threadsafe(server.stop(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Micro-batching ONNX inference server")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=None, help="TCP port")
+    parser.add_argument("--unix", default=None, help="Unix socket path")
+    parser.add_argument("--max-batch-rows", type=int, default=1024)
+    parser.add_argument("--max-delay-ms", type=float, default=2.0)
+    parser.add_argument("--intra-op-threads", type=int, default=1)
+    parser.add_argument("--inter-op-threads", type=int, default=1)
+    parser.add_argument("--optimization", default="all", choices=["disable", "basic", "extended", "all"])
+    parser.add_argument("--load-test", action="store_true", help="Run a localhost load test and exit")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    server = MicroBatchServer(args.model, max_batch_rows=args.max_batch_rows, max_delay_ms=args.max_delay_ms,
+                              intra_op_threads=args.intra_op_threads, inter_op_threads=args.inter_op_threads,
+                              optimization=args.optimization)
+
+    if args.load_test:
+        X = np.random.default_rng(1).random((4096, server.n_features), dtype=np.float32)
+        print(f"🧪 Load test: {args.clients} clients x {args.requests} requests")
+        stats = load_test(server, X, clients=args.clients, requests_per_client=args.requests, unix_path=args.unix)
+        print(f"⏱️ p50: {stats['p50_ms']:.3f} ms | p99: {stats['p99_ms']:.3f} ms")
+        print(f"⚡ Throughput: {stats['client_rows_per_second']:,.0f} rows/s")
+        print(f"📦 Mean batch: {stats['mean_batch_rows']:.1f} rows over {stats['batches']} batches")
+    else:
+        async def _main():
+            port = await server.start(args.host, args.port, args.unix)
+            print(f"🚀 Serving {args.model} on {args.unix or f'{args.host}:{port}'}")
+            await server.serve_forever()
+
+        asyncio.run(_main())
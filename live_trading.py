@@ -0,0 +1,470 @@
+"""
+Asyncio live trading runtime: bar close -> features -> ONNX -> ATR TP/SL -> order, in Python.
+
+The EA (``random_forest.mq5``) polls ``NewHour()`` on every tick, creates a new ``iATR``
+handle every hour and runs a synchronous ``OnnxRun`` inside ``OnTick``. :class:`LiveTrader`
+runs the same decision through ``mt5_connection.MT5Connection`` with three kinds of tasks:
+
+    market data     one task per symbol sleeps until the next bar close, then polls the
+                    terminal until the closed bar is there (a missed run of bars is caught up)
+    scoring         updates ``StreamingFeatures`` and a rolling ATR in O(1) per bar and scores
+                    every bar that closed together in one ``run`` of a shared InferenceSession
+    orders          checks open positions and the tick, sends the market order with TP/SL
+
+Stages talk through ``asyncio.Queue``\\ s and blocking calls run in executors, so the event loop
+never waits on the terminal or onnxruntime. The ``MetaTrader5`` package is not thread-safe, so
+market data and order calls share one terminal thread; inference has its own.
+
+Decisions follow the EA: ``P(up) > 0.5`` is a BUY, confidence is ``max(P, 1 - P)``, a trade is
+sent only above ``confidence_threshold`` and when the symbol has no open position, with
+``TP/SL = price +/- ATR(atr_period) * multiplier`` (ATR of the closed bar). Features are the
+training features of the bar that just closed (``feature_engine`` via ``StreamingFeatures``).
+
+Per bar, the time from the bar close to the order being sent is split into stages:
+
+    detect_ms       bar close (the open of the next bar) -> closed bar received from the terminal
+    features_ms     StreamingFeatures + ATR update
+    inference_ms    InferenceSession.run (including the executor hop)
+    order_ms        positions / tick / order_send round trips
+    total_ms        bar close -> order_send returned (includes queue waits)
+
+``--stub`` replays the loop offline against ``mt5_stub`` (synthetic prices, stub broker with
+SL/TP fills) on a clock running ``--speed`` times faster than real time.
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from mt5_connection import MT5Connection, latency_summary
+from onnx_utils import make_session, positive_proba
+from streaming_features import WINDOW, StreamingFeatures
+from trade_simulator import EA_INPUTS
+
+DEFAULT_MODEL = "xauusd_optimized_model.onnx"
+MAGIC = 240601
+STAGES = ["detect_ms", "features_ms", "inference_ms", "order_ms", "total_ms"]
+
+# Seconds after a bar boundary before the first poll, and the poll backoff
+SETTLE = 0.2
+POLL = 0.25
+MAX_POLL = 5.0
+
+# Closed bars fetched per poll; a longer gap re-warms the features from history
+CATCH_UP_BARS = 16
+
+
+class RollingATR:
+    """MT5 ``iATR`` (simple moving average of the true range), updated once per closed bar."""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.ranges = deque(maxlen=period)
+        self.total = 0.0
+        self.prev_close = None
+
+    def update(self, high: float, low: float, close: float) -> float:
+        if self.prev_close is None:
+            true_range = high - low
+        else:
+            true_range = max(high, self.prev_close) - min(low, self.prev_close)
+        if len(self.ranges) == self.period:
+            self.total -= self.ranges[0]
+        self.ranges.append(true_range)
+        self.total += true_range
+        self.prev_close = close
+        return self.value
+
+    @property
+    def value(self) -> float:
+        return self.total / self.period if len(self.ranges) == self.period else float("nan")
+
+
+class LiveTrader:
+    """
+    Live trading loop for one or more symbols on one timeframe.
+
+    Args:
+        connection (MT5Connection): Terminal session (``MT5Connection(account)`` or the stub).
+        model_path (str): ONNX model taking the 19 training features.
+        symbols (list): Symbols to trade.
+        timeframe (str): ``history_sync.TIMEFRAMES`` label.
+        lotsize, confidence_threshold, tp_multiplier, sl_multiplier, atr_period,
+        max_positions: The EA inputs (defaults: ``trade_simulator.EA_INPUTS``).
+        prediction_log (str): Append one JSON line per scored bar (``prediction_monitor`` reads it;
+            ``feature_set`` is ``"training"``).
+        clock: Terminal time in epoch seconds; default: local clock plus an offset to the
+            terminal's clock, raised whenever the terminal shows a later time (a tick or the
+            open of a new bar).
+        speed (float): Terminal seconds per wall-clock second (1 live; >1 for stub replays).
+        verbose (bool): Print EA-style signal and order lines.
+    """
+
+    def __init__(self, connection: MT5Connection, model_path: str = DEFAULT_MODEL, symbols: list = ("XAUUSDm",),
+                 timeframe: str = "H1", lotsize: float = EA_INPUTS["lotsize"],
+                 confidence_threshold: float = EA_INPUTS["confidence_threshold"],
+                 tp_multiplier: float = EA_INPUTS["tp_multiplier"], sl_multiplier: float = EA_INPUTS["sl_multiplier"],
+                 atr_period: int = EA_INPUTS["atr_period"], max_positions: int = EA_INPUTS["max_positions"],
+                 prediction_log: str = None, clock=None, speed: float = 1.0, verbose: bool = True):
+        from history_sync import TIMEFRAMES
+
+        self.connection = connection
+        self.symbols = list(symbols)
+        self.timeframe = getattr(connection, TIMEFRAMES[timeframe][0])
+        self.bar_seconds = TIMEFRAMES[timeframe][1]
+        self.inputs = {"lotsize": lotsize, "confidence_threshold": confidence_threshold,
+                       "tp_multiplier": tp_multiplier, "sl_multiplier": sl_multiplier,
+                       "atr_period": atr_period, "max_positions": max_positions}
+        self.prediction_log = prediction_log
+        self._clock = clock
+        self.clock_offset = 0.0
+        self.speed = speed
+        self.verbose = verbose
+
+        # One session for every symbol; bars that close together are scored in one run
+        self.session = make_session(model_path, intra_op_threads=1)
+        self.input_name = self.session.get_inputs()[0].name
+        self.terminal = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mt5")
+        self.inference = ThreadPoolExecutor(max_workers=1, thread_name_prefix="onnx")
+
+        self.state = {}
+        self.records = deque(maxlen=100_000)
+        self.counters = {"bars": 0, "signals": 0, "orders": 0, "rejected": 0, "skipped_low_confidence": 0,
+                         "skipped_open_position": 0, "catch_up_bars": 0, "rewarms": 0}
+        self._stopping = None
+
+    # --- plumbing --------------------------------------------------------------------------
+
+    def clock(self) -> float:
+        return self._clock() if self._clock is not None else time.time() + self.clock_offset
+
+    def _sync_clock(self, server_time: float) -> None:
+        """Raise the clock offset so ``clock()`` is not behind ``server_time``."""
+        # Tick times and bar opens only bound the server clock from below: the last tick can
+        # be days old over a weekend
+        if self._clock is None:
+            self.clock_offset = max(self.clock_offset, float(server_time) - time.time())
+
+    async def sleep(self, seconds: float) -> None:
+        """Sleep ``seconds`` of terminal time."""
+        await asyncio.sleep(max(seconds, 0.0) / self.speed)
+
+    async def _mt5(self, name: str, *args, **kwargs):
+        """Run one terminal call on the terminal thread."""
+        function = getattr(self.connection, name)
+        return await asyncio.get_running_loop().run_in_executor(self.terminal, lambda: function(*args, **kwargs))
+
+    def _log(self, message: str) -> None:
+        if self.verbose:
+            print(message)
+
+    # --- warm-up ---------------------------------------------------------------------------
+
+    async def warm_up(self, symbol: str, shift: int = 1) -> None:
+        """
+        Build the feature and ATR state of ``symbol`` from ``WINDOW + 1`` closed bars, the
+        newest ``shift`` bars back from the forming one.
+        """
+        rates = await self._mt5("copy_rates_from_pos", symbol, self.timeframe, shift, WINDOW + 1)
+        if rates is None or len(rates) < WINDOW + 1:
+            raise RuntimeError(f"Not enough history for {symbol}: {0 if rates is None else len(rates)} bars")
+        info = await self._mt5("symbol_info", symbol)
+        atr = RollingATR(self.inputs["atr_period"])
+        for bar in rates[-(self.inputs["atr_period"] + 1):]:
+            atr.update(float(bar["high"]), float(bar["low"]), float(bar["close"]))
+        self.state[symbol] = {
+            "features": StreamingFeatures.from_history(rates["open"], rates["high"], rates["low"],
+                                                       rates["close"], rates["tick_volume"].astype(np.float64)),
+            "atr": atr, "digits": info.digits if info else 5,
+            # Newest bar queued by the market-data task / folded into the features
+            "fetched_time": int(rates["time"][-1]), "last_time": int(rates["time"][-1]),
+        }
+
+    # --- market data -----------------------------------------------------------------------
+
+    async def _market_data(self, symbol: str, bars: asyncio.Queue) -> None:
+        """Wait for each bar close of ``symbol`` and queue the newly closed bars."""
+        state = self.state[symbol]
+        while not self._stopping.is_set():
+            bar_close = state["fetched_time"] + 2 * self.bar_seconds
+            # At most one bar: the clock may still be behind the server
+            await self.sleep(min(bar_close - self.clock() + SETTLE, self.bar_seconds))
+            poll = POLL
+            while not self._stopping.is_set():
+                # The forming bar comes along: a bar has closed when its successor has opened
+                rates = await self._mt5("copy_rates_from_pos", symbol, self.timeframe, 0, CATCH_UP_BARS + 1)
+                if rates is not None and len(rates) > 1 and rates["time"][-2] > state["fetched_time"]:
+                    break
+                await self.sleep(poll)
+                poll = min(poll * 2, MAX_POLL)
+            else:
+                return
+
+            received = time.perf_counter()
+            closed_at = int(rates["time"][-1])
+            self._sync_clock(closed_at)
+            rates = rates[:-1]
+            new = rates[rates["time"] > state["fetched_time"]]
+            if len(new) == len(rates) == CATCH_UP_BARS:
+                # Possibly more bars missed than fetched (e.g. a reconnect): rebuild from history
+                self.counters["rewarms"] += 1
+                await self.warm_up(symbol, shift=2)
+                state = self.state[symbol]
+                new = new[-1:]
+            state["fetched_time"] = int(new["time"][-1])
+            detect_ms = max(self.clock() - closed_at, 0.0) / self.speed * 1000
+            self.counters["catch_up_bars"] += len(new) - 1
+            await bars.put((symbol, new, closed_at, received, detect_ms))
+
+    # --- scoring ---------------------------------------------------------------------------
+
+    async def _score(self, bars: asyncio.Queue, decisions: asyncio.Queue) -> None:
+        """Update features for queued bars and score the newest bar of each symbol in one batch."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await bars.get()]
+            while not bars.empty():
+                batch.append(bars.get_nowait())
+
+            rows, items = [], []
+            for symbol, new, closed_at, received, detect_ms in batch:
+                started = time.perf_counter()
+                state = self.state[symbol]
+                row = None
+                for bar in new:
+                    if int(bar["time"]) <= state["last_time"]:
+                        continue
+                    row = state["features"].update(float(bar["open"]), float(bar["high"]), float(bar["low"]),
+                                                   float(bar["close"]), float(bar["tick_volume"]))
+                    atr = state["atr"].update(float(bar["high"]), float(bar["low"]), float(bar["close"]))
+                    state["last_time"] = int(bar["time"])
+                if row is None:
+                    continue        # every bar already folded in (queued before a re-warm)
+                rows.append(row)
+                items.append({"symbol": symbol, "bar_time": int(new["time"][-1]), "closed_at": closed_at,
+                              "received": received, "detect_ms": detect_ms, "atr": atr, "features": row,
+                              "features_ms": (time.perf_counter() - started) * 1000})
+
+            if not rows:
+                continue
+            started = time.perf_counter()
+            X = np.ascontiguousarray(np.vstack(rows), dtype=np.float32)
+            outputs = await loop.run_in_executor(self.inference, self.session.run, None, {self.input_name: X})
+            inference_ms = (time.perf_counter() - started) * 1000
+
+            for item, p_up in zip(items, positive_proba(outputs)):
+                prediction = int(p_up > 0.5)
+                item.update({"inference_ms": inference_ms, "p_up": float(p_up), "prediction": prediction,
+                             "confidence": float(p_up if prediction else 1.0 - p_up)})
+                self.counters["bars"] += 1
+                await decisions.put(item)
+
+    # --- orders ----------------------------------------------------------------------------
+
+    async def _orders(self, decisions: asyncio.Queue) -> None:
+        """Apply the EA's trade rules to each decision and send the order."""
+        while True:
+            item = await decisions.get()
+            started = time.perf_counter()
+            symbol, signal = item["symbol"], "BUY" if item["prediction"] else "SELL"
+            traded = item["confidence"] > self.inputs["confidence_threshold"]
+            item.update({"traded": traded, "order": None})
+
+            if not traded:
+                self.counters["skipped_low_confidence"] += 1
+                self._log(f"⚪ {symbol} ML Signal: {signal} | Confidence: {item['confidence']:.4f} "
+                          f"(SKIPPED - Low confidence)")
+            elif not np.isfinite(item["atr"]) or item["atr"] <= 0:
+                self._log(f"⚠️ {symbol}: invalid ATR {item['atr']}")
+            else:
+                self.counters["signals"] += 1
+                self._log(f"{'🔵' if item['prediction'] else '🔴'} {symbol} ML Signal: {signal} | "
+                          f"Confidence: {item['confidence']:.4f}")
+                positions = await self._mt5("positions_get", symbol=symbol)
+                if positions:
+                    self.counters["skipped_open_position"] += 1
+                else:
+                    item["order"] = await self._send(item)
+
+            finished = time.perf_counter()
+            item["order_ms"] = (finished - started) * 1000
+            item["total_ms"] = item["detect_ms"] + (finished - item["received"]) * 1000
+            self._write_prediction(item)
+            item.pop("features")
+            self.records.append(item)
+
+    async def _send(self, item: dict) -> dict:
+        symbol = item["symbol"]
+        c = self.connection
+        tick = await self._mt5("symbol_info_tick", symbol)
+        if tick is None:
+            self.counters["rejected"] += 1
+            self._log(f"❌ {symbol}: no tick")
+            return {"retcode": None}
+        buy = item["prediction"] == 1
+        price = tick.ask if buy else tick.bid
+        distance_tp = item["atr"] * self.inputs["tp_multiplier"]
+        distance_sl = item["atr"] * self.inputs["sl_multiplier"]
+        digits = self.state[symbol]["digits"]
+        request = {
+            "action": c.TRADE_ACTION_DEAL, "symbol": symbol, "volume": self.inputs["lotsize"],
+            "type": c.ORDER_TYPE_BUY if buy else c.ORDER_TYPE_SELL, "price": price,
+            "sl": round(price - distance_sl if buy else price + distance_sl, digits),
+            "tp": round(price + distance_tp if buy else price - distance_tp, digits),
+            "deviation": 20, "magic": MAGIC, "comment": f"ML_{'BUY' if buy else 'SELL'}_{item['confidence']:.2f}",
+            "type_time": c.ORDER_TIME_GTC, "type_filling": c.ORDER_FILLING_IOC,
+        }
+        result = await self._mt5("order_send", request)
+        retcode = getattr(result, "retcode", None)
+        if retcode == c.TRADE_RETCODE_DONE:
+            self.counters["orders"] += 1
+            self._log(f"✅ {'BUY' if buy else 'SELL'} opened: {symbol} Confidence={item['confidence']:.4f} "
+                      f"TP={request['tp']} SL={request['sl']}")
+        else:
+            self.counters["rejected"] += 1
+            self._log(f"❌ {'BUY' if buy else 'SELL'} failed: {symbol} {retcode} {getattr(result, 'comment', '')}")
+        return {"retcode": retcode, "price": getattr(result, "price", None), "sl": request["sl"],
+                "tp": request["tp"], "ticket": getattr(result, "order", None)}
+
+    def _write_prediction(self, item: dict) -> None:
+        if not self.prediction_log:
+            return
+        record = {"time": item["closed_at"], "symbol": item["symbol"], "prediction": item["prediction"],
+                  "confidence": round(item["confidence"], 6), "traded": item["traded"], "feature_set": "training",
+                  "features": [None if not np.isfinite(v) else float(v) for v in item["features"]]}
+        with open(self.prediction_log, "a") as file:
+            file.write(json.dumps(record) + "\n")
+
+    # --- running ---------------------------------------------------------------------------
+
+    async def run(self, max_bars: int = None, duration: float = None) -> dict:
+        """
+        Trade until ``max_bars`` bars were scored or ``duration`` wall-clock seconds passed.
+
+        Returns:
+            dict: :meth:`metrics`.
+        """
+        self._stopping = asyncio.Event()
+        await asyncio.get_running_loop().run_in_executor(self.terminal, self.connection.ensure_connected)
+        if self._clock is None:
+            self.clock_offset = -np.inf
+            tick = await self._mt5("symbol_info_tick", self.symbols[0])
+            if tick is not None:
+                self._sync_clock(tick.time)
+            forming = await self._mt5("copy_rates_from_pos", self.symbols[0], self.timeframe, 0, 1)
+            if forming is not None and len(forming):
+                self._sync_clock(forming["time"][-1])
+            if not np.isfinite(self.clock_offset):
+                self.clock_offset = 0.0
+        for symbol in self.symbols:
+            await self.warm_up(symbol)
+            self._log(f"🚀 {symbol}: warmed up on {WINDOW + 1} bars, last closed bar "
+                      f"{time.strftime('%Y-%m-%d %H:%M', time.gmtime(self.state[symbol]['last_time']))}")
+
+        bars, decisions = asyncio.Queue(), asyncio.Queue()
+        tasks = [asyncio.create_task(self._market_data(symbol, bars)) for symbol in self.symbols]
+        tasks += [asyncio.create_task(self._score(bars, decisions)), asyncio.create_task(self._orders(decisions))]
+        started = time.monotonic()
+        try:
+            while max_bars is None or len(self.records) < max_bars:
+                if duration is not None and time.monotonic() - started >= duration:
+                    break
+                for task in tasks:
+                    if task.done() and task.exception():
+                        raise task.exception()
+                await asyncio.sleep(0.05)
+        finally:
+            self._stopping.set()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.terminal.shutdown(wait=True)
+            self.inference.shutdown(wait=True)
+        return self.metrics()
+
+    def metrics(self) -> dict:
+        """Counters and per-stage latency summaries (milliseconds) over the recorded bars."""
+        latencies = {}
+        for stage in STAGES:
+            values = [record[stage] / 1000 for record in self.records if stage in record]
+            latencies[stage] = latency_summary(values)
+        sent = [record["total_ms"] / 1000 for record in self.records if record.get("order")]
+        return {**self.counters, "latency": latencies, "order_sent_total": latency_summary(sent),
+                "connection": self.connection.metrics()}
+
+
+def run_stub(model_path: str, symbols: list = ("XAUUSDm",), start: str = "2024-03-04T00:00:00",
+             bars: int = 200, speed: float = 36_000.0, **options) -> tuple:
+    """
+    Replay the loop offline against ``mt5_stub`` for ``bars`` closed bars.
+
+    Returns:
+        tuple: ``(trader, metrics, closed_positions)``.
+    """
+    import mt5_stub
+
+    mt5_stub.configure(now=start, speed=speed)
+    connection = MT5Connection(mt5=mt5_stub, credentials=(10000001, "stub", "Stub-Demo"), terminal_path=None)
+    trader = LiveTrader(connection, model_path, symbols, clock=mt5_stub.terminal_time, speed=speed, **options)
+    metrics = asyncio.run(trader.run(max_bars=bars * len(symbols)))
+    closed = mt5_stub.closed_positions()
+    connection.close()
+    return trader, metrics, closed
+
+
+def print_metrics(metrics: dict) -> None:
+    print(f"\n📊 {metrics['bars']} bars scored, {metrics['signals']} signals, {metrics['orders']} orders "
+          f"({metrics['skipped_low_confidence']} low confidence, {metrics['skipped_open_position']} with a position "
+          f"open, {metrics['rejected']} rejected)")
+    print(f"{'stage':>14} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    for stage, summary in list(metrics["latency"].items()) + [("order_sent", metrics["order_sent_total"])]:
+        if summary["count"]:
+            print(f"{stage:>14} {summary['p50_ms']:>9.3f} {summary['p95_ms']:>9.3f} {summary['max_ms']:>9.3f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Asyncio live trading loop for the XAUUSD forest")
+    parser.add_argument("account", nargs="?", default=None, help="Credentials name (credentials/<name>.txt)")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--symbols", nargs="+", default=["XAUUSDm"])
+    parser.add_argument("--timeframe", default="H1")
+    parser.add_argument("--lotsize", type=float, default=EA_INPUTS["lotsize"])
+    parser.add_argument("--confidence-threshold", type=float, default=EA_INPUTS["confidence_threshold"])
+    parser.add_argument("--tp-multiplier", type=float, default=EA_INPUTS["tp_multiplier"])
+    parser.add_argument("--sl-multiplier", type=float, default=EA_INPUTS["sl_multiplier"])
+    parser.add_argument("--atr-period", type=int, default=EA_INPUTS["atr_period"])
+    parser.add_argument("--prediction-log", default=None, help="JSONL prediction log for prediction_monitor.py")
+    parser.add_argument("--bars", type=int, default=None, help="Stop after this many bars per symbol")
+    parser.add_argument("--stub", action="store_true", help="Replay offline against mt5_stub")
+    parser.add_argument("--start", default="2024-03-04T00:00:00", help="Stub start time")
+    parser.add_argument("--speed", type=float, default=36_000.0, help="Stub clock speed-up")
+    parser.add_argument("--json", default=None, help="Write metrics to this JSON file")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+
+    options = {"timeframe": args.timeframe, "lotsize": args.lotsize, "confidence_threshold": args.confidence_threshold,
+               "tp_multiplier": args.tp_multiplier, "sl_multiplier": args.sl_multiplier,
+               "atr_period": args.atr_period, "prediction_log": args.prediction_log, "verbose": not args.quiet}
+    if args.stub:
+        _, metrics, closed = run_stub(args.model, args.symbols, args.start, args.bars or 200, args.speed, **options)
+        print_metrics(metrics)
+        if closed:
+            profit = sum(position["profit"] for position in closed)
+            wins = sum(position["reason"] == "tp" for position in closed)
+            print(f"💰 Stub broker: {len(closed)} positions closed ({wins} at TP), profit {profit:,.2f}")
+    else:
+        with MT5Connection(args.account) as connection:
+            trader = LiveTrader(connection, args.model, args.symbols, **options)
+            max_bars = args.bars * len(args.symbols) if args.bars else None
+            metrics = asyncio.run(trader.run(max_bars=max_bars))
+        print_metrics(metrics)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(metrics, file, indent=2, default=str)
+        print(f"📝 Metrics saved to: {args.json}")
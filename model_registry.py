@@ -0,0 +1,454 @@
+"""
+Versioned model registry and atomic publishing into the MT5 ``MQL5/Files`` folder.
+
+Every registered model gets an immutable version directory:
+
+    models/
+        XAUUSDm_H1/
+            v0001/
+                model.onnx              # exported model, as trained
+                model.optimized.onnx    # graph pre-optimized offline by onnxruntime (still plain ONNX)
+                model.ort               # ORT format: pre-optimized, skips graph parsing/optimization at load
+                feature_names.txt       # optimized_feature_names.txt layout
+                manifest.json           # features, training data hash, metrics, sha256 and cold-load time per artifact
+            v0002/
+            published.json              # what was last published where
+
+A version is assembled in a temporary directory and renamed into place, so a partially
+written version is never visible. :meth:`ModelRegistry.publish` copies an artifact into a
+target directory (the terminal's ``MQL5/Files``) under the EA's ``ONNXFilename`` by writing a
+temporary file and ``os.replace``-ing it over the old one, so the EA never opens a half-written model.
+
+MT5 loads plain ONNX only (``model.onnx`` or ``model.optimized.onnx``); ``model.ort`` is for
+Python consumers such as ``inference_server``.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import pandas as pd
+
+DEFAULT_ROOT = "models"
+MANIFEST_FILE = "manifest.json"
+PUBLISHED_FILE = "published.json"
+FEATURES_FILE = "feature_names.txt"
+
+# The EA's ONNXFilename and the notebook's feature list file
+EA_MODEL_FILENAME = "simple_test_model.onnx"
+EA_FEATURES_FILENAME = "optimized_feature_names.txt"
+
+ARTIFACTS = {
+    "onnx": "model.onnx",
+    "optimized": "model.optimized.onnx",
+    "ort": "model.ort",
+}
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_feature_names(path: str) -> list:
+    """
+    Feature names from an ``optimized_feature_names.txt``-style file (``"<i>: <name>"`` lines).
+
+    Also reads files written with literal ``\\n`` separators instead of newlines.
+    """
+    with open(path, "r") as file:
+        text = file.read().replace("\\n", "\n")
+    names = []
+    for line in text.splitlines():
+        index, sep, name = line.partition(":")
+        if sep and index.strip().isdigit():
+            names.append(name.strip())
+    return names
+
+
+def _atomic_copy(source: str, target: str) -> None:
+    """Copy ``source`` to ``target`` through a temporary file in the target directory and ``os.replace``."""
+    tmp_path = os.path.join(os.path.dirname(target) or ".", f".{os.path.basename(target)}.{os.getpid()}.tmp")
+    try:
+        with open(source, "rb") as src, open(tmp_path, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp_path, target)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_json_atomic(path: str, payload: dict) -> None:
+    """Write ``payload`` as JSON via a temporary file and ``os.replace``; readers never see a partial file."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(payload, file, indent=2, default=str)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+# -----------------------------------------------------------------------------------------
+#  Offline optimization and cold-load timing
+# -----------------------------------------------------------------------------------------
+
+def optimize_artifacts(onnx_path: str, out_dir: str, optimization: str = "extended") -> dict:
+    """
+    Write the pre-optimized ONNX graph and the ORT-format model next to ``onnx_path``.
+
+    ``extended`` is the highest level whose result does not depend on the CPU it was produced on.
+
+    Returns:
+        dict: Artifact kind -> path of the files written.
+    """
+    import onnxruntime as ort
+
+    from onnx_utils import session_options
+
+    paths = {kind: os.path.join(out_dir, filename) for kind, filename in ARTIFACTS.items() if kind != "onnx"}
+
+    options = session_options(optimization=optimization, optimized_model_path=paths["optimized"])
+    ort.InferenceSession(onnx_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+    options = session_options(optimization=optimization, optimized_model_path=paths["ort"])
+    options.add_session_config_entry("session.save_model_format", "ORT")
+    ort.InferenceSession(onnx_path, sess_options=options, providers=["CPUExecutionProvider"])
+    return paths
+
+
+def _cold_load(path: str) -> dict:
+    """Runs in a fresh process: import, session creation and first inference times."""
+    started = time.perf_counter()
+    import numpy as np
+    import onnxruntime as ort
+    imported = time.perf_counter()
+
+    options = ort.SessionOptions()
+    if path.endswith(".ort"):
+        # Already optimized offline; skip the optimizer at load time
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+    session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+    created = time.perf_counter()
+
+    meta = session.get_inputs()[0]
+    width = meta.shape[1] if isinstance(meta.shape[1], int) else 19
+    session.run(None, {meta.name: np.zeros((1, width), dtype=np.float32)})
+    finished = time.perf_counter()
+    return {"import_ms": (imported - started) * 1000, "session_ms": (created - imported) * 1000,
+            "first_run_ms": (finished - created) * 1000}
+
+
+def cold_load_ms(path: str, runs: int = 3) -> dict:
+    """
+    Median cold-load timings of one artifact, each run in a new spawned process.
+
+    Returns:
+        dict: ``session_ms`` (session creation), ``first_run_ms`` and ``load_ms`` (both) medians.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    import numpy as np
+
+    context = multiprocessing.get_context("spawn")
+    samples = []
+    for _ in range(runs):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            samples.append(pool.submit(_cold_load, os.path.abspath(path)).result())
+    session_ms = float(np.median([s["session_ms"] for s in samples]))
+    first_run_ms = float(np.median([s["first_run_ms"] for s in samples]))
+    return {"session_ms": session_ms, "first_run_ms": first_run_ms, "load_ms": session_ms + first_run_ms,
+            "runs": runs}
+
+
+# -----------------------------------------------------------------------------------------
+#  Registry
+# -----------------------------------------------------------------------------------------
+
+class ModelRegistry:
+    """
+    Versioned store of exported models under ``root/<name>/v<NNNN>``.
+
+    Args:
+        root (str): Registry directory.
+    """
+
+    def __init__(self, root: str = DEFAULT_ROOT):
+        self.root = root
+
+    def model_dir(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def version_dir(self, name: str, version: int) -> str:
+        return os.path.join(self.model_dir(name), f"v{version:04d}")
+
+    def names(self) -> list:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(entry for entry in os.listdir(self.root) if self.versions(entry))
+
+    def versions(self, name: str) -> list:
+        directory = self.model_dir(name)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(int(entry[1:]) for entry in os.listdir(directory)
+                      if entry.startswith("v") and entry[1:].isdigit()
+                      and os.path.exists(os.path.join(directory, entry, MANIFEST_FILE)))
+
+    def latest(self, name: str):
+        versions = self.versions(name)
+        return versions[-1] if versions else None
+
+    def _resolve(self, name: str, version: int = None) -> int:
+        version = version or self.latest(name)
+        if version is None or version not in self.versions(name):
+            raise KeyError(f"No version {version} of model '{name}' in {self.root}")
+        return version
+
+    def manifest(self, name: str, version: int = None) -> dict:
+        version = self._resolve(name, version)
+        with open(os.path.join(self.version_dir(name, version), MANIFEST_FILE), "r") as file:
+            return json.load(file)
+
+    def artifact_path(self, name: str, version: int = None, kind: str = "onnx") -> str:
+        version = self._resolve(name, version)
+        return os.path.join(self.version_dir(name, version), ARTIFACTS[kind])
+
+    # -------------------------------------------------------------------------------------
+    #  Writing
+    # -------------------------------------------------------------------------------------
+
+    def register(self, name: str, model, features: list, data_hash: str = None, metrics: dict = None,
+                 params: dict = None, symbol: str = None, optimize: bool = True, measure_runs: int = 3) -> dict:
+        """
+        Store a model as the next version of ``name``.
+
+        Args:
+            name (str): Model name, e.g. ``"XAUUSDm_H1"``.
+            model: ONNX file path, serialized bytes or ``onnx.ModelProto``.
+            features (list): Input feature names, in model column order.
+            data_hash (str): Hash of the training data (e.g. ``experiment_cache.make_key(X, y)``).
+            metrics (dict): Evaluation metrics (precision, rows, ...).
+            params (dict): Estimator hyperparameters.
+            symbol (str): Symbol for the feature file header (default: ``name`` up to ``_``).
+            optimize (bool): Also write the pre-optimized ONNX and ORT-format artifacts.
+            measure_runs (int): Cold-load measurements per artifact (0 to skip).
+
+        Returns:
+            dict: The version's manifest.
+        """
+        from training_pipeline import write_feature_names
+
+        if isinstance(model, str):
+            with open(model, "rb") as file:
+                payload = file.read()
+        elif isinstance(model, bytes):
+            payload = model
+        else:
+            payload = model.SerializeToString()
+
+        directory = self.model_dir(name)
+        os.makedirs(directory, exist_ok=True)
+        staging = os.path.join(directory, f".staging.{os.getpid()}.{time.time_ns()}")
+        os.makedirs(staging)
+        try:
+            paths = {"onnx": os.path.join(staging, ARTIFACTS["onnx"])}
+            with open(paths["onnx"], "wb") as file:
+                file.write(payload)
+            if optimize:
+                paths.update(optimize_artifacts(paths["onnx"], staging))
+
+            metrics = metrics or {}
+            write_feature_names(os.path.join(staging, FEATURES_FILE), features, symbol or name.split("_")[0],
+                                metrics.get("precision", float("nan")))
+
+            manifest = {
+                "name": name,
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "features": list(features),
+                "data_hash": data_hash,
+                "metrics": metrics,
+                "params": params or {},
+                "artifacts": {},
+            }
+            for kind, path in paths.items():
+                entry = {"file": ARTIFACTS[kind], "bytes": os.path.getsize(path), "sha256": sha256_file(path)}
+                if measure_runs:
+                    entry["cold_load"] = cold_load_ms(path, measure_runs)
+                manifest["artifacts"][kind] = entry
+
+            # Claim the next version number; the rename fails if another writer took it first
+            while True:
+                version = (self.latest(name) or 0) + 1
+                manifest["version"] = version
+                write_json_atomic(os.path.join(staging, MANIFEST_FILE), manifest)
+                try:
+                    os.rename(staging, self.version_dir(name, version))
+                    return manifest
+                except OSError:
+                    if not os.path.exists(self.version_dir(name, version)):
+                        raise
+        finally:
+            if os.path.exists(staging):
+                shutil.rmtree(staging, ignore_errors=True)
+
+    def register_job(self, job_dir: str, **kwargs) -> dict:
+        """Register a ``training_pipeline`` job directory (``model.onnx``, ``feature_names.txt``, ``metrics.json``)."""
+        with open(os.path.join(job_dir, "metrics.json"), "r") as file:
+            metrics = json.load(file)
+        if metrics.get("status") != "ok":
+            raise ValueError(f"Job {job_dir} did not finish successfully (status: {metrics.get('status')})")
+        kept = {key: metrics[key] for key in ("precision", "predicted_positive_rate", "rows", "tested_rows",
+                                              "onnx_max_abs_diff", "path") if key in metrics}
+        return self.register(metrics["name"], os.path.join(job_dir, "model.onnx"),
+                             read_feature_names(os.path.join(job_dir, "feature_names.txt")),
+                             data_hash=metrics.get("data_hash"), metrics=kept, params=metrics.get("model"),
+                             symbol=metrics.get("symbol"), **kwargs)
+
+    def measure(self, name: str, version: int = None, runs: int = 3) -> dict:
+        """Re-measure cold-load time of every artifact of a version and update its manifest."""
+        version = self._resolve(name, version)
+        manifest = self.manifest(name, version)
+        for kind, entry in manifest["artifacts"].items():
+            entry["cold_load"] = cold_load_ms(os.path.join(self.version_dir(name, version), entry["file"]), runs)
+        write_json_atomic(os.path.join(self.version_dir(name, version), MANIFEST_FILE), manifest)
+        return manifest
+
+    # -------------------------------------------------------------------------------------
+    #  Publishing
+    # -------------------------------------------------------------------------------------
+
+    def publish(self, name: str, target_dir: str, version: int = None, kind: str = "onnx",
+                filename: str = EA_MODEL_FILENAME, features_filename: str = EA_FEATURES_FILENAME) -> dict:
+        """
+        Atomically replace ``target_dir/filename`` with an artifact of ``name``.
+
+        The model and its feature list are each written via ``os.replace``, model first. Between
+        the two renames a reader can briefly see the new model with the previous
+        ``features_filename``; it never sees a feature list newer than the model. A file whose
+        bytes already match the version's is left alone, so publishing a version that only
+        corrects the feature list rewrites just that file. ORT-format artifacts cannot be
+        published under a ``.onnx`` name, because MT5 cannot load them.
+
+        Returns:
+            dict: Publication record (also stored in ``published.json``).
+        """
+        version = self._resolve(name, version)
+        manifest = self.manifest(name, version)
+        if kind not in manifest["artifacts"]:
+            raise KeyError(f"Version {version} of '{name}' has no '{kind}' artifact")
+        if kind == "ort" and filename.lower().endswith(".onnx"):
+            raise ValueError(f"MT5 cannot load ORT-format models; publish 'onnx' or 'optimized' as '{filename}'")
+
+        source = os.path.join(self.version_dir(name, version), manifest["artifacts"][kind]["file"])
+        target = os.path.join(target_dir, filename)
+        sha256 = manifest["artifacts"][kind]["sha256"]
+        os.makedirs(target_dir, exist_ok=True)
+
+        model_changed = not (os.path.exists(target) and sha256_file(target) == sha256)
+        if model_changed:
+            _atomic_copy(source, target)
+        features_changed = False
+        if features_filename:
+            features_source = os.path.join(self.version_dir(name, version), FEATURES_FILE)
+            features_target = os.path.join(target_dir, features_filename)
+            features_changed = not (os.path.exists(features_target)
+                                    and sha256_file(features_target) == sha256_file(features_source))
+            if features_changed:
+                _atomic_copy(features_source, features_target)
+        changed = model_changed or features_changed
+
+        record = {"name": name, "version": version, "kind": kind, "target": os.path.abspath(target),
+                  "sha256": sha256, "changed": changed, "published": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        published_path = os.path.join(self.model_dir(name), PUBLISHED_FILE)
+        published = {}
+        if os.path.exists(published_path):
+            with open(published_path, "r") as file:
+                published = json.load(file)
+        published[record["target"]] = record
+        write_json_atomic(published_path, published)
+        return record
+
+    def table(self, name: str) -> pd.DataFrame:
+        """One row per version: creation time, data hash, precision and cold-load time per artifact."""
+        rows = []
+        for version in self.versions(name):
+            manifest = self.manifest(name, version)
+            row = {"version": version, "created": manifest["created"],
+                   "data_hash": (manifest.get("data_hash") or "")[:12],
+                   "precision": manifest["metrics"].get("precision")}
+            for kind, entry in manifest["artifacts"].items():
+                row[f"{kind}_kb"] = entry["bytes"] / 1024
+                if "cold_load" in entry:
+                    row[f"{kind}_load_ms"] = entry["cold_load"]["load_ms"]
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Versioned ONNX model registry")
+    parser.add_argument("--root", default=DEFAULT_ROOT)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_register = sub.add_parser("register", help="Register a model file or a training_pipeline job directory")
+    p_register.add_argument("source", help="ONNX file or training_pipeline job directory")
+    p_register.add_argument("--name", help="Model name (required for ONNX files)")
+    p_register.add_argument("--features", default=EA_FEATURES_FILENAME, help="Feature names file (ONNX files)")
+    p_register.add_argument("--metrics", help="JSON file with metrics (ONNX files)")
+    p_register.add_argument("--runs", type=int, default=3, help="Cold-load measurements per artifact")
+
+    p_list = sub.add_parser("list", help="Show versions of a model")
+    p_list.add_argument("name")
+
+    p_publish = sub.add_parser("publish", help="Atomically publish a version into a directory")
+    p_publish.add_argument("name")
+    p_publish.add_argument("target_dir", help="e.g. the terminal's MQL5/Files folder")
+    p_publish.add_argument("--version", type=int)
+    p_publish.add_argument("--kind", default="onnx", choices=list(ARTIFACTS))
+    p_publish.add_argument("--filename", default=EA_MODEL_FILENAME)
+
+    p_measure = sub.add_parser("measure", help="Re-measure cold-load times")
+    p_measure.add_argument("name")
+    p_measure.add_argument("--version", type=int)
+    p_measure.add_argument("--runs", type=int, default=5)
+
+    args = parser.parse_args()
+    registry = ModelRegistry(args.root)
+
+    if args.command == "register":
+        if os.path.isdir(args.source):
+            manifest = registry.register_job(args.source, measure_runs=args.runs)
+        else:
+            if not args.name:
+                parser.error("--name is required when registering an ONNX file")
+            metrics = None
+            if args.metrics:
+                with open(args.metrics, "r") as file:
+                    metrics = json.load(file)
+            manifest = registry.register(args.name, args.source, read_feature_names(args.features),
+                                         metrics=metrics, measure_runs=args.runs)
+        print(f"✅ Registered {manifest['name']} v{manifest['version']} ({len(manifest['features'])} features)")
+        for kind, entry in manifest["artifacts"].items():
+            load = f", cold load {entry['cold_load']['load_ms']:.1f} ms" if "cold_load" in entry else ""
+            print(f"   {kind:<10} {entry['bytes'] / 1024:8.1f} KB{load}")
+    elif args.command == "list":
+        print(registry.table(args.name).to_string(index=False))
+    elif args.command == "publish":
+        record = registry.publish(args.name, args.target_dir, args.version, args.kind, args.filename)
+        state = "📤 Published" if record["changed"] else "✔️  Already current:"
+        print(f"{state} {record['name']} v{record['version']} ({record['kind']}) -> {record['target']}")
+    else:
+        manifest = registry.measure(args.name, args.version, args.runs)
+        for kind, entry in manifest["artifacts"].items():
+            print(f"⏱️  {kind:<10} session {entry['cold_load']['session_ms']:.1f} ms, "
+                  f"first run {entry['cold_load']['first_run_ms']:.1f} ms")
@@ -0,0 +1,307 @@
+"""
+Persistent MetaTrader5 connection with cached credentials, health checks and reconnects.
+
+``mt5_login.login_mt5`` decrypts the credentials file and runs a full ``mt5.initialize`` on
+every call, and nothing notices when the terminal drops. ``MT5Connection`` keeps one session
+alive and is used in place of the ``MetaTrader5`` module::
+
+    conn = MT5Connection("demo_account")
+    rates = conn.copy_rates_range("XAUUSDm", conn.TIMEFRAME_H1, date_from, date_to)
+
+Every API call first checks the session (``terminal_info`` / ``account_info``, at most once
+per ``health_interval`` seconds), reconnects with exponential backoff when it is gone and
+retries a call once if it failed because the terminal disconnected. Decrypted credentials are
+kept in memory per credentials file, so the file is read and decrypted once per process.
+Connect and call latencies are recorded and exposed through :meth:`MT5Connection.metrics`.
+
+The ``MetaTrader5`` package can only talk to one terminal per process; switching accounts
+uses the cheap ``mt5.login`` instead of a new ``initialize`` (see :class:`ConnectionManager`).
+"""
+
+import os
+import random
+import time
+from collections import deque
+
+import numpy as np
+
+# Same terminal as mt5_login.login_mt5 (update this path according to your installation)
+MT5_PATH = r'C:\Program Files\MetaTrader 5 EXNESS\terminal64.exe'
+CREDENTIALS_DIR = "credentials"
+
+# Decrypted credentials per file path; filled on first use
+_credentials = {}
+
+
+def load_credentials(account: str, credentials_dir: str = CREDENTIALS_DIR) -> tuple:
+    """
+    ``(login, password, server)`` for an account, decrypted once per process.
+
+    Uses ``mt5_login.decrypt_credentials`` on ``<credentials_dir>/<account>.txt``.
+    """
+    path = os.path.join(credentials_dir, f"{account}.txt")
+    if path not in _credentials:
+        from mt5_login import decrypt_credentials
+
+        _credentials[path] = decrypt_credentials(path)
+    return _credentials[path]
+
+
+def forget_credentials() -> None:
+    """Drop every cached credential from memory."""
+    _credentials.clear()
+
+
+def latency_summary(samples) -> dict:
+    """Count, mean, p50, p95 and max in milliseconds of durations given in seconds."""
+    values = np.asarray(samples, dtype=np.float64) * 1000
+    if not len(values):
+        return {"count": 0}
+    return {"count": int(len(values)), "mean_ms": float(values.mean()),
+            "p50_ms": float(np.percentile(values, 50)), "p95_ms": float(np.percentile(values, 95)),
+            "max_ms": float(values.max())}
+
+
+class MT5Connection:
+    """
+    A live MetaTrader5 session for one account.
+
+    Args:
+        account (str): Credentials name (``credentials/<account>.txt``), as for ``login_mt5``.
+        mt5: ``MetaTrader5`` module (or ``mt5_stub``); imported if None.
+        credentials (tuple): ``(login, password, server)`` to use instead of the credentials file.
+        terminal_path (str): ``terminal64.exe`` to start (None lets the package find it).
+        timeout (int): ``initialize`` timeout in milliseconds.
+        max_retries (int): Connection attempts before giving up (at least 1).
+        backoff_base, backoff_max (float): Delay before retry ``k`` is
+            ``min(backoff_max, backoff_base * 2**k)`` seconds, with +/-10% jitter.
+        health_interval (float): Minimum seconds between health checks.
+        sleep, clock: Injectable ``time.sleep`` / ``time.monotonic`` for tests.
+    """
+
+    def __init__(self, account: str = None, mt5=None, credentials: tuple = None, terminal_path: str = MT5_PATH,
+                 timeout: int = 30000, max_retries: int = 5, backoff_base: float = 0.5,
+                 backoff_max: float = 30.0, health_interval: float = 5.0, credentials_dir: str = CREDENTIALS_DIR,
+                 sleep=time.sleep, clock=time.monotonic):
+        if mt5 is None:
+            import MetaTrader5 as mt5
+        if max_retries < 1:
+            raise ValueError(f"max_retries must be at least 1, got {max_retries}")
+        self.mt5 = mt5
+        self.account = account
+        self._credentials = credentials
+        self.credentials_dir = credentials_dir
+        self.terminal_path = terminal_path
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.health_interval = health_interval
+        self._sleep = sleep
+        self._clock = clock
+
+        self.connected = False
+        self._last_health_check = None
+        self._connect_times = deque(maxlen=1000)
+        self._call_times = {}
+        self.counters = {"connects": 0, "reconnects": 0, "failed_attempts": 0, "health_checks": 0,
+                         "health_failures": 0, "retried_calls": 0}
+
+    # --- session ---------------------------------------------------------------------------
+
+    @property
+    def credentials(self) -> tuple:
+        if self._credentials is None:
+            self._credentials = load_credentials(self.account, self.credentials_dir)
+        return self._credentials
+
+    def _initialize(self) -> bool:
+        kwargs = {"timeout": self.timeout}
+        if self.account is not None or self._credentials is not None:
+            login, password, server = self.credentials
+            kwargs.update(login=login, password=password, server=server)
+        if self.terminal_path and os.path.exists(self.terminal_path):
+            kwargs["path"] = self.terminal_path
+        return bool(self.mt5.initialize(**kwargs))
+
+    def _mark_connected(self, elapsed: float) -> None:
+        self._connect_times.append(elapsed)
+        self.counters["connects"] += 1
+        self.connected = True
+        self._last_health_check = self._clock()
+
+    def connect(self) -> "MT5Connection":
+        """
+        Open the session, retrying with exponential backoff.
+
+        Raises:
+            ConnectionError: If every attempt failed.
+        """
+        for attempt in range(self.max_retries):
+            started = time.perf_counter()
+            if self._initialize():
+                self._mark_connected(time.perf_counter() - started)
+                return self
+            self.counters["failed_attempts"] += 1
+            error = self.mt5.last_error()
+            self.mt5.shutdown()
+            if attempt < self.max_retries - 1:
+                delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+                self._sleep(delay * random.uniform(0.9, 1.1))
+        self.connected = False
+        raise ConnectionError(f"MT5 initialize() failed after {self.max_retries} attempts: {error}")
+
+    def login(self) -> bool:
+        """Switch the already running terminal to this account with ``mt5.login`` (no ``initialize``)."""
+        login, password, server = self.credentials
+        started = time.perf_counter()
+        if not self.mt5.login(login, password=password, server=server, timeout=self.timeout):
+            return False
+        self._mark_connected(time.perf_counter() - started)
+        return True
+
+    def reconnect(self) -> "MT5Connection":
+        self.counters["reconnects"] += 1
+        self.mt5.shutdown()
+        self.connected = False
+        return self.connect()
+
+    def is_healthy(self) -> bool:
+        """Cheap liveness check: the terminal is connected and logged in to our account."""
+        self.counters["health_checks"] += 1
+        self._last_health_check = self._clock()
+        terminal = self.mt5.terminal_info()
+        if terminal is None or not getattr(terminal, "connected", True):
+            self.counters["health_failures"] += 1
+            return False
+        account = self.mt5.account_info()
+        if account is None:
+            self.counters["health_failures"] += 1
+            return False
+        if self._credentials is not None and account.login != self._credentials[0]:
+            self.counters["health_failures"] += 1
+            return False
+        return True
+
+    def ensure_connected(self) -> None:
+        """Connect if needed; health-check a live session at most every ``health_interval`` seconds."""
+        if not self.connected:
+            self.connect()
+            return
+        if self._clock() - self._last_health_check >= self.health_interval and not self.is_healthy():
+            self.reconnect()
+
+    def close(self) -> None:
+        if self.connected:
+            self.mt5.shutdown()
+        self.connected = False
+
+    def __enter__(self):
+        self.ensure_connected()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- API calls -------------------------------------------------------------------------
+
+    def call(self, name: str, *args, **kwargs):
+        """
+        Call ``mt5.<name>(*args, **kwargs)`` on a live session.
+
+        A ``None`` result while the terminal turns out to be unhealthy triggers one reconnect
+        and retry; a ``None`` from a healthy terminal (e.g. unknown symbol) is returned as is.
+        """
+        self.ensure_connected()
+        function = getattr(self.mt5, name)
+        started = time.perf_counter()
+        result = function(*args, **kwargs)
+        if result is None and not self.is_healthy():
+            self.counters["retried_calls"] += 1
+            self.reconnect()
+            started = time.perf_counter()
+            result = function(*args, **kwargs)
+        self._call_times.setdefault(name, deque(maxlen=10_000)).append(time.perf_counter() - started)
+        return result
+
+    def __getattr__(self, name: str):
+        # Constants (TIMEFRAME_H1, ...) pass through; functions go through ``call``
+        if name.startswith("_") or name in ("mt5",):
+            raise AttributeError(name)
+        value = getattr(self.mt5, name)
+        if not callable(value) or name in ("initialize", "shutdown", "login", "last_error"):
+            return value
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+
+    # --- metrics ---------------------------------------------------------------------------
+
+    def metrics(self) -> dict:
+        """Counters plus connect and per-function call latency summaries."""
+        return {
+            "account": self.account,
+            "connected": self.connected,
+            **self.counters,
+            "connect": latency_summary(self._connect_times),
+            "calls": {name: latency_summary(times) for name, times in sorted(self._call_times.items())},
+        }
+
+
+class ConnectionManager:
+    """
+    One reusable :class:`MT5Connection` per account, sharing the process' single terminal.
+
+    ``get(account)`` returns the cached connection; when a different account was active
+    the terminal is switched with ``mt5.login`` instead of a new ``initialize``.
+    """
+
+    def __init__(self, mt5=None, **connection_options):
+        if mt5 is None:
+            import MetaTrader5 as mt5
+        self.mt5 = mt5
+        self.options = connection_options
+        self.connections = {}
+        self.active = None
+
+    def get(self, account: str, credentials: tuple = None) -> MT5Connection:
+        connection = self.connections.get(account)
+        if connection is None:
+            connection = MT5Connection(account, mt5=self.mt5, credentials=credentials, **self.options)
+            self.connections[account] = connection
+
+        if self.active is not None and self.active != account and self.connections[self.active].connected:
+            # Terminal already running: switch accounts instead of re-initializing
+            connection.login()
+            self.connections[self.active].connected = False
+        self.active = account
+        connection.ensure_connected()
+        return connection
+
+    def close(self) -> None:
+        for connection in self.connections.values():
+            connection.close()
+        self.active = None
+
+    def metrics(self) -> dict:
+        return {account: connection.metrics() for account, connection in self.connections.items()}
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Measure MT5 connect/call latency through MT5Connection")
+    parser.add_argument("account", nargs="?", default=None, help="Credentials name (credentials/<name>.txt)")
+    parser.add_argument("--symbol", default="XAUUSDm")
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--stub", action="store_true", help="Use mt5_stub instead of a real terminal")
+    args = parser.parse_args()
+
+    if args.stub:
+        import mt5_stub
+        mt5_stub.install()
+
+    with MT5Connection(args.account) as conn:
+        for _ in range(args.calls):
+            conn.copy_rates_from_pos(args.symbol, conn.TIMEFRAME_H1, 0, 751)
+            conn.symbol_info(args.symbol)
+        print(json.dumps(conn.metrics(), indent=2))
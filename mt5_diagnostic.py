@@ -1,14 +1,16 @@
 import os
 import glob
 
-def check_mt5_setup():
-    """Comprehensive MT5 ONNX setup diagnostics"""
+def check_mt5_setup(mt5_base=None):
+    """Comprehensive MT5 ONNX setup diagnostics (onnx_validation.py validates the models in bulk)"""
     
     print("🔍 MetaTrader 5 ONNX Diagnostics")
     print("=" * 50)
     
     # Check the MT5 directory
-    mt5_base = r"C:\Users\gamma\AppData\Roaming\MetaQuotes\Terminal"
+    if mt5_base is None:
+        from onnx_validation import default_terminal_root
+        mt5_base = default_terminal_root()
     print(f"📁 MT5 Base Directory: {mt5_base}")
     
     if not os.path.exists(mt5_base):
@@ -82,4 +84,5 @@ def check_mt5_setup():
     print("5. ✅ Test with simple_test_model.onnx first")
 
 if __name__ == "__main__":
-    check_mt5_setup() 
\ No newline at end of file
+    import sys
+    check_mt5_setup(sys.argv[1] if len(sys.argv) > 1 else None) 
\ No newline at end of file
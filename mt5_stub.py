@@ -0,0 +1,444 @@
+"""
+Minimal stand-in for the ``MetaTrader5`` package, for running the data tools on Linux/CI.
+
+The real package only exists for Windows and talks to a running terminal. This module
+implements the subset of its API the scripts in this repo use, with deterministic synthetic
+prices:
+
+    initialize / login / shutdown / last_error / version / terminal_info / account_info
+    symbol_info / copy_rates_range / copy_rates_from_pos
+    symbol_info_tick / order_send / positions_get / positions_total
+
+Call :func:`install` before importing code that does ``import MetaTrader5 as mt5``::
+
+    import mt5_stub
+    mt5_stub.install()
+    import history_sync      # now uses the stub
+
+A bar's prices depend only on the symbol and the bar's open time, so overlapping or chunked
+requests return consistent data, the same way the terminal's history would.
+
+The trading calls make a local stub broker: market orders fill at the current tick (the open
+of the forming M1 bar, ask = bid + spread), and open positions are closed at their SL or TP
+once an M1 bar touches it (SL first when a bar touches both). With ``configure(now=...)`` the
+clock stands still until :func:`advance` moves it, so a live loop can be replayed offline.
+"""
+
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import numpy as np
+
+__author__ = "mt5_stub"
+__version__ = "5.0.0-stub"
+
+TIMEFRAME_M1 = 1
+TIMEFRAME_M5 = 5
+TIMEFRAME_M15 = 15
+TIMEFRAME_M30 = 30
+TIMEFRAME_H1 = 16385
+TIMEFRAME_H4 = 16388
+TIMEFRAME_D1 = 16408
+
+TIMEFRAME_SECONDS = {
+    TIMEFRAME_M1: 60,
+    TIMEFRAME_M5: 300,
+    TIMEFRAME_M15: 900,
+    TIMEFRAME_M30: 1800,
+    TIMEFRAME_H1: 3600,
+    TIMEFRAME_H4: 14400,
+    TIMEFRAME_D1: 86400,
+}
+
+RES_S_OK = 1
+RES_E_FAIL = -1
+RES_E_INVALID_PARAMS = -2
+RES_E_NOT_FOUND = -4
+RES_E_INTERNAL_FAIL = -10000
+
+TRADE_ACTION_DEAL = 1
+ORDER_TYPE_BUY = 0
+ORDER_TYPE_SELL = 1
+ORDER_TIME_GTC = 0
+ORDER_FILLING_FOK = 0
+ORDER_FILLING_IOC = 1
+POSITION_TYPE_BUY = 0
+POSITION_TYPE_SELL = 1
+TRADE_RETCODE_DONE = 10009
+TRADE_RETCODE_INVALID = 10013
+TRADE_RETCODE_INVALID_STOPS = 10016
+TRADE_RETCODE_MARKET_CLOSED = 10018
+
+RATES_DTYPE = np.dtype([("time", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"), ("close", "<f8"),
+                        ("tick_volume", "<u8"), ("spread", "<i4"), ("real_volume", "<u8")])
+
+TerminalInfo = namedtuple("TerminalInfo", ["connected", "trade_allowed", "build", "name", "path", "data_path"])
+AccountInfo = namedtuple("AccountInfo", ["login", "server", "balance", "equity", "currency", "leverage"])
+SymbolInfo = namedtuple("SymbolInfo", ["name", "digits", "point", "spread", "trade_contract_size", "visible"])
+Tick = namedtuple("Tick", ["time", "bid", "ask", "last", "volume", "time_msc", "flags", "volume_real"])
+OrderSendResult = namedtuple("OrderSendResult", ["retcode", "deal", "order", "volume", "price", "bid", "ask",
+                                                 "comment", "request_id", "retcode_external", "request"])
+TradePosition = namedtuple("TradePosition", ["ticket", "time", "type", "magic", "volume", "price_open", "sl", "tp",
+                                             "price_current", "profit", "symbol", "comment"])
+
+# Base price and digits of the synthetic symbols (add more with ``configure(symbols=...)``)
+SYMBOLS = {
+    "XAUUSD": (1800.0, 3),
+    "XAUUSDm": (1800.0, 3),
+    "EURUSD": (1.1, 5),
+    "EURUSDm": (1.1, 5),
+}
+
+# Module state, reset by ``configure``
+_state = {}
+
+
+def configure(now=None, history_start="2015-01-01", max_bars_per_request=100_000, fail_initialize=0,
+              latency=0.0, symbols=None, speed=None) -> None:
+    """
+    Reset the fake terminal.
+
+    Args:
+        now: Terminal "current time" (epoch seconds or ISO string); default: wall clock.
+            Bars newer than this do not exist, and the bar containing it is still forming.
+        history_start: Earliest bar available.
+        max_bars_per_request (int): ``copy_rates_*`` fail (as the terminal does past its
+            "Max bars" limit) when a request covers more bars than this.
+        fail_initialize (int): Number of upcoming ``initialize`` calls that fail.
+        latency (float): Seconds slept per call, to make timing tests meaningful.
+        symbols (dict): Extra ``name -> (base_price, digits)`` entries.
+        speed (float): With ``now``, let the clock run from ``now`` at ``speed`` terminal
+            seconds per wall-clock second instead of standing still (offline replays).
+    """
+    _state.clear()
+    _state.update({
+        "now": _to_epoch(now) if now is not None else None,
+        "speed": speed,
+        "started": time.time(),
+        "history_start": _to_epoch(history_start),
+        "max_bars": max_bars_per_request,
+        "fail_initialize": fail_initialize,
+        "latency": latency,
+        "symbols": {**SYMBOLS, **(symbols or {})},
+        "initialized": False,
+        "login": None,
+        "server": None,
+        "last_error": (RES_S_OK, "Success"),
+        "calls": {},
+        "positions": {},
+        "closed": [],
+        "tickets": 0,
+    })
+
+
+def install() -> None:
+    """Register this module as ``MetaTrader5`` in ``sys.modules``."""
+    if not _state:
+        configure()
+    sys.modules["MetaTrader5"] = sys.modules[__name__]
+
+
+def _to_epoch(value) -> int:
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    if isinstance(value, str):
+        return _to_epoch(datetime.fromisoformat(value))
+    return int(value)
+
+
+def _call(name: str) -> bool:
+    """Book-keeping shared by every API function; False if the terminal is not initialized."""
+    if not _state:
+        configure()
+    _state["calls"][name] = _state["calls"].get(name, 0) + 1
+    if _state["latency"]:
+        time.sleep(_state["latency"])
+    if not _state["initialized"] and name not in ("initialize", "last_error", "version"):
+        _state["last_error"] = (RES_E_INTERNAL_FAIL, "IPC initialize failed, MetaTrader 5 x64 not found")
+        return False
+    return True
+
+
+def _now() -> int:
+    if _state["now"] is None:
+        return int(time.time())
+    if _state["speed"]:
+        return int(_state["now"] + (time.time() - _state["started"]) * _state["speed"])
+    return _state["now"]
+
+
+def advance(seconds: float) -> None:
+    """Move a fixed terminal clock forward (not part of the real API)."""
+    if not _state:
+        configure()
+    if _state["now"] is None:
+        _state["now"] = int(time.time())
+    _state["now"] += int(seconds)
+
+
+def terminal_time() -> int:
+    """The stub terminal's current time in epoch seconds (not part of the real API)."""
+    if not _state:
+        configure()
+    return _now()
+
+
+def closed_positions() -> list:
+    """Positions closed at SL/TP so far, as dicts with exit time, price and profit (not part of the real API)."""
+    return list(_state.get("closed", []))
+
+
+def call_counts() -> dict:
+    """Number of calls per API function since the last ``configure``."""
+    return dict(_state.get("calls", {}))
+
+
+# -----------------------------------------------------------------------------------------
+#  Terminal API
+# -----------------------------------------------------------------------------------------
+
+def initialize(path=None, login=None, password=None, server=None, timeout=60000, portable=False) -> bool:
+    _call("initialize")
+    if _state["fail_initialize"] > 0:
+        _state["fail_initialize"] -= 1
+        _state["last_error"] = (RES_E_INTERNAL_FAIL, "IPC timeout")
+        return False
+    _state.update({"initialized": True, "login": login or 10000001, "server": server or "Stub-Demo",
+                   "last_error": (RES_S_OK, "Success")})
+    return True
+
+
+def login(login, password=None, server=None, timeout=60000) -> bool:
+    if not _call("login"):
+        return False
+    _state.update({"login": login, "server": server or _state["server"], "last_error": (RES_S_OK, "Success")})
+    return True
+
+
+def shutdown() -> None:
+    _call("shutdown")
+    _state["initialized"] = False
+
+
+def disconnect() -> None:
+    """Simulate the terminal dropping the connection (not part of the real API)."""
+    if not _state:
+        configure()
+    _state["initialized"] = False
+
+
+def last_error() -> tuple:
+    _call("last_error")
+    return _state["last_error"]
+
+
+def version() -> tuple:
+    _call("version")
+    return (500, 4000, "01 Jan 2024")
+
+
+def terminal_info():
+    if not _call("terminal_info"):
+        return None
+    return TerminalInfo(connected=True, trade_allowed=True, build=4000, name="MetaTrader 5 (stub)",
+                        path="/tmp/mt5_stub", data_path="/tmp/mt5_stub")
+
+
+def account_info():
+    if not _call("account_info"):
+        return None
+    return AccountInfo(login=_state["login"], server=_state["server"], balance=10_000.0, equity=10_000.0,
+                       currency="USD", leverage=100)
+
+
+def symbol_info(symbol: str):
+    if not _call("symbol_info"):
+        return None
+    if symbol not in _state["symbols"]:
+        _state["last_error"] = (RES_E_NOT_FOUND, f"Symbol {symbol} not found")
+        return None
+    _, digits = _state["symbols"][symbol]
+    return SymbolInfo(name=symbol, digits=digits, point=10.0 ** -digits, spread=20,
+                      trade_contract_size=100.0 if symbol.startswith("XAU") else 100_000.0, visible=True)
+
+
+# -----------------------------------------------------------------------------------------
+#  Rates
+# -----------------------------------------------------------------------------------------
+
+def _bar_times(timeframe: int, start: int, end: int) -> np.ndarray:
+    """Open times of the bars in ``[start, end]`` (weekends skipped), up to the current bar."""
+    seconds = TIMEFRAME_SECONDS[timeframe]
+    start = max(start, _state["history_start"])
+    end = min(end, _now())
+    first = -(-start // seconds) * seconds
+    if end < first:
+        return np.empty(0, dtype=np.int64)
+    times = np.arange(first, end + 1, seconds, dtype=np.int64)
+    weekday = (times // 86400 + 3) % 7          # 0 = Monday (1970-01-01 was a Thursday)
+    return times[weekday < 5]
+
+
+def _rates(symbol: str, timeframe: int, times: np.ndarray) -> np.ndarray:
+    """Deterministic prices: a smooth trend plus hashed noise, a function of (symbol, time) only."""
+    base, digits = _state["symbols"][symbol]
+    seconds = TIMEFRAME_SECONDS[timeframe]
+    t = times.astype(np.float64)
+
+    def noise(offset):
+        h = (times.astype(np.uint64) * np.uint64(2654435761) + np.uint64(offset)) % np.uint64(2 ** 32)
+        return h.astype(np.float64) / 2 ** 32 - 0.5
+
+    mid = base * (1.0 + 0.2 * np.sin(t / 2.0e7) + 0.02 * np.sin(t / 3.0e5))
+    scale = base * 0.0008 * np.sqrt(seconds / 3600)
+    open_ = mid + scale * noise(1)
+    close = mid + scale * noise(2)
+    high = np.maximum(open_, close) + scale * np.abs(noise(3))
+    low = np.minimum(open_, close) - scale * np.abs(noise(4))
+
+    rates = np.empty(len(times), dtype=RATES_DTYPE)
+    rates["time"] = times
+    rates["open"], rates["high"] = np.round(open_, digits), np.round(high, digits)
+    rates["low"], rates["close"] = np.round(low, digits), np.round(close, digits)
+    rates["tick_volume"] = (500 + 1000 * (noise(5) + 0.5) * seconds / 3600).astype(np.uint64)
+    rates["spread"] = 20
+    rates["real_volume"] = 0
+    return rates
+
+
+def copy_rates_range(symbol: str, timeframe: int, date_from, date_to):
+    """Bars with open time in ``[date_from, date_to]``, or None on error (see ``last_error``)."""
+    if not _call("copy_rates_range"):
+        return None
+    if symbol not in _state["symbols"] or timeframe not in TIMEFRAME_SECONDS:
+        _state["last_error"] = (RES_E_INVALID_PARAMS, "Invalid symbol or timeframe")
+        return None
+    times = _bar_times(timeframe, _to_epoch(date_from), _to_epoch(date_to))
+    if len(times) > _state["max_bars"]:
+        _state["last_error"] = (RES_E_FAIL, "Terminal: requested history exceeds Max bars in chart")
+        return None
+    return _rates(symbol, timeframe, times)
+
+
+def copy_rates_from_pos(symbol: str, timeframe: int, start_pos: int, count: int):
+    """``count`` bars ending ``start_pos`` bars before the current (forming) bar."""
+    if not _call("copy_rates_from_pos"):
+        return None
+    if symbol not in _state["symbols"] or timeframe not in TIMEFRAME_SECONDS:
+        _state["last_error"] = (RES_E_INVALID_PARAMS, "Invalid symbol or timeframe")
+        return None
+    seconds = TIMEFRAME_SECONDS[timeframe]
+    # Enough calendar time to cover weekends
+    lookback = (start_pos + count) * seconds * 7 // 5 + 3 * 86400
+    times = _bar_times(timeframe, _now() - lookback, _now())
+    times = times[max(0, len(times) - start_pos - count):len(times) - start_pos]
+    return _rates(symbol, timeframe, times)
+
+
+# -----------------------------------------------------------------------------------------
+#  Trading (stub broker)
+# -----------------------------------------------------------------------------------------
+
+def symbol_info_tick(symbol: str):
+    """Current bid/ask: the open of the forming M1 bar, ask = bid + spread."""
+    if not _call("symbol_info_tick"):
+        return None
+    if symbol not in _state["symbols"]:
+        _state["last_error"] = (RES_E_NOT_FOUND, f"Symbol {symbol} not found")
+        return None
+    now = _now()
+    bar = _rates(symbol, TIMEFRAME_M1, np.array([now - now % 60], dtype=np.int64))[0]
+    _, digits = _state["symbols"][symbol]
+    bid = float(bar["open"])
+    ask = round(bid + float(bar["spread"]) * 10.0 ** -digits, digits)
+    return Tick(time=now, bid=bid, ask=ask, last=0.0, volume=0, time_msc=now * 1000, flags=6, volume_real=0.0)
+
+
+def _contract_size(symbol: str) -> float:
+    return 100.0 if symbol.startswith("XAU") else 100_000.0
+
+
+def _update_positions() -> None:
+    """Close positions whose SL/TP was touched by an M1 bar that has completed since they opened."""
+    now = _now()
+    for ticket, position in list(_state["positions"].items()):
+        first = position.time - position.time % 60 + 60
+        times = _bar_times(TIMEFRAME_M1, first, now - 60)
+        times = times[times + 60 <= now]
+        if not len(times):
+            continue
+        bars = _rates(position.symbol, TIMEFRAME_M1, times)
+        buy = position.type == POSITION_TYPE_BUY
+        spread = bars["spread"].astype(np.float64) * 10.0 ** -_state["symbols"][position.symbol][1]
+        # A BUY exits at the bid, a SELL at the ask
+        low = bars["low"] if buy else bars["low"] + spread
+        high = bars["high"] if buy else bars["high"] + spread
+        hit_sl = (low <= position.sl) if buy else (high >= position.sl)
+        hit_tp = (high >= position.tp) if buy else (low <= position.tp)
+        hits = np.flatnonzero((hit_sl & (position.sl > 0)) | (hit_tp & (position.tp > 0)))
+        if not len(hits):
+            continue
+        k = hits[0]
+        price = float(position.sl if hit_sl[k] and position.sl > 0 else position.tp)
+        sign = 1 if buy else -1
+        profit = sign * (price - position.price_open) * position.volume * _contract_size(position.symbol)
+        _state["closed"].append({**position._asdict(), "exit_time": int(times[k]) + 60, "exit_price": price,
+                                 "profit": round(float(profit), 2), "reason": "sl" if price == position.sl else "tp"})
+        del _state["positions"][ticket]
+
+
+def order_send(request: dict):
+    """Market orders (``TRADE_ACTION_DEAL``) only; fills at the current tick."""
+    if not _call("order_send"):
+        return None
+
+    def reply(retcode, comment, price=0.0, ticket=0, tick=None):
+        return OrderSendResult(retcode=retcode, deal=ticket, order=ticket, volume=request.get("volume", 0.0),
+                               price=price, bid=tick.bid if tick else 0.0, ask=tick.ask if tick else 0.0,
+                               comment=comment, request_id=_state["tickets"], retcode_external=0, request=request)
+
+    symbol = request.get("symbol")
+    if (request.get("action") != TRADE_ACTION_DEAL or symbol not in _state["symbols"]
+            or request.get("type") not in (ORDER_TYPE_BUY, ORDER_TYPE_SELL) or not request.get("volume", 0) > 0):
+        _state["last_error"] = (RES_E_INVALID_PARAMS, "Invalid request")
+        return reply(TRADE_RETCODE_INVALID, "Invalid request")
+    now = _now()
+    if (now // 86400 + 3) % 7 >= 5:
+        return reply(TRADE_RETCODE_MARKET_CLOSED, "Market closed")
+
+    _update_positions()
+    tick = symbol_info_tick(symbol)
+    buy = request["type"] == ORDER_TYPE_BUY
+    price = tick.ask if buy else tick.bid
+    sl, tp = float(request.get("sl", 0.0)), float(request.get("tp", 0.0))
+    if (sl and (sl >= price if buy else sl <= price)) or (tp and (tp <= price if buy else tp >= price)):
+        return reply(TRADE_RETCODE_INVALID_STOPS, "Invalid stops", tick=tick)
+
+    _state["tickets"] += 1
+    ticket = _state["tickets"]
+    _state["positions"][ticket] = TradePosition(
+        ticket=ticket, time=now, type=POSITION_TYPE_BUY if buy else POSITION_TYPE_SELL,
+        magic=request.get("magic", 0), volume=float(request["volume"]), price_open=price, sl=sl, tp=tp,
+        price_current=price, profit=0.0, symbol=symbol, comment=request.get("comment", ""))
+    return reply(TRADE_RETCODE_DONE, "Request executed", price=price, ticket=ticket, tick=tick)
+
+
+def positions_get(symbol: str = None, ticket: int = None):
+    """Open positions (after closing any whose SL/TP was hit), optionally filtered."""
+    if not _call("positions_get"):
+        return None
+    _update_positions()
+    positions = [p for p in _state["positions"].values()
+                 if (symbol is None or p.symbol == symbol) and (ticket is None or p.ticket == ticket)]
+    return tuple(positions)
+
+
+def positions_total() -> int:
+    if not _call("positions_total"):
+        return None
+    _update_positions()
+    return len(_state["positions"])
@@ -0,0 +1,269 @@
+"""
+One forest for several prediction horizons.
+
+The notebook predicts next-bar direction only (``<NexH>`` = ``<CLOSE>.shift(-1)``). Here the
+targets for every horizon ``h`` (``close[t + h] > close[t]``) are built in one pass and a single
+multi-output ``RandomForestClassifier`` is fitted on all of them: every tree is grown once on
+one bootstrap sample, with splits chosen for all horizons jointly.
+
+``export_multi_horizon`` writes that forest as one ``TreeEnsembleRegressor`` node whose leaves
+carry ``P(up)`` for each horizon, so one ``OnnxRun`` returns an ``(n, len(horizons))`` float
+matrix. (skl2onnx can convert multi-output forests, but emits one ONNX node per tree and a
+3-D probability output that MT5 cannot read into a matrix.)
+
+``compare_with_per_horizon`` times the one-model path against one forest per horizon:
+training, export, single-bar and batch inference, and precision per horizon on a holdout.
+"""
+
+import time
+
+import numpy as np
+import onnx
+import pandas as pd
+from onnx import TensorProto, helper
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import precision_score
+
+from feature_engine import FEATURE_NAMES, compute_features, compute_target, valid_rows
+
+# Bars ahead; on H1 data: 1h, 4h and 24h
+DEFAULT_HORIZONS = [1, 4, 24]
+
+# The notebook's final_model
+DEFAULT_MODEL = RandomForestClassifier(n_estimators=100, min_samples_split=50, random_state=1,
+                                       max_depth=15, min_samples_leaf=20)
+
+
+def horizon_targets(close: np.ndarray, horizons: list = None) -> np.ndarray:
+    """
+    Direction targets for every horizon: ``Y[t, k] = close[t + horizons[k]] > close[t]``.
+
+    The last ``h`` rows of horizon ``h`` have no future close and are 0; use
+    :func:`build_multi_horizon_dataset` to drop them.
+
+    Returns:
+        np.ndarray: ``(n, len(horizons))`` int8 matrix.
+    """
+    horizons = horizons or DEFAULT_HORIZONS
+    close = np.asarray(close, dtype=np.float64)
+    targets = np.zeros((len(close), len(horizons)), dtype=np.int8)
+    for k, h in enumerate(horizons):
+        if h < len(close):
+            targets[:-h, k] = close[h:] > close[:-h]
+    return targets
+
+
+def build_multi_horizon_dataset(data, horizons: list = None) -> tuple:
+    """
+    Feature matrix and all horizon targets, computed once.
+
+    Features are ``feature_engine``'s (the ``Trend`` features keep using the next-bar target);
+    rows are the notebook's valid rows that also have a future close for the longest horizon.
+
+    Returns:
+        tuple: ``(X, Y, rows)`` - float32 features, ``(n, H)`` int8 targets and row positions.
+    """
+    horizons = horizons or DEFAULT_HORIZONS
+    if isinstance(data, pd.DataFrame):
+        columns = [data[name].to_numpy() for name in ("<OPEN>", "<HIGH>", "<LOW>", "<CLOSE>", "<TICKVOL>")]
+    else:
+        columns = [data[name] for name in ("open", "high", "low", "close", "tickvol")]
+
+    features = compute_features(*columns, target=compute_target(columns[3]))
+    targets = horizon_targets(columns[3], horizons)
+    mask = valid_rows(features, drop_last=False)
+    mask[max(len(mask) - max(horizons), 0):] = False
+    rows = np.flatnonzero(mask)
+    return np.ascontiguousarray(features[rows]), targets[rows], rows
+
+
+def predict_horizons(model, X: np.ndarray) -> np.ndarray:
+    """``P(up)`` per horizon from a fitted multi-output forest, shape ``(n, H)``."""
+    proba = model.predict_proba(X)
+    proba = proba if isinstance(proba, list) else [proba]
+    return np.column_stack([p[:, list(classes).index(1)] if 1 in classes else np.zeros(len(X))
+                            for p, classes in zip(proba, np.atleast_2d(model.classes_))]).astype(np.float32)
+
+
+# -----------------------------------------------------------------------------------------
+#  ONNX export
+# -----------------------------------------------------------------------------------------
+
+def export_multi_horizon(model, n_features: int, horizons: list, target_opset: int = 11) -> onnx.ModelProto:
+    """
+    Export a fitted multi-output forest as one ``TreeEnsembleRegressor`` emitting ``P(up)`` per horizon.
+
+    Each leaf carries, for every output ``k``, the class-1 fraction of that leaf divided by the
+    number of trees; summing over trees reproduces ``predict_proba(X)[k][:, 1]``.
+
+    Returns:
+        onnx.ModelProto: Input ``float_input [None, n_features]``, output
+        ``probabilities [None, len(horizons)]``.
+    """
+    n_trees = len(model.estimators_)
+    cols = {name: [] for name in ("nodes_treeids", "nodes_nodeids", "nodes_modes", "nodes_featureids",
+                                  "nodes_values", "nodes_truenodeids", "nodes_falsenodeids",
+                                  "target_treeids", "target_nodeids", "target_ids", "target_weights")}
+    classes = np.atleast_2d(model.classes_)
+
+    for t, estimator in enumerate(model.estimators_):
+        tree = estimator.tree_
+        # sklearn compares float32(x) <= float64 threshold; round thresholds down so the float32
+        # comparison in onnxruntime sends every row the same way
+        thresholds = tree.threshold.astype(np.float32)
+        rounded_up = thresholds > tree.threshold
+        thresholds[rounded_up] = np.nextafter(thresholds[rounded_up], np.float32(-np.inf))
+        for node_id in range(tree.node_count):
+            cols["nodes_treeids"].append(t)
+            cols["nodes_nodeids"].append(node_id)
+            left, right = int(tree.children_left[node_id]), int(tree.children_right[node_id])
+            if left == -1:
+                cols["nodes_modes"].append(b"LEAF")
+                cols["nodes_featureids"].append(0)
+                cols["nodes_values"].append(0.0)
+                cols["nodes_truenodeids"].append(0)
+                cols["nodes_falsenodeids"].append(0)
+                value = tree.value[node_id]                 # (n_outputs, n_classes)
+                for k in range(len(horizons)):
+                    output_classes = list(classes[k])
+                    counts = value[k, :len(output_classes)]
+                    share = counts[output_classes.index(1)] / counts.sum() if 1 in output_classes else 0.0
+                    cols["target_treeids"].append(t)
+                    cols["target_nodeids"].append(node_id)
+                    cols["target_ids"].append(k)
+                    cols["target_weights"].append(float(share) / n_trees)
+            else:
+                cols["nodes_modes"].append(b"BRANCH_LEQ")
+                cols["nodes_featureids"].append(int(tree.feature[node_id]))
+                cols["nodes_values"].append(float(thresholds[node_id]))
+                cols["nodes_truenodeids"].append(left)
+                cols["nodes_falsenodeids"].append(right)
+
+    node = helper.make_node("TreeEnsembleRegressor", ["float_input"], ["probabilities"], domain="ai.onnx.ml",
+                            n_targets=len(horizons), aggregate_function="SUM", post_transform="NONE",
+                            **cols)
+    graph = helper.make_graph(
+        [node], "multi_horizon_forest",
+        [helper.make_tensor_value_info("float_input", TensorProto.FLOAT, [None, n_features])],
+        [helper.make_tensor_value_info("probabilities", TensorProto.FLOAT, [None, len(horizons)])])
+    proto = helper.make_model(graph, opset_imports=[helper.make_opsetid("", target_opset),
+                                                    helper.make_opsetid("ai.onnx.ml", 1)],
+                              producer_name="multi_horizon")
+    proto.ir_version = 7
+    proto.metadata_props.append(onnx.StringStringEntryProto(key="horizons", value=",".join(map(str, horizons))))
+    onnx.checker.check_model(proto)
+    return proto
+
+
+# -----------------------------------------------------------------------------------------
+#  Timing comparison
+# -----------------------------------------------------------------------------------------
+
+def _single_row_latency(run, X: np.ndarray, n: int = 500) -> float:
+    started = time.perf_counter()
+    for i in range(n):
+        run(X[i % len(X):i % len(X) + 1])
+    return (time.perf_counter() - started) / n
+
+
+def compare_with_per_horizon(X: np.ndarray, Y: np.ndarray, horizons: list, model=None,
+                             test_fraction: float = 0.2) -> pd.DataFrame:
+    """
+    One multi-output forest vs one forest per horizon on a chronological train/test split.
+
+    Returns:
+        pd.DataFrame: One row per approach with fit/export seconds, single-bar and batch
+        inference time (all horizons) and precision per horizon.
+    """
+    from onnx_export import export_forest
+    from onnx_utils import make_session, positive_proba
+
+    model = model if model is not None else DEFAULT_MODEL
+    split = int(len(X) * (1 - test_fraction))
+    X_train, X_test, Y_train, Y_test = X[:split], X[split:], Y[:split], Y[split:]
+    rows = []
+
+    # One forest, all horizons
+    started = time.perf_counter()
+    multi = clone(model).fit(X_train, Y_train)
+    fit_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    payload = export_multi_horizon(multi, X.shape[1], horizons).SerializeToString()
+    export_seconds = time.perf_counter() - started
+    session = make_session(payload, intra_op_threads=1)
+    name = session.get_inputs()[0].name
+
+    def run_multi(batch):
+        return session.run(None, {name: batch})[0]
+
+    started = time.perf_counter()
+    proba = run_multi(X_test)
+    batch_seconds = time.perf_counter() - started
+    row = {"approach": "multi_output", "models": 1, "fit_s": fit_seconds, "export_s": export_seconds,
+           "onnx_kb": len(payload) / 1024, "bar_latency_ms": _single_row_latency(run_multi, X_test) * 1000,
+           "batch_s": batch_seconds,
+           "onnx_vs_sklearn": float(np.abs(proba - predict_horizons(multi, X_test)).max())}
+    for k, h in enumerate(horizons):
+        row[f"precision_h{h}"] = precision_score(Y_test[:, k], proba[:, k] > 0.5, zero_division=0)
+    rows.append(row)
+
+    # One forest per horizon
+    fit_seconds = export_seconds = size = 0.0
+    sessions = []
+    for k in range(len(horizons)):
+        started = time.perf_counter()
+        single = clone(model).fit(X_train, Y_train[:, k])
+        fit_seconds += time.perf_counter() - started
+        started = time.perf_counter()
+        payload = export_forest(single, X.shape[1], zipmap=False).SerializeToString()
+        export_seconds += time.perf_counter() - started
+        size += len(payload)
+        sessions.append(make_session(payload, intra_op_threads=1))
+
+    def run_each(batch):
+        return np.column_stack([positive_proba(s.run(None, {s.get_inputs()[0].name: batch})) for s in sessions])
+
+    started = time.perf_counter()
+    proba = run_each(X_test)
+    batch_seconds = time.perf_counter() - started
+    row = {"approach": "per_horizon", "models": len(horizons), "fit_s": fit_seconds, "export_s": export_seconds,
+           "onnx_kb": size / 1024, "bar_latency_ms": _single_row_latency(run_each, X_test) * 1000,
+           "batch_s": batch_seconds, "onnx_vs_sklearn": None}
+    for k, h in enumerate(horizons):
+        row[f"precision_h{h}"] = precision_score(Y_test[:, k], proba[:, k] > 0.5, zero_division=0)
+    rows.append(row)
+
+    report = pd.DataFrame(rows)
+    for column in ("fit_s", "export_s", "bar_latency_ms", "batch_s"):
+        report[f"{column}_speedup"] = report[column].iloc[1] / report[column]
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from bar_store import load_bars
+
+    parser = argparse.ArgumentParser(description="Train and export one forest for several horizons")
+    parser.add_argument("path", nargs="?", default="XAUUSDm_H1_201801020600_202412310000.csv",
+                        help="MT5 CSV export or bar store directory")
+    parser.add_argument("--horizons", type=int, nargs="+", default=DEFAULT_HORIZONS)
+    parser.add_argument("--out", default="xauusd_multi_horizon_model.onnx")
+    parser.add_argument("--compare", action="store_true", help="Time against one forest per horizon")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    X, Y, _ = build_multi_horizon_dataset(load_bars(args.path), args.horizons)
+    print(f"🎯 {len(X):,} rows x {len(args.horizons)} horizons {args.horizons} "
+          f"in {time.perf_counter() - started:.2f}s (up rates: {np.round(Y.mean(axis=0), 3).tolist()})")
+
+    if args.compare:
+        print(compare_with_per_horizon(X, Y, args.horizons).to_string(index=False))
+
+    model = clone(DEFAULT_MODEL).fit(X, Y)
+    proto = export_multi_horizon(model, len(FEATURE_NAMES), args.horizons)
+    with open(args.out, "wb") as f:
+        f.write(proto.SerializeToString())
+    print(f"✅ Saved {args.out} ({len(proto.SerializeToString()) / 1024:.1f} KB, "
+          f"output probabilities [None, {len(args.horizons)}])")
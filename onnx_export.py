@@ -0,0 +1,443 @@
+"""
+Size- and latency-optimized ONNX export variants for the random forest.
+
+The notebook exports the 200-tree forest with ``convert_sklearn(..., target_opset=11)``
+defaults: a ZipMap probability output and a ``TreeEnsembleClassifier`` node carrying every
+optional per-node attribute. This module produces alternative artifacts from the same fitted
+model and reports, for each one, file size, session load time, single-row and batch latency
+and the probability deviation from the sklearn model on a real test set.
+
+Variants (each builds on the previous one):
+
+    baseline        notebook export (ZipMap)
+    no_zipmap       plain float tensor ``probabilities`` output, no ZipMap/Cast post-processing
+    compact         drops all-default ``nodes_hitrates`` / ``nodes_missing_value_tracks_true``
+    merged          splits with identical subtrees collapsed, identical trees merged (exact)
+    rounded         thresholds rounded to ``significant`` digits, then merged again (approximate)
+    pruned          greedy subset of trees that best reproduces the full forest (approximate)
+
+ONNX tree ensembles cannot share nodes between trees, so "merged identical subtrees" means
+collapsing a split whose two children are identical subtrees, and folding fully identical
+trees into one tree with summed leaf weights. Both leave the output unchanged.
+"""
+
+import os
+import time
+
+import numpy as np
+import onnx
+import pandas as pd
+from onnx import helper
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType
+
+from onnx_utils import make_session, probabilities
+
+TREE_OP = "TreeEnsembleClassifier"
+OPTIONAL_NODE_ATTRIBUTES = ("nodes_hitrates", "nodes_missing_value_tracks_true")
+
+
+def export_forest(model, n_features: int, zipmap: bool = True, target_opset: int = 11) -> onnx.ModelProto:
+    """Convert a fitted forest the way the notebook does, optionally without ZipMap."""
+    initial_type = [('float_input', FloatTensorType([None, n_features]))]
+    options = None if zipmap else {id(model): {"zipmap": False}}
+    return convert_sklearn(model, initial_types=initial_type, target_opset=target_opset, options=options)
+
+
+def _tree_node(proto: onnx.ModelProto) -> onnx.NodeProto:
+    nodes = [node for node in proto.graph.node if node.op_type == TREE_OP]
+    if len(nodes) != 1:
+        raise ValueError(f"Expected exactly one {TREE_OP} node, found {len(nodes)}")
+    return nodes[0]
+
+
+# -----------------------------------------------------------------------------------------
+#  Tree ensemble <-> python structures
+# -----------------------------------------------------------------------------------------
+
+class TreeEnsemble:
+    """
+    Editable view of a ``TreeEnsembleClassifier`` node.
+
+    ``trees[t]`` maps node id -> ``("LEAF", weights)`` or
+    ``(mode, feature, threshold, true_id, false_id)``, where ``weights`` is a tuple of
+    ``(class_id, weight)`` pairs.
+    """
+
+    def __init__(self, trees: list, other_attributes: list):
+        self.trees = trees
+        self.other_attributes = other_attributes
+
+    @classmethod
+    def from_node(cls, node: onnx.NodeProto) -> "TreeEnsemble":
+        attrs = {a.name: helper.get_attribute_value(a) for a in node.attribute}
+        tree_ids = attrs["nodes_treeids"]
+        n_trees = max(tree_ids) + 1 if tree_ids else 0
+        trees = [{} for _ in range(n_trees)]
+
+        leaf_weights = {}
+        for t, n, c, w in zip(attrs["class_treeids"], attrs["class_nodeids"], attrs["class_ids"], attrs["class_weights"]):
+            leaf_weights.setdefault((t, n), []).append((c, w))
+
+        for i, t in enumerate(tree_ids):
+            node_id = attrs["nodes_nodeids"][i]
+            mode = attrs["nodes_modes"][i].decode()
+            if mode == "LEAF":
+                trees[t][node_id] = ("LEAF", tuple(sorted(leaf_weights.get((t, node_id), []))))
+            else:
+                trees[t][node_id] = (mode, attrs["nodes_featureids"][i], attrs["nodes_values"][i],
+                                     attrs["nodes_truenodeids"][i], attrs["nodes_falsenodeids"][i])
+
+        handled = {"nodes_treeids", "nodes_nodeids", "nodes_modes", "nodes_featureids", "nodes_values",
+                   "nodes_truenodeids", "nodes_falsenodeids", "class_treeids", "class_nodeids",
+                   "class_ids", "class_weights"} | set(OPTIONAL_NODE_ATTRIBUTES)
+        other = [a for a in node.attribute if a.name not in handled]
+        return cls(trees, other)
+
+    def n_nodes(self) -> int:
+        return sum(len(tree) for tree in self.trees)
+
+    def to_attributes(self) -> list:
+        """Serialize back to node attributes, renumbering nodes depth-first from 0 per tree."""
+        cols = {name: [] for name in ("nodes_treeids", "nodes_nodeids", "nodes_modes", "nodes_featureids",
+                                      "nodes_values", "nodes_truenodeids", "nodes_falsenodeids",
+                                      "class_treeids", "class_nodeids", "class_ids", "class_weights")}
+        for t, tree in enumerate(self.trees):
+            order, stack = [], [0]
+            while stack:
+                node_id = stack.pop()
+                order.append(node_id)
+                node = tree[node_id]
+                if node[0] != "LEAF":
+                    stack.append(node[4])
+                    stack.append(node[3])
+            new_id = {old: new for new, old in enumerate(order)}
+
+            for old in order:
+                node = tree[old]
+                cols["nodes_treeids"].append(t)
+                cols["nodes_nodeids"].append(new_id[old])
+                if node[0] == "LEAF":
+                    cols["nodes_modes"].append(b"LEAF")
+                    cols["nodes_featureids"].append(0)
+                    cols["nodes_values"].append(0.0)
+                    cols["nodes_truenodeids"].append(0)
+                    cols["nodes_falsenodeids"].append(0)
+                    for class_id, weight in node[1]:
+                        cols["class_treeids"].append(t)
+                        cols["class_nodeids"].append(new_id[old])
+                        cols["class_ids"].append(class_id)
+                        cols["class_weights"].append(weight)
+                else:
+                    mode, feature, value, true_id, false_id = node
+                    cols["nodes_modes"].append(mode.encode())
+                    cols["nodes_featureids"].append(feature)
+                    cols["nodes_values"].append(value)
+                    cols["nodes_truenodeids"].append(new_id[true_id])
+                    cols["nodes_falsenodeids"].append(new_id[false_id])
+
+        return [helper.make_attribute(name, values) for name, values in cols.items()] + list(self.other_attributes)
+
+    def write_into(self, proto: onnx.ModelProto) -> onnx.ModelProto:
+        """Return a copy of ``proto`` whose tree node carries this ensemble."""
+        result = onnx.ModelProto()
+        result.CopyFrom(proto)
+        node = _tree_node(result)
+        del node.attribute[:]
+        node.attribute.extend(self.to_attributes())
+        return result
+
+
+# -----------------------------------------------------------------------------------------
+#  Transformations
+# -----------------------------------------------------------------------------------------
+
+def strip_default_attributes(proto: onnx.ModelProto) -> onnx.ModelProto:
+    """Drop optional per-node attributes that only hold their default values."""
+    result = onnx.ModelProto()
+    result.CopyFrom(proto)
+    node = _tree_node(result)
+    keep = []
+    for attribute in node.attribute:
+        if attribute.name == "nodes_hitrates" and set(attribute.floats) <= {1.0}:
+            continue
+        if attribute.name == "nodes_missing_value_tracks_true" and set(attribute.ints) <= {0}:
+            continue
+        keep.append(attribute)
+    del node.attribute[:]
+    node.attribute.extend(keep)
+    return result
+
+
+def merge_identical_subtrees(ensemble: TreeEnsemble) -> TreeEnsemble:
+    """
+    Collapse splits whose two children are identical subtrees and fold identical trees.
+
+    Exact: every row reaches leaves with the same weights as before.
+    """
+    signatures = {}
+
+    def _rebuild(tree, node_id, out):
+        node = tree[node_id]
+        if node[0] == "LEAF":
+            key = ("LEAF", node[1])
+        else:
+            true_sig = _rebuild(tree, node[3], out)
+            false_sig = _rebuild(tree, node[4], out)
+            if true_sig == false_sig:
+                out[node_id] = out[node[3]]
+                return true_sig
+            key = (node[0], node[1], node[2], true_sig, false_sig)
+        sig = signatures.setdefault(key, len(signatures))
+        out[node_id] = (sig, key)
+        return sig
+
+    merged = {}        # root signature -> (tree, multiplicity)
+    for tree in ensemble.trees:
+        resolved = {}
+        root_sig = _rebuild(tree, 0, resolved)
+
+        # Rebuild the collapsed tree from resolved signatures
+        by_sig = {sig: key for sig, key in resolved.values()}
+        new_tree, next_id = {}, [0]
+
+        def _emit(sig):
+            key = by_sig[sig]
+            node_id = next_id[0]
+            next_id[0] += 1
+            if key[0] == "LEAF":
+                new_tree[node_id] = key
+            else:
+                true_id = _emit(key[3])
+                false_id = _emit(key[4])
+                new_tree[node_id] = (key[0], key[1], key[2], true_id, false_id)
+            return node_id
+
+        _emit(root_sig)
+        if root_sig in merged:
+            merged[root_sig][1] += 1
+        else:
+            merged[root_sig] = [new_tree, 1]
+
+    trees = []
+    for tree, count in merged.values():
+        if count > 1:
+            tree = {node_id: ("LEAF", tuple((c, w * count) for c, w in node[1])) if node[0] == "LEAF" else node
+                    for node_id, node in tree.items()}
+        trees.append(tree)
+    return TreeEnsemble(trees, ensemble.other_attributes)
+
+
+def round_thresholds(ensemble: TreeEnsemble, significant: int = 6) -> TreeEnsemble:
+    """
+    Round every split threshold to ``significant`` digits (approximate).
+
+    Relative rounding keeps ratio features such as ``Close_Ratio_2`` (values near 1.0) usable,
+    where fixed decimal places would erase their splits.
+    """
+    trees = [{node_id: node if node[0] == "LEAF" else
+              (node[0], node[1], float(f"{node[2]:.{significant}g}"), node[3], node[4])
+              for node_id, node in tree.items()} for tree in ensemble.trees]
+    return TreeEnsemble(trees, ensemble.other_attributes)
+
+
+def select_trees(model, X_val: np.ndarray, max_trees: int = None, tolerance: float = 0.005) -> list:
+    """
+    Greedy forward selection of trees whose mean best reproduces the full forest.
+
+    Trees are added one at a time, each time picking the tree that minimizes the mean absolute
+    difference between the subset's and the full forest's class-1 probability on ``X_val``,
+    until that difference drops below ``tolerance`` or ``max_trees`` are selected.
+
+    Returns:
+        list: Selected estimator indices.
+    """
+    per_tree = np.stack([tree.predict_proba(X_val)[:, 1] for tree in model.estimators_])
+    full = per_tree.mean(axis=0)
+    max_trees = max_trees or len(per_tree)
+
+    selected, total = [], np.zeros_like(full)
+    remaining = list(range(len(per_tree)))
+    while remaining and len(selected) < max_trees:
+        candidates = (total + per_tree[remaining]) / (len(selected) + 1)
+        errors = np.abs(candidates - full).mean(axis=1)
+        best = int(np.argmin(errors))
+        selected.append(remaining.pop(best))
+        total += per_tree[selected[-1]]
+        if errors[best] <= tolerance:
+            break
+    return sorted(selected)
+
+
+def keep_trees(ensemble: TreeEnsemble, indices: list) -> TreeEnsemble:
+    """Keep only the given trees and rescale leaf weights so the ensemble stays a mean."""
+    scale = len(ensemble.trees) / len(indices)
+    trees = []
+    for index in indices:
+        tree = ensemble.trees[index]
+        trees.append({node_id: ("LEAF", tuple((c, w * scale) for c, w in node[1])) if node[0] == "LEAF" else node
+                      for node_id, node in tree.items()})
+    return TreeEnsemble(trees, ensemble.other_attributes)
+
+
+def build_variants(model, X_val: np.ndarray, significant: int = 6, max_trees: int = None,
+                   tolerance: float = 0.005, target_opset: int = 11) -> dict:
+    """
+    Build every export variant of a fitted forest.
+
+    Args:
+        model: Fitted ``RandomForestClassifier``.
+        X_val (np.ndarray): Rows used to choose trees for the ``pruned`` variant.
+        significant (int): Threshold rounding for the ``rounded`` variant.
+        max_trees (int): Upper bound on trees kept by ``pruned``.
+        tolerance (float): Mean probability deviation at which tree selection stops.
+
+    Returns:
+        dict: Variant name -> ``onnx.ModelProto``.
+    """
+    n_features = model.n_features_in_
+    variants = {"baseline": export_forest(model, n_features, zipmap=True, target_opset=target_opset)}
+
+    plain = export_forest(model, n_features, zipmap=False, target_opset=target_opset)
+    variants["no_zipmap"] = plain
+
+    compact = strip_default_attributes(plain)
+    variants["compact"] = compact
+
+    ensemble = TreeEnsemble.from_node(_tree_node(compact))
+    variants["merged"] = merge_identical_subtrees(ensemble).write_into(compact)
+
+    rounded = merge_identical_subtrees(round_thresholds(ensemble, significant))
+    variants[f"rounded_{significant}sig"] = rounded.write_into(compact)
+
+    indices = select_trees(model, np.asarray(X_val, dtype=np.float32), max_trees=max_trees, tolerance=tolerance)
+    pruned = merge_identical_subtrees(keep_trees(ensemble, indices))
+    variants[f"pruned_{len(indices)}_trees"] = pruned.write_into(compact)
+    return variants
+
+
+# -----------------------------------------------------------------------------------------
+#  Measurement
+# -----------------------------------------------------------------------------------------
+
+def measure_variant(proto: onnx.ModelProto, X_test: np.ndarray, reference_proba: np.ndarray,
+                    single_row_runs: int = 1000, load_runs: int = 5) -> dict:
+    """
+    Size, load time, latency and deviation from the sklearn probabilities for one artifact.
+    """
+    payload = proto.SerializeToString()
+    X_test = np.ascontiguousarray(X_test, dtype=np.float32)
+
+    load_times = []
+    for _ in range(load_runs):
+        started = time.perf_counter()
+        session = make_session(payload, intra_op_threads=1)
+        load_times.append(time.perf_counter() - started)
+    input_name = session.get_inputs()[0].name
+
+    single = []
+    for i in range(single_row_runs):
+        row = X_test[i % len(X_test):i % len(X_test) + 1]
+        started = time.perf_counter()
+        session.run(None, {input_name: row})
+        single.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    outputs = session.run(None, {input_name: X_test})
+    batch_seconds = time.perf_counter() - started
+
+    proba = probabilities(outputs)[:, 1]
+    deviation = np.abs(proba - reference_proba)
+    ensemble = TreeEnsemble.from_node(_tree_node(proto))
+    return {
+        "size_kb": len(payload) / 1024,
+        "trees": len(ensemble.trees),
+        "nodes": ensemble.n_nodes(),
+        "load_ms": float(np.median(load_times) * 1000),
+        "single_row_p50_us": float(np.percentile(single, 50) * 1e6),
+        "single_row_p99_us": float(np.percentile(single, 99) * 1e6),
+        "batch_ms": batch_seconds * 1000,
+        "batch_rows_per_second": len(X_test) / batch_seconds,
+        "max_abs_deviation": float(deviation.max()),
+        "mean_abs_deviation": float(deviation.mean()),
+        "label_agreement": float(((proba > 0.5) == (reference_proba > 0.5)).mean()),
+    }
+
+
+def export_report(model, X_test: np.ndarray, out_dir: str = None, prefix: str = "xauusd_optimized_model",
+                  X_select: np.ndarray = None, **variant_options) -> pd.DataFrame:
+    """
+    Build all variants, optionally save them, and measure each against the sklearn model.
+
+    The ``pruned`` variant chooses its trees on ``X_select`` and every variant is measured on
+    ``X_test``, so the pruned deviation is not measured on the rows it was fitted to. Without
+    ``X_select`` the older half of ``X_test`` selects the trees and the newer half is measured.
+
+    Returns:
+        pd.DataFrame: One row per variant.
+    """
+    X_test = np.ascontiguousarray(X_test, dtype=np.float32)
+    if X_select is None:
+        if len(X_test) < 2:
+            raise ValueError("Need at least 2 test rows to split into selection and measurement rows")
+        X_select, X_test = X_test[:len(X_test) // 2], X_test[len(X_test) // 2:]
+    reference = model.predict_proba(X_test)[:, 1]
+    variants = build_variants(model, X_select, **variant_options)
+
+    rows = []
+    for name, proto in variants.items():
+        row = {"variant": name, **measure_variant(proto, X_test, reference)}
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+            path = os.path.join(out_dir, f"{prefix}_{name}.onnx")
+            with open(path, "wb") as f:
+                f.write(proto.SerializeToString())
+            row["path"] = path
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    import argparse
+    import pickle
+
+    from sklearn.ensemble import RandomForestClassifier
+
+    from bar_store import load_bars
+    from feature_engine import FEATURE_NAMES, build_dataset
+
+    parser = argparse.ArgumentParser(description="Export and compare optimized ONNX variants of the forest")
+    parser.add_argument("path", nargs="?", default="XAUUSDm_H1_201801020600_202412310000.csv",
+                        help="MT5 CSV export or bar store directory")
+    parser.add_argument("--model", default=None, help="Pickled fitted model (default: train the notebook's optimized model)")
+    parser.add_argument("--test-rows", type=int, default=2000, help="Most recent rows held out for measurement")
+    parser.add_argument("--select-rows", type=int, default=1000,
+                        help="Rows before the test rows held out to choose the pruned variant's trees")
+    parser.add_argument("--significant", type=int, default=6, help="Threshold digits for the rounded variant")
+    parser.add_argument("--max-trees", type=int, default=None)
+    parser.add_argument("--tolerance", type=float, default=0.005)
+    parser.add_argument("--out-dir", default="onnx_variants")
+    args = parser.parse_args()
+
+    X, y, _ = build_dataset(load_bars(args.path))
+    held_out = args.test_rows + args.select_rows
+    X_train, y_train = X[:-held_out], y[:-held_out]
+    X_select = X[-held_out:-args.test_rows] if args.select_rows else None
+    X_test = X[-args.test_rows:]
+
+    if args.model:
+        with open(args.model, "rb") as f:
+            model = pickle.load(f)
+    else:
+        print(f"🌲 Training the notebook's optimized model on {len(X_train):,} rows...")
+        model = RandomForestClassifier(n_estimators=200, min_samples_split=25, random_state=1, max_depth=15,
+                                       min_samples_leaf=10, max_features=0.8, n_jobs=-1)
+        model.fit(X_train, y_train)
+
+    print(f"🔄 Building export variants ({len(FEATURE_NAMES)} features, {len(X_test):,} test rows)...")
+    report = export_report(model, X_test, out_dir=args.out_dir, X_select=X_select, significant=args.significant,
+                           max_trees=args.max_trees, tolerance=args.tolerance)
+    with pd.option_context("display.width", 200, "display.max_columns", 20):
+        print(report.drop(columns=["path"]).to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+    report.to_csv(os.path.join(args.out_dir, "export_report.csv"), index=False)
+    print(f"📝 Variants and report saved to: {args.out_dir}")
@@ -0,0 +1,70 @@
+"""
+Shared onnxruntime helpers: tuned session creation and output decoding.
+
+The notebook exports the forest with skl2onnx defaults, so the second output is a ZipMap
+(a list of ``{class: probability}`` dicts); leaner exports emit a plain float tensor.
+``probabilities`` turns either form into an ``(n, n_classes)`` float32 array.
+"""
+
+import numpy as np
+import onnxruntime as ort
+
+OPTIMIZATION_LEVELS = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+
+def session_options(intra_op_threads: int = 0, inter_op_threads: int = 0, optimization: str = "all",
+                    parallel: bool = False, optimized_model_path: str = None) -> ort.SessionOptions:
+    """
+    Build ``SessionOptions``.
+
+    Args:
+        intra_op_threads (int): Threads used inside an operator (0 = onnxruntime default).
+        inter_op_threads (int): Threads used across operators in parallel mode (0 = default).
+        optimization (str): One of ``OPTIMIZATION_LEVELS``.
+        parallel (bool): Use ``ORT_PARALLEL`` execution mode instead of sequential.
+        optimized_model_path (str): If set, onnxruntime writes the optimized graph there.
+    """
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = intra_op_threads
+    options.inter_op_num_threads = inter_op_threads
+    options.graph_optimization_level = OPTIMIZATION_LEVELS[optimization]
+    options.execution_mode = ort.ExecutionMode.ORT_PARALLEL if parallel else ort.ExecutionMode.ORT_SEQUENTIAL
+    if optimized_model_path:
+        options.optimized_model_filepath = optimized_model_path
+    return options
+
+
+def make_session(model, **options) -> ort.InferenceSession:
+    """Create a CPU ``InferenceSession`` from a path or serialized bytes (see :func:`session_options`)."""
+    return ort.InferenceSession(model, sess_options=session_options(**options),
+                                providers=["CPUExecutionProvider"])
+
+
+def probabilities(outputs: list) -> np.ndarray:
+    """
+    Class probabilities from ``session.run(None, ...)`` outputs of a classifier.
+
+    Handles both the ZipMap output (list of dicts) and a plain ``(n, n_classes)`` tensor.
+    """
+    proba = outputs[1] if len(outputs) > 1 else outputs[0]
+    if isinstance(proba, list):
+        if not proba:
+            return np.empty((0, 2), dtype=np.float32)
+        classes = sorted(proba[0])
+        return np.array([[row[c] for c in classes] for row in proba], dtype=np.float32)
+    proba = np.asarray(proba, dtype=np.float32)
+    if proba.ndim == 1 or proba.shape[1] == 1:
+        # Single sigmoid output (e.g. create_simple_onnx.py): P(class 1)
+        p1 = proba.reshape(-1)
+        return np.stack([1.0 - p1, p1], axis=1)
+    return proba
+
+
+def positive_proba(outputs: list) -> np.ndarray:
+    """Class-1 probability per row (see :func:`probabilities`)."""
+    return probabilities(outputs)[:, 1]
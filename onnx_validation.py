@@ -0,0 +1,343 @@
+"""
+Concurrent, hash-cached validation of the ONNX models in MT5 terminal folders.
+
+``mt5_diagnostic.check_mt5_setup`` and ``verify_onnx_model`` open one model at a time and
+build a fresh ``InferenceSession`` for each, every run. Here every ``.onnx`` found under the
+given roots is hashed (SHA-256), and only contents that are not already in the result cache
+are validated, on a process pool. The same model published to several terminals is validated
+once. Each validation records:
+
+    compatibility   ai.onnx opset <= 14 (MT5), onnx.checker, a single float input of width
+                    ``n_features`` (batch dim free or 1), a class-probability output
+    load_ms         InferenceSession creation (in a warm worker, onnxruntime already imported)
+    smoke           first-run and median single-row latency, probabilities finite, in [0, 1]
+                    and summing to 1
+
+A root is either an MT5 ``Terminal`` directory (every ``<id>/MQL5/Files`` and ``Common/Files``
+below it is searched) or any other directory / ``.onnx`` file. All results go into one JSON
+report; the cache (``.cache/onnx_validation.json``) is keyed by content hash and settings, so
+renaming, copying or re-publishing an unchanged model costs only its hash.
+"""
+
+import glob
+import json
+import os
+import platform
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from model_registry import sha256_file, write_json_atomic
+
+DEFAULT_CACHE = os.path.join(".cache", "onnx_validation.json")
+DEFAULT_REPORT = "onnx_validation.json"
+MT5_MAX_OPSET = 14
+N_FEATURES = 19
+SMOKE_RUNS = 50
+
+
+def default_terminal_root() -> str:
+    """``MT5_TERMINAL_ROOT`` if set, else ``%APPDATA%\\MetaQuotes\\Terminal`` of the current user."""
+    if os.environ.get("MT5_TERMINAL_ROOT"):
+        return os.environ["MT5_TERMINAL_ROOT"]
+    appdata = os.environ.get("APPDATA", os.path.join(os.path.expanduser("~"), "AppData", "Roaming"))
+    return os.path.join(appdata, "MetaQuotes", "Terminal")
+
+
+def discover_models(roots: list) -> list:
+    """
+    ``.onnx`` files under ``roots``; paths that do not exist are skipped with a warning.
+
+    Returns:
+        list: ``{"path", "terminal"}`` per file; ``terminal`` is the terminal id (or ``"Common"``)
+        for files inside an MT5 terminal tree, else None.
+    """
+    found = {}
+    for root in roots:
+        if not os.path.exists(root):
+            print(f"⚠️  Path not found: {root}")
+            continue
+        if os.path.isfile(root):
+            found.setdefault(os.path.abspath(root), None)
+            continue
+        terminal_dirs = [name for name in sorted(os.listdir(root))
+                         if os.path.isdir(os.path.join(root, name, "MQL5", "Files"))]
+        if os.path.isdir(os.path.join(root, "Common", "Files")):
+            terminal_dirs.append("Common")
+        if not terminal_dirs:
+            for path in sorted(glob.glob(os.path.join(root, "*.onnx"))):
+                found.setdefault(os.path.abspath(path), None)
+            continue
+        for terminal in terminal_dirs:
+            files_dir = os.path.join(root, terminal, "Files" if terminal == "Common" else os.path.join("MQL5", "Files"))
+            for path in sorted(glob.glob(os.path.join(files_dir, "**", "*.onnx"), recursive=True)):
+                found.setdefault(os.path.abspath(path), terminal)
+    return [{"path": path, "terminal": terminal} for path, terminal in found.items()]
+
+
+# -----------------------------------------------------------------------------------------
+#  Validation (worker side)
+# -----------------------------------------------------------------------------------------
+
+def _shape(value_info) -> list:
+    """Declared tensor shape: ints, dim_param names, or None for unknown dims."""
+    tensor = value_info.type.tensor_type
+    if not tensor.HasField("shape"):
+        return None
+    return [dim.dim_value if dim.HasField("dim_value") else (dim.dim_param or None) for dim in tensor.shape.dim]
+
+
+def validate_model(path: str, n_features: int = N_FEATURES, smoke_runs: int = SMOKE_RUNS) -> dict:
+    """
+    Validate one model file (see the module docstring for the checks).
+
+    Returns:
+        dict: ``status`` (``"ok"``, ``"warning"`` or ``"error"``), ``errors``, ``warnings``,
+        ``opsets``, ``inputs``, ``outputs``, ``load_ms`` and ``smoke``.
+    """
+    import onnx
+
+    from onnx_utils import make_session, probabilities
+
+    errors, warnings = [], []
+    result = {"errors": errors, "warnings": warnings}
+    with open(path, "rb") as file:
+        payload = file.read()
+
+    # --- static checks ------------------------------------------------------------------
+    try:
+        model = onnx.load_from_string(payload)
+        onnx.checker.check_model(model)
+    except Exception as error:
+        errors.append(f"invalid ONNX: {error}")
+        result["status"] = "error"
+        return result
+
+    result["opsets"] = {opset.domain or "ai.onnx": opset.version for opset in model.opset_import}
+    result["ir_version"] = model.ir_version
+    result["producer"] = f"{model.producer_name} {model.producer_version}".strip()
+    default_opset = result["opsets"].get("ai.onnx")
+    result["mt5_opset_ok"] = default_opset is None or default_opset <= MT5_MAX_OPSET
+    if not result["mt5_opset_ok"]:
+        errors.append(f"ai.onnx opset {default_opset} > {MT5_MAX_OPSET} (not supported by MT5)")
+
+    initializers = {tensor.name for tensor in model.graph.initializer}
+    inputs = [value for value in model.graph.input if value.name not in initializers]
+    result["inputs"] = [{"name": value.name, "shape": _shape(value),
+                         "type": onnx.TensorProto.DataType.Name(value.type.tensor_type.elem_type)}
+                        for value in inputs]
+    result["outputs"] = [{"name": value.name, "shape": _shape(value) if value.type.HasField("tensor_type") else None,
+                          "type": (onnx.TensorProto.DataType.Name(value.type.tensor_type.elem_type)
+                                   if value.type.HasField("tensor_type") else value.type.WhichOneof("value"))}
+                         for value in model.graph.output]
+    result["zipmap"] = any(node.op_type == "ZipMap" for node in model.graph.node)
+
+    if len(inputs) != 1:
+        errors.append(f"expected 1 input, found {len(inputs)}")
+    else:
+        spec = result["inputs"][0]
+        shape = spec["shape"]
+        if spec["type"] != "FLOAT":
+            errors.append(f"input type {spec['type']}, the EA feeds FLOAT")
+        if shape is None or len(shape) != 2:
+            errors.append(f"input shape {shape}, expected [batch, {n_features}]")
+        else:
+            if shape[1] != n_features:
+                errors.append(f"input width {shape[1]}, the EA sends {n_features} features")
+            if isinstance(shape[0], int) and shape[0] not in (0, 1):
+                errors.append(f"fixed batch dimension {shape[0]}, the EA runs one row")
+    if result["zipmap"]:
+        warnings.append("ZipMap output (sequence of maps); a plain probability tensor is cheaper to read in MQL5")
+    if errors:
+        result["status"] = "error"
+        return result
+
+    # --- runtime checks -----------------------------------------------------------------
+    try:
+        started = time.perf_counter()
+        session = make_session(payload, intra_op_threads=1)
+        result["load_ms"] = (time.perf_counter() - started) * 1000
+
+        name = session.get_inputs()[0].name
+        rows = np.random.default_rng(0).random((smoke_runs, n_features), dtype=np.float32)
+        started = time.perf_counter()
+        outputs = session.run(None, {name: rows[:1]})
+        first_run_ms = (time.perf_counter() - started) * 1000
+        latencies, proba = [], []
+        for i in range(smoke_runs):
+            started = time.perf_counter()
+            outputs = session.run(None, {name: rows[i:i + 1]})
+            latencies.append((time.perf_counter() - started) * 1000)
+            proba.append(probabilities(outputs))
+        proba = np.concatenate(proba)
+    except Exception as error:
+        errors.append(f"onnxruntime: {error}")
+        result["status"] = "error"
+        return result
+
+    result["smoke"] = {"runs": smoke_runs, "first_run_ms": first_run_ms,
+                       "p50_ms": float(np.percentile(latencies, 50)), "p99_ms": float(np.percentile(latencies, 99)),
+                       "proba_shape": list(proba.shape)}
+    if not np.isfinite(proba).all() or proba.min() < -1e-6 or proba.max() > 1 + 1e-6:
+        errors.append("probabilities outside [0, 1] or not finite")
+    elif np.abs(proba.sum(axis=1) - 1).max() > 1e-4:
+        warnings.append(f"probabilities sum to {proba.sum(axis=1).min():.4f}..{proba.sum(axis=1).max():.4f}")
+    result["status"] = "error" if errors else "warning" if warnings else "ok"
+    return result
+
+
+def _failed(error: BaseException) -> dict:
+    return {"status": "error", "errors": [f"{type(error).__name__}: {error}"], "warnings": []}
+
+
+def _validate_task(task: tuple) -> tuple:
+    """
+    Worker task: ``(sha256, path, n_features, smoke_runs)`` -> ``(sha256, result, completed)``.
+
+    ``completed`` is False when ``validate_model`` raised (file locked or removed during a copy,
+    out of memory, ...). Such a result describes the attempt, not the model, and is not cached.
+    """
+    sha, path, n_features, smoke_runs = task
+    try:
+        return sha, validate_model(path, n_features, smoke_runs), True
+    except Exception as error:
+        return sha, _failed(error), False
+
+
+# -----------------------------------------------------------------------------------------
+#  Cache and report
+# -----------------------------------------------------------------------------------------
+
+def _settings_key(n_features: int, smoke_runs: int) -> str:
+    import onnxruntime as ort
+
+    return f"f{n_features}-r{smoke_runs}-ort{ort.__version__}"
+
+
+def load_cache(path: str) -> dict:
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def validate_models(roots: list, cache_path: str = DEFAULT_CACHE, n_features: int = N_FEATURES,
+                    smoke_runs: int = SMOKE_RUNS, n_jobs: int = None, report_path: str = None) -> dict:
+    """
+    Validate every model under ``roots``, reusing cached results for unchanged contents.
+
+    Args:
+        roots (list): Terminal directories, other directories or ``.onnx`` files.
+        cache_path (str): Result cache keyed by SHA-256 and settings (None = no cache).
+        n_features (int): Input width the EA sends.
+        smoke_runs (int): Single-row inferences timed per model.
+        n_jobs (int): Worker processes (default: all cores, at most one per model to validate).
+        report_path (str): Write the report JSON here.
+
+    Returns:
+        dict: Report with ``summary`` and one ``models`` entry per discovered file.
+    """
+    started = time.perf_counter()
+    models = discover_models(roots)
+    settings = _settings_key(n_features, smoke_runs)
+    cache = load_cache(cache_path)
+
+    for entry in models:
+        stat = os.stat(entry["path"])
+        entry["sha256"] = sha256_file(entry["path"])
+        entry.update({"size_bytes": stat.st_size,
+                      "modified": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(stat.st_mtime))})
+
+    results = {}
+    pending = {}
+    for entry in models:
+        key = f"{entry['sha256']}:{settings}"
+        if key in cache:
+            results[entry["sha256"]] = cache[key]
+        else:
+            pending.setdefault(entry["sha256"], entry["path"])
+
+    if pending:
+        tasks = [(sha, path, n_features, smoke_runs) for sha, path in pending.items()]
+        n_jobs = min(n_jobs or os.cpu_count() or 1, len(tasks))
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            futures = {pool.submit(_validate_task, task): task[0] for task in tasks}
+            for future in as_completed(futures):
+                try:
+                    sha, result, completed = future.result()
+                except Exception as error:  # the worker died, e.g. killed for memory
+                    sha, result, completed = futures[future], _failed(error), False
+                result["validated"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+                results[sha] = result
+                if completed:
+                    cache[f"{sha}:{settings}"] = result
+        if cache_path:
+            write_json_atomic(cache_path, cache)
+
+    entries = [{**entry, "cached": entry["sha256"] not in pending, **results[entry["sha256"]]} for entry in models]
+    statuses = [entry["status"] for entry in entries]
+    import onnxruntime as ort
+
+    report = {
+        "generated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "roots": [os.path.abspath(root) for root in roots],
+        "settings": {"n_features": n_features, "smoke_runs": smoke_runs, "max_opset": MT5_MAX_OPSET},
+        "environment": {"python": platform.python_version(), "onnxruntime": ort.__version__,
+                        "platform": platform.platform()},
+        "summary": {"models": len(entries), "unique": len(results), "validated": len(pending),
+                    "cached": len(results) - len(pending), "ok": statuses.count("ok"),
+                    "warning": statuses.count("warning"), "error": statuses.count("error"),
+                    "seconds": time.perf_counter() - started},
+        "models": entries,
+    }
+    if report_path:
+        write_json_atomic(report_path, report)
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Validate the ONNX models of MT5 terminals for the EA")
+    parser.add_argument("paths", nargs="*", help="Extra directories or .onnx files (e.g. .)")
+    parser.add_argument("--root", action="append", default=None,
+                        help=f"MT5 Terminal directory (repeatable; default: {default_terminal_root()})")
+    parser.add_argument("--features", type=int, default=N_FEATURES, help="Input width the EA sends")
+    parser.add_argument("--smoke-runs", type=int, default=SMOKE_RUNS)
+    parser.add_argument("--jobs", type=int, default=None)
+    parser.add_argument("--cache", default=DEFAULT_CACHE)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--report", default=DEFAULT_REPORT)
+    args = parser.parse_args()
+
+    roots = [root for root in (args.root or [default_terminal_root()]) if os.path.exists(root)]
+    for root in args.root or []:
+        if root not in roots:
+            print(f"⚠️  Root not found: {root}")
+    roots += args.paths
+    if not roots:
+        print(f"❌ No MT5 terminal directory found at {default_terminal_root()}; pass --root or paths")
+        raise SystemExit(1)
+
+    report = validate_models(roots, cache_path=None if args.no_cache else args.cache, n_features=args.features,
+                             smoke_runs=args.smoke_runs, n_jobs=args.jobs, report_path=args.report)
+    icons = {"ok": "✅", "warning": "⚠️ ", "error": "❌"}
+    for entry in report["models"]:
+        where = f"[{entry['terminal']}] " if entry["terminal"] else ""
+        timing = (f"load {entry['load_ms']:.1f} ms, p50 {entry['smoke']['p50_ms']:.3f} ms"
+                  if "smoke" in entry else "")
+        print(f"{icons[entry['status']]} {where}{entry['path']} ({entry['size_bytes'] / 1024:.0f} KB"
+              f"{', cached' if entry['cached'] else ''}) {timing}")
+        for message in entry["errors"] + entry["warnings"]:
+            print(f"      - {message}")
+    summary = report["summary"]
+    print(f"\n📊 {summary['models']} models ({summary['unique']} unique): {summary['validated']} validated, "
+          f"{summary['cached']} from cache in {summary['seconds']:.2f}s")
+    print(f"✅ {summary['ok']} ok, ⚠️  {summary['warning']} warnings, ❌ {summary['error']} errors")
+    print(f"📝 Report saved to: {args.report}")
+    if summary["error"]:
+        raise SystemExit(1)
@@ -0,0 +1,558 @@
+"""
+Rolling live-performance and drift monitor over EA prediction logs.
+
+The EA only leaves ``Print`` lines in the terminal's ``MQL5/Logs/YYYYMMDD.log`` (UTF-16) or the
+tester journal:
+
+    CS  0  07:00:00.104  random_forest (XAUUSDm,H1)  🔵 ML Signal: BUY | Confidence: 0.6342
+    CS  0  08:00:00.087  random_forest (XAUUSDm,H1)  ⚪ ML Signal: SELL | Confidence: 0.5513 (SKIPPED - Low confidence)
+
+JSON lines (``{"time": ..., "prediction": 1, "confidence": 0.63, "features": [...]}``) are read
+as well. Their ``feature_set`` names the feature definitions the logged features follow:
+``"ea"`` (the EA's ``PrepareFeatures``, ``replay.ea_features``; the default and what ``Print``
+lines get) or ``"training"`` (``feature_engine``, as ``live_trading`` logs them). The drift
+reference is built from the bars with the same definitions.
+
+Each prediction is joined with the bar it was made on: the EA decides at the open of bar ``k``
+from the features of bar ``k - 1``, so the realized outcome is ``close[k] > close[k - 1]`` (the
+notebook's ``<TRGT>`` of row ``k - 1``), known once bar ``k`` has closed.
+
+:class:`PredictionMonitor` keeps only fixed-size windows, so memory does not grow with the log:
+
+    rolling precision       share of BUY predictions that closed up, all and traded-only
+    confidence buckets      hit rate per confidence bucket
+    drift sketches          per-feature histogram over the window vs a reference histogram
+                            (quantile bins of the pre-live history), summarized as PSI
+
+Drift is tracked on ``DRIFT_FEATURES`` by default: every feature except the raw price levels
+``<OPEN> <HIGH> <LOW> <CLOSE>``. Those are non-stationary, so their PSI explodes as soon as
+price leaves the reference range even when the model is fine.
+
+A retrain signal is raised when any PSI crosses ``psi_threshold`` or rolling precision falls
+more than ``precision_tolerance`` below the walk-forward baseline.
+"""
+
+import json
+import os
+import re
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import numpy as np
+
+from feature_engine import FEATURE_NAMES
+from model_registry import ModelRegistry, write_json_atomic
+
+DEFAULT_WINDOW = 500
+DEFAULT_BUCKETS = [0.5, 0.55, 0.6, 0.65, 0.7, 0.8, 1.0]
+REFERENCE_BINS = 10
+PSI_THRESHOLD = 0.25
+
+SIGNAL_PATTERN = re.compile(r"ML Signal: (BUY|SELL) \| Confidence: ([-+0-9.eE]+)(.*SKIPPED)?")
+STAMP_PATTERN = re.compile(r"(\d{4})\.(\d{2})\.(\d{2}) (\d{2}):(\d{2}):(\d{2})")
+CLOCK_PATTERN = re.compile(r"(?:^|\s)(\d{2}):(\d{2}):(\d{2})(?:\.\d+)?\s")
+LOG_DATE_PATTERN = re.compile(r"(\d{4})(\d{2})(\d{2})")
+
+FEATURE_SETS = ["ea", "training"]
+LEVEL_FEATURES = ["<OPEN>", "<HIGH>", "<LOW>", "<CLOSE>"]
+DRIFT_FEATURES = [name for name in FEATURE_NAMES if name not in LEVEL_FEATURES]
+
+
+# -----------------------------------------------------------------------------------------
+#  Log parsing
+# -----------------------------------------------------------------------------------------
+
+def _log_encoding(path: str) -> str:
+    with open(path, "rb") as file:
+        head = file.read(4)
+    if head.startswith((b"\xff\xfe", b"\xfe\xff")):
+        return "utf-16"
+    return "utf-8-sig"
+
+
+def _log_date(path: str):
+    """Midnight (epoch seconds) of a ``YYYYMMDD.log`` file, None for other names."""
+    match = LOG_DATE_PATTERN.search(os.path.basename(path))
+    if not match:
+        return None
+    return int(datetime(*map(int, match.groups()), tzinfo=timezone.utc).timestamp())
+
+
+def parse_line(line: str, log_date: int = None):
+    """
+    One prediction from a log line, or None.
+
+    ``Print`` lines take their time from a ``YYYY.MM.DD HH:MM:SS`` stamp (tester journal) or
+    from the time of day plus ``log_date`` (terminal logs).
+
+    Returns:
+        dict: ``time`` (epoch seconds), ``prediction`` (1 BUY / 0 SELL), ``confidence``,
+        ``traded``, ``feature_set`` and, for JSON lines that carry them, ``features``.
+    """
+    line = line.strip()
+    if line.startswith("{"):
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            return None
+        if "prediction" not in record or "time" not in record:
+            return None
+        from bar_store import to_epoch_seconds
+
+        return {"time": to_epoch_seconds(record["time"]), "prediction": int(record["prediction"]),
+                "confidence": float(record.get("confidence", np.nan)),
+                "traded": bool(record.get("traded", True)), "features": record.get("features"),
+                "feature_set": record.get("feature_set", "ea")}
+
+    match = SIGNAL_PATTERN.search(line)
+    if not match:
+        return None
+    stamp = STAMP_PATTERN.search(line)
+    if stamp:
+        when = int(datetime(*map(int, stamp.groups()), tzinfo=timezone.utc).timestamp())
+    else:
+        clock = CLOCK_PATTERN.search(line)
+        if not clock or log_date is None:
+            return None
+        hours, minutes, seconds = map(int, clock.groups())
+        when = log_date + hours * 3600 + minutes * 60 + seconds
+    return {"time": when, "prediction": int(match.group(1) == "BUY"), "confidence": float(match.group(2)),
+            "traded": match.group(3) is None, "feature_set": "ea"}
+
+
+def bar_features(columns: list, feature_set: str = "ea") -> np.ndarray:
+    """Features of every bar in ``open, high, low, close, tickvol`` columns under ``feature_set``."""
+    if feature_set == "ea":
+        from replay import ea_features
+        return ea_features(*columns)
+    if feature_set == "training":
+        from feature_engine import compute_features
+        return compute_features(*columns)
+    raise ValueError(f"Unknown feature set {feature_set!r}, expected one of {FEATURE_SETS}")
+
+
+def _log_files(path: str) -> list:
+    if os.path.isdir(path):
+        return sorted(os.path.join(path, name) for name in os.listdir(path)
+                      if name.endswith((".log", ".jsonl", ".txt")))
+    return [path]
+
+
+def iter_predictions(path: str, follow: bool = False, poll: float = 1.0, time_offset: int = 0):
+    """
+    Yield predictions from a log file or a directory of logs, oldest file first.
+
+    With ``follow`` the newest file is tailed (``tail -f``) until a newer log file appears;
+    ``None`` is yielded whenever there is nothing new, so callers can do periodic work.
+
+    Args:
+        time_offset (int): Seconds added to log times (e.g. terminal local time -> server time).
+    """
+    def parsed(line, log_date):
+        prediction = parse_line(line, log_date)
+        if prediction is not None:
+            prediction["time"] += time_offset
+        return prediction
+
+    done = set()
+    while True:
+        for name in [name for name in _log_files(path) if name not in done]:
+            log_date = _log_date(name)
+            with open(name, "r", encoding=_log_encoding(name), errors="replace") as file:
+                partial = ""
+                while True:
+                    line = partial + file.readline()
+                    if line.endswith("\n"):
+                        partial = ""
+                        prediction = parsed(line, log_date)
+                        if prediction is not None:
+                            yield prediction
+                        continue
+                    # End of file: finished unless this is the log still being written
+                    partial = line
+                    if not follow or _log_files(path)[-1] != name:
+                        prediction = parsed(partial, log_date) if partial else None
+                        if prediction is not None:
+                            yield prediction
+                        break
+                    yield None
+                    time.sleep(poll)
+            done.add(name)
+        if not follow:
+            return
+        yield None
+        time.sleep(poll)
+
+
+# -----------------------------------------------------------------------------------------
+#  Rolling statistics
+# -----------------------------------------------------------------------------------------
+
+class RollingOutcomes:
+    """
+    Last ``window`` resolved predictions with running sums for precision and bucket hit rates.
+
+    Memory is ``O(window)`` regardless of how many predictions pass through.
+    """
+
+    def __init__(self, window: int = DEFAULT_WINDOW, buckets: list = None):
+        self.window = window
+        self.edges = np.asarray(buckets or DEFAULT_BUCKETS, dtype=np.float64)
+        self.items = deque()
+        self.buy = self.buy_up = self.traded_buy = self.traded_buy_up = self.hits = 0
+        self.bucket_n = np.zeros(len(self.edges) - 1, dtype=np.int64)
+        self.bucket_hits = np.zeros(len(self.edges) - 1, dtype=np.int64)
+        self.total = 0
+
+    def _bucket(self, confidence: float) -> int:
+        return int(np.clip(np.searchsorted(self.edges, confidence, side="right") - 1, 0, len(self.bucket_n) - 1))
+
+    def _apply(self, item: tuple, sign: int) -> None:
+        prediction, up, traded, bucket = item
+        hit = int(prediction == up)
+        if prediction == 1:
+            self.buy += sign
+            self.buy_up += sign * up
+            if traded:
+                self.traded_buy += sign
+                self.traded_buy_up += sign * up
+        self.hits += sign * hit
+        self.bucket_n[bucket] += sign
+        self.bucket_hits[bucket] += sign * hit
+
+    def add(self, prediction: int, up: int, confidence: float, traded: bool) -> None:
+        item = (prediction, up, traded, self._bucket(confidence))
+        self.items.append(item)
+        self._apply(item, 1)
+        self.total += 1
+        if len(self.items) > self.window:
+            self._apply(self.items.popleft(), -1)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def summary(self) -> dict:
+        buckets = {}
+        for i in range(len(self.bucket_n)):
+            label = f"{self.edges[i]:.2f}-{self.edges[i + 1]:.2f}"
+            buckets[label] = {"n": int(self.bucket_n[i]),
+                              "hit_rate": float(self.bucket_hits[i] / self.bucket_n[i]) if self.bucket_n[i] else None}
+        return {
+            "resolved": self.total,
+            "window": len(self.items),
+            "precision": self.buy_up / self.buy if self.buy else None,
+            "traded_precision": self.traded_buy_up / self.traded_buy if self.traded_buy else None,
+            "hit_rate": self.hits / len(self.items) if self.items else None,
+            "buy_rate": self.buy / len(self.items) if self.items else None,
+            "confidence_buckets": buckets,
+        }
+
+
+class DriftSketch:
+    """
+    Fixed-bin histograms of the last ``window`` rows per column, compared with a reference by PSI.
+
+    Bins are reference quantiles, so each reference bin holds ~``1 / bins`` of the mass.
+    """
+
+    def __init__(self, reference: np.ndarray, names: list, window: int = DEFAULT_WINDOW, bins: int = REFERENCE_BINS):
+        reference = np.asarray(reference, dtype=np.float64)
+        self.names = list(names)
+        self.window = window
+        self.edges = []
+        self.expected = []
+        for j in range(reference.shape[1]):
+            column = reference[:, j][np.isfinite(reference[:, j])]
+            inner = np.unique(np.quantile(column, np.linspace(0, 1, bins + 1)[1:-1])) if len(column) else np.array([])
+            counts = np.bincount(np.searchsorted(inner, column, side="right"), minlength=len(inner) + 1)
+            self.edges.append(inner)
+            self.expected.append(counts / max(counts.sum(), 1))
+        self.rows = deque()
+        self.counts = [np.zeros(len(edges) + 1, dtype=np.int64) for edges in self.edges]
+
+    def add(self, values) -> None:
+        row = tuple(int(np.searchsorted(edges, value, side="right")) if np.isfinite(value) else -1
+                    for edges, value in zip(self.edges, values))
+        self.rows.append(row)
+        for counts, index in zip(self.counts, row):
+            if index >= 0:
+                counts[index] += 1
+        if len(self.rows) > self.window:
+            for counts, index in zip(self.counts, self.rows.popleft()):
+                if index >= 0:
+                    counts[index] -= 1
+
+    def psi(self, epsilon: float = 1e-4) -> dict:
+        """Population stability index per column over the current window."""
+        result = {}
+        for name, counts, expected in zip(self.names, self.counts, self.expected):
+            total = counts.sum()
+            if not total:
+                result[name] = None
+                continue
+            actual = np.maximum(counts / total, epsilon)
+            reference = np.maximum(expected, epsilon)
+            result[name] = float(np.sum((actual - reference) * np.log(actual / reference)))
+        return result
+
+
+# -----------------------------------------------------------------------------------------
+#  Monitor
+# -----------------------------------------------------------------------------------------
+
+class PredictionMonitor:
+    """
+    Joins predictions with realized bars and maintains rolling performance and drift.
+
+    Args:
+        bars_path (str): Bar store directory or MT5 CSV export of the traded symbol/timeframe.
+        window (int): Predictions per rolling window (precision, buckets and drift).
+        buckets (list): Confidence bucket edges.
+        baseline_precision (float): Walk-forward precision to hold (e.g. from the model registry).
+        precision_tolerance (float): Allowed drop below the baseline before retraining.
+        psi_threshold (float): PSI above which a column counts as drifted.
+        min_samples (int): Resolved predictions needed before any retrain signal.
+        reference_end: Reference (training) history ends here; default: the first prediction.
+        reference_rows (int): Bars before ``reference_end`` used for the reference histograms.
+        drift_features (list): Features tracked for drift (default ``DRIFT_FEATURES``).
+    """
+
+    def __init__(self, bars_path: str, window: int = DEFAULT_WINDOW, buckets: list = None,
+                 baseline_precision: float = None,
+                 precision_tolerance: float = 0.05, psi_threshold: float = PSI_THRESHOLD,
+                 min_samples: int = 100, reference_end=None, reference_rows: int = 20_000,
+                 drift_features: list = None):
+        self.bars_path = bars_path
+        self.window = window
+        self.outcomes = RollingOutcomes(window, buckets)
+        self.baseline_precision = baseline_precision
+        self.precision_tolerance = precision_tolerance
+        self.psi_threshold = psi_threshold
+        self.min_samples = min_samples
+        self.reference_end = reference_end
+        self.reference_rows = reference_rows
+        self.drift_features = list(drift_features or DRIFT_FEATURES)
+        unknown = sorted(set(self.drift_features) - set(FEATURE_NAMES))
+        if unknown:
+            raise ValueError(f"Unknown drift features {unknown}")
+        self.drift_columns = [FEATURE_NAMES.index(name) for name in self.drift_features]
+        self.pending = deque()
+        self.drift = None
+        self.feature_set = None
+        self.unmatched = 0
+        self._bars_mtime = None
+        self._load_bars()
+
+    def _load_bars(self) -> None:
+        from bar_store import META_FILE, BarStore, load_bars
+
+        marker = os.path.join(self.bars_path, META_FILE) if os.path.isdir(self.bars_path) else self.bars_path
+        mtime = os.path.getmtime(marker)
+        if mtime == self._bars_mtime:
+            return
+        self._bars_mtime = mtime
+        if os.path.isdir(self.bars_path):
+            bars = BarStore.open(self.bars_path).slice()
+            self.times = np.asarray(bars["time"], dtype=np.int64)
+            columns = [bars[name] for name in ("open", "high", "low", "close", "tickvol")]
+        else:
+            frame = load_bars(self.bars_path)
+            self.times = frame["<DATE>"].to_numpy(dtype="datetime64[s]").astype(np.int64)
+            columns = [frame[name].to_numpy() for name in ("<OPEN>", "<HIGH>", "<LOW>", "<CLOSE>", "<TICKVOL>")]
+        self.columns = [np.asarray(values, dtype=np.float64) for values in columns]
+        self.close = self.columns[3]
+        self._features = None
+
+    def _features_at(self, row: int) -> np.ndarray:
+        """Features of bar ``row`` (what the model was fed at the open of ``row + 1``)."""
+        from replay import WARMUP
+
+        if self._features is None or row >= self._features_end or row < self._features_start:
+            # Compute a block around ``row`` so consecutive predictions reuse it
+            start = max(row - WARMUP, 0)
+            stop = min(row + 4096, len(self.close))
+            block = bar_features([values[start:stop] for values in self.columns], self.feature_set)
+            self._features, self._features_start, self._features_end = block[row - start:], row, stop
+        return self._features[row - self._features_start]
+
+    def _init_drift(self, first_time: int, feature_set: str) -> None:
+        from bar_store import to_epoch_seconds
+        from replay import WARMUP
+
+        end = to_epoch_seconds(self.reference_end) if self.reference_end is not None else first_time
+        stop = int(np.searchsorted(self.times, end, side="left"))
+        start = max(stop - self.reference_rows - WARMUP, 0)
+        columns = [values[start:stop] for values in self.columns]
+        reference = bar_features(columns, feature_set)[WARMUP if stop - start > WARMUP else 0:]
+        if not len(reference):
+            raise ValueError("No bars before the first prediction to build the drift reference from")
+        self.drift = DriftSketch(reference[:, self.drift_columns], self.drift_features, self.window)
+        self.feature_set = feature_set
+
+    def add(self, prediction: dict) -> None:
+        """Queue a parsed prediction; it is scored once its bar has closed (see :meth:`resolve`)."""
+        if self.drift is None:
+            self._init_drift(prediction["time"], prediction.get("feature_set", "ea"))
+        self.pending.append(prediction)
+
+    def resolve(self, reload: bool = True) -> int:
+        """Join queued predictions whose outcome bar has closed; returns how many were resolved."""
+        if reload:
+            self._load_bars()
+        resolved = 0
+        while self.pending:
+            prediction = self.pending[0]
+            # Bar that was opening when the EA decided, and the bar the features came from
+            k = int(np.searchsorted(self.times, prediction["time"], side="right")) - 1
+            if k + 1 >= len(self.times):
+                break       # bar k has not closed yet (no later bar in the history)
+            self.pending.popleft()
+            if k < 1:
+                self.unmatched += 1
+                continue
+            up = int(self.close[k] > self.close[k - 1])
+            self.outcomes.add(prediction["prediction"], up, prediction["confidence"], prediction["traded"])
+            features = prediction.get("features")
+            if (features is None or len(features) != len(FEATURE_NAMES)
+                    or prediction.get("feature_set", "ea") != self.feature_set):
+                features = self._features_at(k - 1)
+            self.drift.add(np.asarray(features, dtype=np.float64)[self.drift_columns])
+            resolved += 1
+        return resolved
+
+    def status(self) -> dict:
+        summary = self.outcomes.summary()
+        psi = self.drift.psi() if self.drift is not None else {}
+        summary["pending"] = len(self.pending)
+        summary["unmatched"] = self.unmatched
+        summary["feature_set"] = self.feature_set
+        summary["psi"] = psi
+        summary["drifted"] = sorted(name for name, value in psi.items()
+                                    if value is not None and value > self.psi_threshold)
+        summary["retrain_reasons"] = self.retrain_reasons(summary)
+        summary["retrain"] = bool(summary["retrain_reasons"])
+        return summary
+
+    def retrain_reasons(self, summary: dict = None) -> list:
+        summary = summary or self.outcomes.summary()
+        if len(self.outcomes) < self.min_samples:
+            return []
+        reasons = []
+        precision = summary["precision"]
+        if (self.baseline_precision is not None and precision is not None
+                and precision < self.baseline_precision - self.precision_tolerance):
+            reasons.append(f"rolling precision {precision:.3f} < baseline {self.baseline_precision:.3f} "
+                           f"- {self.precision_tolerance:.3f}")
+        psi = summary["psi"] if "psi" in summary else (self.drift.psi() if self.drift else {})
+        for name, value in sorted(psi.items()):
+            if value is not None and value > self.psi_threshold:
+                reasons.append(f"feature drift {name}: PSI {value:.3f} > {self.psi_threshold}")
+        return reasons
+
+
+def write_signal(path: str, status: dict) -> None:
+    """Atomically write the retrain signal file consumed by the training job scheduler."""
+    payload = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "retrain": status["retrain"],
+               "reasons": status["retrain_reasons"], "precision": status["precision"],
+               "resolved": status["resolved"], "psi": status["psi"]}
+    write_json_atomic(path, payload)
+
+
+def monitor(log_path: str, bars_path: str, follow: bool = False, signal_path: str = None,
+            report_every: float = 60.0, time_offset: int = 0, **options) -> dict:
+    """
+    Run a :class:`PredictionMonitor` over a log (or tail it with ``follow``).
+
+    Returns:
+        dict: Final status (see :meth:`PredictionMonitor.status`) with ``seconds`` and
+        ``predictions_per_second`` of the pass.
+    """
+    started = time.perf_counter()
+    state = None
+    last_report = -np.inf  # report as soon as the backlog is consumed
+    last_retrain = False
+    parsed = 0
+    for prediction in iter_predictions(log_path, follow=follow, time_offset=time_offset):
+        if prediction is not None:
+            if state is None:
+                state = PredictionMonitor(bars_path, **options)
+            state.add(prediction)
+            parsed += 1
+            # Batch mode: bars are static, resolve as we go without re-checking the file
+            if not follow:
+                state.resolve(reload=False)
+            continue
+        if state is None or time.monotonic() - last_report < report_every:
+            continue
+        state.resolve()
+        status = state.status()
+        last_report = time.monotonic()
+        print(f"📊 {time.strftime('%H:%M:%S')} resolved {status['resolved']:,}, pending {status['pending']}, "
+              f"precision {status['precision'] or float('nan'):.3f}, drifted {status['drifted'] or '-'}")
+        if status["retrain"] and not last_retrain:
+            print("🔁 Retrain signal: " + "; ".join(status["retrain_reasons"]))
+        last_retrain = status["retrain"]
+        if signal_path:
+            write_signal(signal_path, status)
+
+    if state is None:
+        return {"resolved": 0, "predictions": 0, "retrain": False, "retrain_reasons": []}
+    state.resolve(reload=False)
+    status = state.status()
+    seconds = time.perf_counter() - started
+    status.update({"predictions": parsed, "seconds": seconds,
+                   "predictions_per_second": parsed / seconds if seconds else 0.0})
+    if signal_path:
+        write_signal(signal_path, status)
+    return status
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rolling precision / drift monitor over EA prediction logs")
+    parser.add_argument("log_path", help="EA log file, MQL5/Logs directory or JSONL prediction log")
+    parser.add_argument("bars_path", help="Bar store directory or MT5 CSV export of the traded symbol")
+    parser.add_argument("--follow", action="store_true", help="Keep tailing the log")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW)
+    parser.add_argument("--baseline-precision", type=float, help="Walk-forward precision to hold")
+    parser.add_argument("--registry", nargs=2, metavar=("ROOT", "NAME"),
+                        help="Take the baseline precision from the latest model_registry version")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="Allowed precision drop")
+    parser.add_argument("--report-every", type=float, default=60.0,
+                        help="Seconds between status reports/signal writes with --follow")
+    parser.add_argument("--psi", type=float, default=PSI_THRESHOLD, help="PSI drift threshold")
+    parser.add_argument("--drift-features", nargs="+", default=None,
+                        help="Features tracked for drift (default: all but the raw price levels)")
+    parser.add_argument("--min-samples", type=int, default=100)
+    parser.add_argument("--time-offset", type=float, default=0.0, help="Hours added to log times")
+    parser.add_argument("--signal", default=None, help="Write the retrain signal JSON here")
+    args = parser.parse_args()
+
+    baseline = args.baseline_precision
+    if args.registry:
+        baseline = ModelRegistry(args.registry[0]).manifest(args.registry[1])["metrics"].get("precision")
+        print(f"📋 Baseline precision from registry: {baseline}")
+
+    status = monitor(args.log_path, args.bars_path, follow=args.follow, signal_path=args.signal,
+                     report_every=args.report_every,
+                     time_offset=int(args.time_offset * 3600), window=args.window, baseline_precision=baseline,
+                     precision_tolerance=args.tolerance, psi_threshold=args.psi, min_samples=args.min_samples,
+                     drift_features=args.drift_features)
+
+    print(f"✅ {status.get('predictions', 0):,} predictions, {status['resolved']:,} resolved "
+          f"in {status.get('seconds', 0):.2f}s ({status.get('predictions_per_second', 0):,.0f}/s)")
+    if status["resolved"]:
+        print(f"🎯 Rolling precision {status['precision'] or float('nan'):.3f} "
+              f"(traded {status['traded_precision'] or float('nan'):.3f}), hit rate {status['hit_rate']:.3f}")
+        print("📈 Hit rate by confidence:")
+        for bucket, stats in status["confidence_buckets"].items():
+            rate = f"{stats['hit_rate']:.3f}" if stats["hit_rate"] is not None else "  -  "
+            print(f"   {bucket}  {rate}  (n={stats['n']})")
+        top = sorted(((v, k) for k, v in status["psi"].items() if v is not None), reverse=True)[:5]
+        print("🌊 Highest PSI: " + ", ".join(f"{name} {value:.3f}" for value, name in top))
+    if status["retrain"]:
+        print("🔁 Retrain signal: " + "; ".join(status["retrain_reasons"]))
+        raise SystemExit(2)
+    print("✅ No retrain signal")
@@ -0,0 +1,171 @@
+"""
+Lightweight stage-level profiling: wall time, CPU time and peak memory per pipeline stage.
+
+    from profiling import PROFILER, profile
+
+    with PROFILER.stage("load", items=len(data)):
+        data = load_bars(path)
+
+    @profile("features")
+    def make_features(data): ...
+
+    PROFILER.save("profile.json")
+
+Stages nest (``train/fit``); each record holds:
+
+    wall_s, cpu_s           perf_counter / process_time deltas (cpu_s > wall_s means threads)
+    peak_traced_mb          peak bytes allocated during the stage, via tracemalloc (NumPy
+                            buffers included); only when the profiler traces memory
+    rss_start_mb            process peak RSS when the stage started
+    rss_peak_mb             process peak RSS at the end of the stage
+    rss_growth_mb           how much the stage raised the peak RSS (0 if an earlier stage
+                            already reached it)
+    items, items_per_s      optional work count (bars, rows, folds) and throughput
+
+Memory tracing slows allocation-heavy code, so it is off unless ``trace_memory=True``. A
+nested stage reports its own traced peak, and that peak still counts towards its parents.
+"""
+
+import functools
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None if it cannot be measured)"""
+    # VmHWM starts afresh in a spawned process; ru_maxrss keeps the parent's peak across exec
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KB on Linux and bytes on macOS
+        return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 1024 ** 2
+    except ImportError:
+        return None
+
+
+class Profiler:
+    """
+    Collects one record per executed stage.
+
+    Args:
+        trace_memory (bool): Track peak Python/NumPy allocations per stage with tracemalloc.
+        enabled (bool): When False, ``stage`` is a no-op.
+    """
+
+    def __init__(self, trace_memory: bool = False, enabled: bool = True):
+        self.trace_memory = trace_memory
+        self.enabled = enabled
+        self.records = []
+        self._stack = []
+        # Absolute traced peak seen by each open stage before its current reset_peak
+        self._peaks = []
+
+    @contextmanager
+    def stage(self, name: str, items: int = None, **meta):
+        """
+        Time the enclosed block as stage ``name``.
+
+        The yielded dict can be updated inside the block (e.g. ``record["items"] = n`` once
+        the item count is known).
+        """
+        if not self.enabled:
+            yield {}
+            return
+
+        started_tracing = False
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            # reset_peak is global, so keep the enclosing stage's peak so far before clearing it
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+            self._peaks.append(traced_before)
+
+        path = "/".join(self._stack + [name])
+        record = {"stage": path, "items": items, **meta}
+        self._stack.append(name)
+        rss_start = peak_rss_mb()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            self._stack.pop()
+            record.update({"wall_s": wall, "cpu_s": cpu, "cpu_util": cpu / wall if wall else 0.0})
+            if self.trace_memory:
+                peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                record["peak_traced_mb"] = max(peak - traced_before, 0) / 1024 ** 2
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+                if started_tracing:
+                    tracemalloc.stop()
+            rss_peak = peak_rss_mb()
+            record["rss_start_mb"] = rss_start
+            record["rss_peak_mb"] = rss_peak
+            record["rss_growth_mb"] = rss_peak - rss_start if rss_peak is not None and rss_start is not None else None
+            if record.get("items"):
+                record["items_per_s"] = record["items"] / wall if wall else None
+            self.records.append(record)
+
+    def profile(self, name: str = None, items=None):
+        """
+        Decorator form of :meth:`stage`.
+
+        ``items`` may be a callable receiving the call's arguments and returning the work count.
+        """
+        def decorate(function):
+            stage_name = name or function.__name__
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                count = items(*args, **kwargs) if callable(items) else items
+                with self.stage(stage_name, items=count):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def summary(self):
+        """Records as a DataFrame (one row per stage execution)."""
+        import pandas as pd
+
+        return pd.DataFrame(self.records)
+
+    def to_json(self) -> str:
+        return json.dumps({"pid": os.getpid(), "stages": self.records}, indent=2, default=str)
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as file:
+            file.write(self.to_json())
+
+    def reset(self) -> None:
+        self.records = []
+
+
+# Process-wide default profiler used by ``profile``
+PROFILER = Profiler()
+
+
+def profile(name: str = None, items=None):
+    """Decorator recording into the default ``PROFILER``."""
+    return PROFILER.profile(name, items)
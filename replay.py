@@ -0,0 +1,264 @@
+"""
+Historical replay of the deployed decision path: EA feature logic + exported ONNX model.
+
+The EA (``PrepareFeatures`` in ``random_forest.mq5``) does not compute the features the model
+was trained on:
+
+    feature          notebook / feature_engine              EA (serving)
+    Close_Ratio_N    close / rolling mean of N closes       close[t] / close[t - N]
+    Trend_N          sum of the N previous <TRGT>           mean of the N last returns
+    CLOSE_POSITION   NaN (row dropped) for zero range       0.5 for zero range
+
+``ea_features`` reproduces ``PrepareFeatures`` for every bar in one vectorized pass (row ``t``
+is what the EA feeds the model at the open of bar ``t + 1``), and :func:`replay` scores both
+feature sets with the same ONNX session in large batches and diffs them row by row, so
+training/serving skew shows up before a model goes live.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from feature_engine import BLOCK_ROWS, FEATURE_NAMES, HORIZONS, compute_features, valid_rows
+
+DEFAULT_MODEL = "xauusd_optimized_model.onnx"
+SCORE_BATCH = 65536
+
+# The EA needs close[t - 750] for the longest horizon
+WARMUP = max(HORIZONS) + 1
+
+
+def ea_features(open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray, tickvol: np.ndarray,
+                out: np.ndarray = None, block_rows: int = BLOCK_ROWS) -> np.ndarray:
+    """
+    The 19 features exactly as the EA's ``PrepareFeatures`` computes them, for every bar.
+
+    Math is done in double precision like MQL5 and stored as float32 (the model input type).
+    Where the EA would read bars before the start of history (``iClose`` returns 0) the same
+    fallbacks apply: ``Close_Ratio`` is 0 and missing returns are skipped in ``Trend``.
+
+    Returns:
+        np.ndarray: ``(n, 19)`` float32 matrix in ``FEATURE_NAMES`` order.
+    """
+    n = len(close)
+    width = len(FEATURE_NAMES)
+    if out is None:
+        out = np.empty((n, width), dtype=np.float32)
+    if n == 0:
+        return out
+
+    c_all = np.asarray(close, dtype=np.float64)
+    # Returns (current - previous) / previous; the first bar has no previous close
+    returns = np.zeros(n, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns[1:] = np.where(c_all[:-1] != 0.0, (c_all[1:] - c_all[:-1]) / c_all[:-1], 0.0)
+    returns_csum = np.concatenate(([0.0], np.cumsum(returns)))
+
+    stage = np.empty((width, min(block_rows, n)), dtype=np.float32)
+    for start in range(0, n, block_rows):
+        stop = min(start + block_rows, n)
+        block = stage[:, :stop - start]
+        t = np.arange(start, stop)
+
+        o = np.asarray(open_[start:stop], dtype=np.float64)
+        h = np.asarray(high[start:stop], dtype=np.float64)
+        l = np.asarray(low[start:stop], dtype=np.float64)
+        c = c_all[start:stop]
+
+        block[0] = c
+        block[1] = tickvol[start:stop]
+        block[2] = o
+        block[3] = h
+        block[4] = l
+
+        block[5] = np.abs(c - o)
+        block[6] = h - np.maximum(o, c)
+        block[7] = np.minimum(o, c) - l
+        price_range = h - l
+        with np.errstate(divide="ignore", invalid="ignore"):
+            block[8] = np.where(price_range > 0, (c - l) / price_range, 0.5)
+
+        row = 9
+        for horizon in HORIZONS:
+            # CalculateCloseRatio: close[t] / close[t - N], 0 if the past bar does not exist
+            past = t - horizon
+            past_close = np.where(past >= 0, c_all[np.maximum(past, 0)], 0.0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                block[row] = np.where(past_close != 0.0, c / past_close, 0.0)
+
+            # CalculateTrend: sum of the last N returns / N (0 for N <= 1)
+            if horizon <= 1:
+                block[row + 1] = 0.0
+            else:
+                block[row + 1] = (returns_csum[t + 1] - returns_csum[np.maximum(t + 1 - horizon, 0)]) / horizon
+            row += 2
+
+        out[start:stop] = block.T
+    return out
+
+
+def ea_features_reference(open_, high, low, close, tickvol, t: int) -> np.ndarray:
+    """Line-by-line port of ``PrepareFeatures`` for one bar (``shift 1`` = bar ``t``); slow, for checks."""
+    def iclose(shift):
+        index = t + 1 - shift
+        return float(close[index]) if 0 <= index < len(close) else 0.0
+
+    def close_ratio(period):
+        if period <= 0:
+            return 0.0
+        past_close = iclose(period + 1)
+        return 0.0 if past_close == 0.0 else iclose(1) / past_close
+
+    def trend(period):
+        if period <= 1:
+            return 0.0
+        total = 0.0
+        for i in range(1, period + 1):
+            current, previous = iclose(i), iclose(i + 1)
+            if previous != 0.0:
+                total += (current - previous) / previous
+        return total / period
+
+    o, h, l, c = float(open_[t]), float(high[t]), float(low[t]), float(close[t])
+    price_range = h - l
+    features = [c, float(tickvol[t]), o, h, l, abs(c - o), h - max(o, c), min(o, c) - l,
+                (c - l) / price_range if price_range > 0 else 0.5]
+    for horizon in HORIZONS:
+        features += [close_ratio(horizon), trend(horizon)]
+    return np.array(features, dtype=np.float32)
+
+
+def _columns(data) -> list:
+    if isinstance(data, pd.DataFrame):
+        return [data[name].to_numpy() for name in ("<OPEN>", "<HIGH>", "<LOW>", "<CLOSE>", "<TICKVOL>")]
+    return [data[name] for name in ("open", "high", "low", "close", "tickvol")]
+
+
+def check_ea_port(data, samples: int = 500, seed: int = 1) -> float:
+    """Max absolute difference between :func:`ea_features` and the line-by-line port on random bars."""
+    columns = _columns(data)
+    features = ea_features(*columns)
+    rows = np.random.default_rng(seed).choice(len(columns[3]), size=min(samples, len(columns[3])), replace=False)
+    return float(max(np.abs(features[t] - ea_features_reference(*columns, t)).max() for t in rows))
+
+
+def score(session, X: np.ndarray, batch_rows: int = SCORE_BATCH) -> tuple:
+    """``(labels, P(class 1))`` for every row of ``X``, run in batches of ``batch_rows``."""
+    from onnx_utils import positive_proba
+
+    input_name = session.get_inputs()[0].name
+    labels, proba = [], []
+    for start in range(0, len(X), batch_rows):
+        outputs = session.run(None, {input_name: X[start:start + batch_rows]})
+        labels.append(np.asarray(outputs[0]).reshape(-1))
+        proba.append(positive_proba(outputs))
+    if not labels:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    return np.concatenate(labels).astype(np.int64), np.concatenate(proba)
+
+
+def replay(data, model=DEFAULT_MODEL, batch_rows: int = SCORE_BATCH, intra_op_threads: int = 1) -> tuple:
+    """
+    Score every bar with serving-side (EA) and training-side features and diff the results.
+
+    Only rows valid on both sides are compared: the training pipeline's ``dropna`` rows that
+    also have a full EA look-back (``WARMUP`` bars).
+
+    Args:
+        data: Bars as a DataFrame (notebook columns) or a dict of ``open/high/low/close/tickvol``.
+        model: ONNX model path/bytes or an ``InferenceSession``.
+        batch_rows (int): Rows per ``session.run``.
+        intra_op_threads (int): onnxruntime threads (1 = single core).
+
+    Returns:
+        tuple: ``(rows, summary)`` - a DataFrame per compared bar (serving/training label and
+        probability) and a dict with agreement, probability skew, per-feature skew and timings.
+    """
+    from onnx_utils import make_session
+
+    session = model if hasattr(model, "run") else make_session(model, intra_op_threads=intra_op_threads)
+    columns = _columns(data)
+    n_bars = len(columns[3])
+
+    started = time.perf_counter()
+    serving = ea_features(*columns)
+    serving_feature_seconds = time.perf_counter() - started
+
+    training = compute_features(*columns)
+    rows = np.flatnonzero(valid_rows(training, drop_last=False) & (np.arange(n_bars) >= WARMUP))
+
+    started = time.perf_counter()
+    serving_labels, serving_proba = score(session, np.ascontiguousarray(serving[rows]), batch_rows)
+    serving_score_seconds = time.perf_counter() - started
+    training_labels, training_proba = score(session, np.ascontiguousarray(training[rows]), batch_rows)
+
+    frame = pd.DataFrame({
+        "row": rows,
+        "serving_label": serving_labels,
+        "training_label": training_labels,
+        "serving_proba": serving_proba,
+        "training_proba": training_proba,
+    })
+    if isinstance(data, pd.DataFrame) and "<DATE>" in data.columns:
+        frame.insert(1, "<DATE>", data["<DATE>"].to_numpy()[rows])
+    frame["agree"] = frame["serving_label"] == frame["training_label"]
+
+    skew = {}
+    for j, name in enumerate(FEATURE_NAMES):
+        a, b = serving[rows, j].astype(np.float64), training[rows, j].astype(np.float64)
+        diff = np.abs(a - b)
+        skew[name] = {"max_abs_diff": float(diff.max()) if len(diff) else 0.0,
+                      "mean_abs_diff": float(diff.mean()) if len(diff) else 0.0,
+                      "mismatched_rows": int((diff > 1e-6 * np.maximum(np.abs(b), 1.0)).sum())}
+
+    serving_seconds = serving_feature_seconds + serving_score_seconds
+    proba_diff = np.abs(serving_proba - training_proba)
+    summary = {
+        "bars": n_bars,
+        "compared_rows": int(len(rows)),
+        "label_agreement": float(frame["agree"].mean()) if len(frame) else 1.0,
+        "label_mismatches": int((~frame["agree"]).sum()),
+        "serving_buy_rate": float(serving_labels.mean()) if len(rows) else 0.0,
+        "training_buy_rate": float(training_labels.mean()) if len(rows) else 0.0,
+        "max_abs_proba_diff": float(proba_diff.max()) if len(rows) else 0.0,
+        "mean_abs_proba_diff": float(proba_diff.mean()) if len(rows) else 0.0,
+        "feature_skew": skew,
+        "serving_feature_seconds": serving_feature_seconds,
+        "serving_score_seconds": serving_score_seconds,
+        "serving_bars_per_minute": n_bars / serving_seconds * 60 if serving_seconds else 0.0,
+    }
+    return frame, summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from bar_store import load_bars
+
+    parser = argparse.ArgumentParser(description="Replay the EA feature logic + ONNX model over history")
+    parser.add_argument("path", nargs="?", default="XAUUSDm_H1_201801020600_202412310000.csv",
+                        help="MT5 CSV export or bar store directory")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--threads", type=int, default=1, help="onnxruntime intra-op threads")
+    parser.add_argument("--out", default=None, help="Write per-bar comparison to this CSV")
+    args = parser.parse_args()
+
+    data = load_bars(args.path)
+    print(f"🔍 EA port check (vectorized vs line-by-line): max |Δ| = {check_ea_port(data):.2e}")
+    frame, summary = replay(data, args.model, intra_op_threads=args.threads)
+
+    print(f"📊 Compared {summary['compared_rows']:,} of {summary['bars']:,} bars")
+    print(f"🎯 Label agreement serving vs training: {summary['label_agreement']:.2%} "
+          f"({summary['label_mismatches']:,} mismatches)")
+    print(f"📈 BUY rate: serving {summary['serving_buy_rate']:.2%}, training {summary['training_buy_rate']:.2%}")
+    print(f"📉 |Δ P(up)|: mean {summary['mean_abs_proba_diff']:.4f}, max {summary['max_abs_proba_diff']:.4f}")
+    print("⚠️  Feature skew (rows differing):")
+    for name, stats in summary["feature_skew"].items():
+        if stats["mismatched_rows"]:
+            print(f"   {name:<16} {stats['mismatched_rows']:>9,} rows  mean |Δ| {stats['mean_abs_diff']:.4g}")
+    print(f"⚡ Serving path: {summary['serving_bars_per_minute']:,.0f} bars/minute "
+          f"(features {summary['serving_feature_seconds']:.2f}s, scoring {summary['serving_score_seconds']:.2f}s)")
+    if args.out:
+        frame.to_csv(args.out, index=False)
+        print(f"📝 Saved per-bar comparison to: {args.out}")
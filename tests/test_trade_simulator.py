@@ -0,0 +1,31 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from trade_simulator import EXIT_OPEN, resolve_exits
+
+
+def test_max_hold_exits_at_close_of_last_held_bar():
+    close = np.arange(31.0, 51.0)           # 20 bars, final close 50.0
+    open_, high, low = close - 0.5, close + 1.0, close - 1.0
+
+    resolved = resolve_exits(open_, high, low, close, entries=[2], directions=[1], atr_values=np.array([100.0]),
+                             tp_multiplier=1.0, sl_multiplier=1.0, max_hold=3)
+
+    assert resolved["exit_bar"][0] == 4
+    assert resolved["exit_price"][0] == close[4]
+    assert resolved["reason"][0] == EXIT_OPEN
+
+
+def test_open_at_end_exits_at_final_close():
+    close = np.arange(31.0, 51.0)
+    open_, high, low = close - 0.5, close + 1.0, close - 1.0
+
+    resolved = resolve_exits(open_, high, low, close, entries=[15], directions=[-1], atr_values=np.array([100.0]),
+                             tp_multiplier=1.0, sl_multiplier=1.0, max_hold=10)
+
+    assert resolved["exit_bar"][0] == 19
+    assert resolved["exit_price"][0] == 50.0
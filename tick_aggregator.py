@@ -0,0 +1,361 @@
+"""
+Streaming aggregation of MT5 tick exports into bars.
+
+An MT5 tick export (Symbols -> Ticks -> Export) is tab-delimited:
+
+    <DATE>      <TIME>          <BID>     <ASK>     <LAST>  <VOLUME>  <FLAGS>
+    2024.01.02  00:00:00.123    2062.51   2062.71                     6
+
+A field is empty when it did not change on that tick, so bid and ask are forward-filled
+(across chunk boundaries too). The file is read ``chunk_ticks`` rows at a time and every chunk
+updates all requested outputs in one pass:
+
+    time bars       M1 .. D1; the bar still open at the end of a chunk is carried over and
+                    merged with the first bar of the next chunk
+    tick bars       one bar per ``N`` ticks; the incomplete remainder is carried over
+
+Bars are built from the bid, like MT5's own bars: ``<TICKVOL>`` is the number of ticks and
+``<SPREAD>`` the smallest spread in the bar, in points. Completed bars are appended to one
+tab-delimited CSV per output in the export layout ``bar_store.load_bars`` and the notebook
+read (``<DATE> <TIME> <OPEN> <HIGH> <LOW> <CLOSE> <TICKVOL> <VOL> <SPREAD>``).
+
+Only the current chunk and one partial bar per output are held in memory, so peak memory
+depends on ``chunk_ticks``, not on the size of the export.
+"""
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from history_sync import TIMEFRAMES
+
+DEFAULT_TIMEFRAMES = ["M1", "M5", "M15", "H1"]
+DEFAULT_CHUNK_TICKS = 2_000_000
+DEFAULT_DIGITS = 3
+
+BAR_COLUMNS = ["<DATE>", "<TIME>", "<OPEN>", "<HIGH>", "<LOW>", "<CLOSE>", "<TICKVOL>", "<VOL>", "<SPREAD>"]
+_BAR_FIELDS = ("time", "open", "high", "low", "close", "tickvol", "spread")
+
+
+def parse_tick_times(dates: np.ndarray, times: np.ndarray) -> np.ndarray:
+    """
+    Parse ``<DATE>`` (``2024.01.02``) and ``<TIME>`` (``00:00:00.123``) strings to epoch milliseconds.
+
+    A chunk spans few distinct dates, so dates are parsed once per unique value; times are
+    fixed-width and decoded arithmetically from their bytes.
+    """
+    unique_dates, date_codes = np.unique(np.asarray(dates, dtype=str), return_inverse=True)
+    day_ms = pd.to_datetime(unique_dates, format="%Y.%m.%d").to_numpy(dtype="datetime64[ms]").astype(np.int64)
+
+    raw = np.asarray(times, dtype="S12")
+    digits = raw.view(np.uint8).reshape(len(raw), 12).astype(np.int64) - ord("0")
+    ms = ((digits[:, 0] * 10 + digits[:, 1]) * 3600 + (digits[:, 3] * 10 + digits[:, 4]) * 60
+          + digits[:, 6] * 10 + digits[:, 7]) * 1000
+    # Exports without milliseconds end after the seconds (padding bytes decode as negative)
+    if len(raw) and raw[0][8:9] == b".":
+        ms += digits[:, 9] * 100 + digits[:, 10] * 10 + digits[:, 11]
+    return day_ms[date_codes] + ms
+
+
+def _fill_forward(values: np.ndarray, carry: float) -> np.ndarray:
+    """Replace NaNs with the last preceding value, using ``carry`` before the first one."""
+    known = ~np.isnan(values)
+    last = np.maximum.accumulate(np.where(known, np.arange(len(values)), -1))
+    return np.where(last >= 0, values[np.maximum(last, 0)], carry)
+
+
+def _group_bars(group_time: np.ndarray, starts: np.ndarray, bid: np.ndarray, spread: np.ndarray) -> dict:
+    """OHLC, tick count and minimum spread of the tick runs beginning at ``starts``."""
+    ends = np.append(starts[1:], len(bid))
+    return {
+        "time": group_time[starts],
+        "open": bid[starts],
+        "high": np.maximum.reduceat(bid, starts),
+        "low": np.minimum.reduceat(bid, starts),
+        "close": bid[ends - 1],
+        "tickvol": ends - starts,
+        "spread": np.minimum.reduceat(spread, starts),
+    }
+
+
+class TimeBarBuilder:
+    """Time bars of ``seconds`` length; the last (possibly unfinished) bar is held back."""
+
+    def __init__(self, seconds: int):
+        self.seconds = seconds
+        self.pending = None
+
+    def update(self, time_s: np.ndarray, bid: np.ndarray, spread: np.ndarray) -> dict:
+        """Aggregate one chunk and return the bars completed by it."""
+        bucket = time_s - time_s % self.seconds
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+        bars = _group_bars(bucket, starts, bid, spread)
+
+        if self.pending is not None:
+            if bars["time"][0] == self.pending["time"][0]:
+                bars["open"][0] = self.pending["open"][0]
+                bars["high"][0] = max(bars["high"][0], self.pending["high"][0])
+                bars["low"][0] = min(bars["low"][0], self.pending["low"][0])
+                bars["tickvol"][0] += self.pending["tickvol"][0]
+                bars["spread"][0] = min(bars["spread"][0], self.pending["spread"][0])
+            else:
+                bars = {name: np.concatenate((self.pending[name], bars[name])) for name in _BAR_FIELDS}
+
+        self.pending = {name: values[-1:].copy() for name, values in bars.items()}
+        return {name: values[:-1] for name, values in bars.items()}
+
+    def finish(self) -> dict:
+        bars, self.pending = self.pending, None
+        return bars
+
+
+class TickBarBuilder:
+    """Bars of exactly ``ticks`` ticks, stamped with their first tick's second."""
+
+    def __init__(self, ticks: int):
+        self.ticks = ticks
+        self.pending = None         # (time_s, bid, spread) of the incomplete bar
+
+    def update(self, time_s: np.ndarray, bid: np.ndarray, spread: np.ndarray) -> dict:
+        if self.pending is not None:
+            time_s, bid, spread = (np.concatenate((old, new)) for old, new in zip(self.pending, (time_s, bid, spread)))
+        complete = len(bid) - len(bid) % self.ticks
+        self.pending = (time_s[complete:].copy(), bid[complete:].copy(), spread[complete:].copy())
+        if complete == 0:
+            return None
+        starts = np.arange(0, complete, self.ticks)
+        return _group_bars(time_s[:complete], starts, bid[:complete], spread[:complete])
+
+    def finish(self) -> dict:
+        time_s, bid, spread = self.pending if self.pending is not None else ((),) * 3
+        self.pending = None
+        if not len(bid):
+            return None
+        return _group_bars(time_s, np.array([0]), bid, spread)
+
+
+def _make_builder(output: str):
+    """``"M5"`` -> time bars, ``"T500"`` -> 500-tick bars."""
+    if output in TIMEFRAMES:
+        return TimeBarBuilder(TIMEFRAMES[output][1])
+    if output[:1] == "T" and output[1:].isdigit() and int(output[1:]) > 0:
+        return TickBarBuilder(int(output[1:]))
+    raise ValueError(f"Unknown output '{output}', expected one of {list(TIMEFRAMES)} or T<ticks>")
+
+
+def bars_frame(bars: dict, digits: int = DEFAULT_DIGITS) -> pd.DataFrame:
+    """Bars in the MT5 export layout (``<DATE> <TIME> ... <SPREAD>``)."""
+    stamps = pd.Series(np.datetime_as_string(bars["time"].astype("datetime64[s]"), unit="s"))
+    return pd.DataFrame({
+        "<DATE>": stamps.str.slice(0, 10).str.replace("-", ".", regex=False),
+        "<TIME>": stamps.str.slice(11, 19),
+        "<OPEN>": np.round(bars["open"], digits),
+        "<HIGH>": np.round(bars["high"], digits),
+        "<LOW>": np.round(bars["low"], digits),
+        "<CLOSE>": np.round(bars["close"], digits),
+        "<TICKVOL>": bars["tickvol"],
+        "<VOL>": 0,
+        "<SPREAD>": bars["spread"],
+    }, columns=BAR_COLUMNS)
+
+
+def output_path(out_dir: str, prefix: str, output: str) -> str:
+    return os.path.join(out_dir, f"{prefix}_{output}.csv")
+
+
+def aggregate_ticks(tick_path: str, out_dir: str, outputs: list = None, prefix: str = None,
+                    digits: int = DEFAULT_DIGITS, chunk_ticks: int = DEFAULT_CHUNK_TICKS) -> dict:
+    """
+    Stream a tick export once and write one bar CSV per output.
+
+    Args:
+        tick_path (str): MT5 tick export.
+        out_dir (str): Directory for ``<prefix>_<output>.csv`` files (overwritten).
+        outputs (list): Timeframes (``"M1"`` .. ``"D1"``) and/or tick bars (``"T500"``).
+        prefix (str): File name prefix (default: the export's name without extension).
+        digits (int): Symbol digits; prices are rounded to them and spreads are in ``10 ** -digits`` points.
+        chunk_ticks (int): Ticks read per chunk; bounds memory use.
+
+    Returns:
+        dict: ticks, seconds, ticks_per_second, peak RSS and bars/path per output.
+    """
+    from profiling import peak_rss_mb
+
+    outputs = outputs or DEFAULT_TIMEFRAMES
+    prefix = prefix or os.path.splitext(os.path.basename(tick_path))[0]
+    builders = {output: _make_builder(output) for output in outputs}
+    point = 10.0 ** -digits
+    os.makedirs(out_dir, exist_ok=True)
+
+    files = {output: open(output_path(out_dir, prefix, output), "w") for output in outputs}
+    for file in files.values():
+        file.write("\t".join(BAR_COLUMNS) + "\n")
+    counts = dict.fromkeys(outputs, 0)
+
+    def write(output, bars):
+        if bars is None or not len(bars["time"]):
+            return
+        bars_frame(bars, digits).to_csv(files[output], sep="\t", index=False, header=False,
+                                        float_format=f"%.{digits}f")
+        counts[output] += len(bars["time"])
+
+    rss_start = peak_rss_mb()
+    started = time.perf_counter()
+    n_ticks = chunks = 0
+    carry_bid = carry_ask = np.nan
+    try:
+        reader = pd.read_csv(tick_path, delimiter="\t", usecols=["<DATE>", "<TIME>", "<BID>", "<ASK>"],
+                             dtype={"<DATE>": str, "<TIME>": str, "<BID>": np.float64, "<ASK>": np.float64},
+                             chunksize=chunk_ticks)
+        for chunk in reader:
+            chunks += 1
+            bid = _fill_forward(chunk["<BID>"].to_numpy(), carry_bid)
+            ask = _fill_forward(chunk["<ASK>"].to_numpy(), carry_ask)
+            carry_bid, carry_ask = bid[-1], ask[-1]
+
+            # Ticks before the first quoted bid and ask cannot form a bar
+            usable = ~(np.isnan(bid) | np.isnan(ask))
+            if not usable.all():
+                chunk, bid, ask = chunk[usable], bid[usable], ask[usable]
+            if not len(bid):
+                continue
+
+            time_s = parse_tick_times(chunk["<DATE>"].to_numpy(), chunk["<TIME>"].to_numpy()) // 1000
+            spread = np.rint((ask - bid) / point).astype(np.int64)
+            n_ticks += len(bid)
+            for output, builder in builders.items():
+                write(output, builder.update(time_s, bid, spread))
+
+        for output, builder in builders.items():
+            write(output, builder.finish())
+    finally:
+        for file in files.values():
+            file.close()
+
+    seconds = time.perf_counter() - started
+    rss_peak = peak_rss_mb()
+    return {
+        "ticks": n_ticks,
+        "chunks": chunks,
+        "seconds": seconds,
+        "ticks_per_second": n_ticks / seconds if seconds else 0.0,
+        "rss_start_mb": rss_start,
+        "rss_peak_mb": rss_peak,
+        "rss_growth_mb": rss_peak - rss_start if rss_start is not None else None,
+        "outputs": {output: {"bars": counts[output], "path": output_path(out_dir, prefix, output)}
+                    for output in outputs},
+    }
+
+
+# -----------------------------------------------------------------------------------------
+#  Synthetic exports and memory benchmark
+# -----------------------------------------------------------------------------------------
+
+def _hold_asks(asks: np.ndarray, bids: np.ndarray, hold: np.ndarray) -> np.ndarray:
+    """Repeat the previous ask on ``hold`` ticks, except where the bid has moved up to or past it."""
+    hold = hold.copy()
+    hold[0] = False
+    while True:
+        held = _fill_forward(np.where(hold, np.nan, asks), np.nan)
+        crossed = hold & (held <= bids)
+        if not crossed.any():
+            return np.where(hold, held, asks)
+        # A crossed tick quotes a fresh ask, which later held ticks then repeat
+        hold &= ~crossed
+
+
+def write_synthetic_ticks(path: str, n_ticks: int, seed: int = 1, chunk_ticks: int = 1_000_000) -> str:
+    """Write ``n_ticks`` random-walk ticks in the MT5 tick export layout, in bounded memory."""
+    rng = np.random.default_rng(seed)
+    stamp_ms = np.datetime64("2024-01-02T00:00:00", "ms").astype(np.int64)
+    bid = 2060.0
+    with open(path, "w") as file:
+        file.write("<DATE>\t<TIME>\t<BID>\t<ASK>\t<LAST>\t<VOLUME>\t<FLAGS>\n")
+        for start in range(0, n_ticks, chunk_ticks):
+            n = min(chunk_ticks, n_ticks - start)
+            times = stamp_ms + np.cumsum(rng.integers(1, 1500, n))
+            bids = np.round(bid + np.cumsum(rng.normal(0.0, 0.05, n)), DEFAULT_DIGITS)
+            asks = np.round(bids + rng.integers(10, 40, n) * 10.0 ** -DEFAULT_DIGITS, DEFAULT_DIGITS)
+            asks = _hold_asks(asks, bids, rng.random(n) < 0.2)
+            stamp_ms, bid = times[-1], bids[-1]
+
+            stamps = pd.Series(np.datetime_as_string(times.astype("datetime64[ms]"), unit="ms"))
+            frame = pd.DataFrame({
+                "<DATE>": stamps.str.slice(0, 10).str.replace("-", ".", regex=False),
+                "<TIME>": stamps.str.slice(11, 23),
+                "<BID>": bids,
+                "<ASK>": asks,
+            })
+            # Like real exports, leave the ask empty when it did not change (the first row keeps it)
+            unchanged = np.r_[False, asks[1:] == asks[:-1]]
+            frame.loc[unchanged, "<ASK>"] = np.nan
+            frame["<LAST>"] = ""
+            frame["<VOLUME>"] = ""
+            frame["<FLAGS>"] = 6
+            frame.to_csv(file, sep="\t", index=False, header=False, float_format=f"%.{DEFAULT_DIGITS}f")
+    return path
+
+
+def _benchmark_one(tick_path: str, out_dir: str, outputs: list, chunk_ticks: int) -> dict:
+    stats = aggregate_ticks(tick_path, out_dir, outputs, chunk_ticks=chunk_ticks)
+    return {key: value for key, value in stats.items() if key != "outputs"}
+
+
+def benchmark(sizes=(1_000_000, 4_000_000, 16_000_000), outputs: list = None, data_dir: str = None,
+              chunk_ticks: int = DEFAULT_CHUNK_TICKS) -> pd.DataFrame:
+    """
+    Aggregate synthetic exports of increasing size, each in a fresh process.
+
+    Returns:
+        pd.DataFrame: Ticks, input size, ticks/s and peak RSS per size; peak RSS should not
+        grow with the input.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    data_dir = data_dir or os.path.join(".cache", "ticks")
+    os.makedirs(data_dir, exist_ok=True)
+    context = multiprocessing.get_context("spawn")
+    rows = []
+    for n_ticks in sizes:
+        tick_path = os.path.join(data_dir, f"synthetic_ticks_{n_ticks}.csv")
+        if not os.path.exists(tick_path):
+            write_synthetic_ticks(tick_path, n_ticks)
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            stats = pool.submit(_benchmark_one, tick_path, os.path.join(data_dir, "bars"),
+                                outputs or DEFAULT_TIMEFRAMES, chunk_ticks).result()
+        rows.append({"input_mb": os.path.getsize(tick_path) / 1024 ** 2, **stats})
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Aggregate MT5 tick exports into bars in one streaming pass")
+    parser.add_argument("tick_path", nargs="?", help="MT5 tick export")
+    parser.add_argument("--out-dir", default="bars")
+    parser.add_argument("--outputs", nargs="+", default=DEFAULT_TIMEFRAMES,
+                        help=f"Timeframes {list(TIMEFRAMES)} and/or tick bars like T500")
+    parser.add_argument("--digits", type=int, default=DEFAULT_DIGITS, help="Symbol digits (XAUUSDm: 3)")
+    parser.add_argument("--chunk-ticks", type=int, default=DEFAULT_CHUNK_TICKS)
+    parser.add_argument("--benchmark", type=int, nargs="*", metavar="TICKS",
+                        help="Benchmark synthetic exports of these sizes instead")
+    args = parser.parse_args()
+
+    if args.benchmark is not None:
+        report = benchmark(args.benchmark or (1_000_000, 4_000_000, 16_000_000), args.outputs,
+                           chunk_ticks=args.chunk_ticks)
+        print(report.to_string(index=False))
+        raise SystemExit(0)
+    if not args.tick_path:
+        parser.error("tick_path is required unless --benchmark is given")
+
+    stats = aggregate_ticks(args.tick_path, args.out_dir, args.outputs, digits=args.digits,
+                            chunk_ticks=args.chunk_ticks)
+    print(f"✅ {stats['ticks']:,} ticks in {stats['chunks']} chunks, {stats['seconds']:.2f}s "
+          f"({stats['ticks_per_second']:,.0f} ticks/s)")
+    for output, info in stats["outputs"].items():
+        print(f"   {output:<6} {info['bars']:>10,} bars -> {info['path']}")
+    print(f"💾 Peak RSS {stats['rss_peak_mb']:.0f} MB (+{stats['rss_growth_mb']:.0f} MB while aggregating)")
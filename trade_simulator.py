@@ -0,0 +1,399 @@
+"""
+Bar-level trade simulator for the EA in ``random_forest.mq5``.
+
+Replays the ``OnTick`` logic on historical bars so the EA inputs can be tuned without the
+MT5 Strategy Tester:
+
+    * a decision is taken once per bar, at the open of the new hour, from the model's
+      prediction on the bar that just closed;
+    * the prediction is ``P(up) > 0.5`` and its confidence ``max(P(up), 1 - P(up))``; a trade
+      is opened only if the confidence is above ``confidence_threshold``;
+    * TP/SL are ``entry +/- ATR(atr_period) * multiplier``, with ATR read from the closed bar
+      (MT5's ATR: a simple moving average of the true range);
+    * a BUY fills at the ask (open + spread) and exits at the bid, a SELL the other way round;
+    * a new trade is only opened when no position is open. ``max_positions`` only gates the
+      early return in ``OnTick``, so for every value the EA holds one position at a time.
+
+Bars only give high/low, so when a bar touches both TP and SL the stop is assumed to be hit
+first, and a bar that gaps through a level fills at its open.
+
+The exit of a trade depends on the entry bar, direction, ATR period and multipliers but not on
+the confidence threshold, so :func:`parameter_sweep` resolves exits once per
+``(atr_period, tp_multiplier, sl_multiplier)`` for every candidate entry (vectorized over the
+holding offset) and then only chains entries for each threshold.
+"""
+
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from backtest import SharedArrays, attach_shared, worker_state
+
+# EA defaults (random_forest.mq5 inputs)
+EA_INPUTS = {
+    "lotsize": 0.1,
+    "confidence_threshold": 0.55,
+    "tp_multiplier": 1.5,
+    "sl_multiplier": 1.0,
+    "atr_period": 14,
+    "max_positions": 1,
+}
+
+DEFAULT_GRID = {
+    "confidence_threshold": [0.5, 0.52, 0.55, 0.58, 0.6, 0.62, 0.65, 0.7],
+    "tp_multiplier": [0.5, 0.75, 1.0, 1.5, 2.0, 2.5, 3.0, 4.0],
+    "sl_multiplier": [0.5, 0.75, 1.0, 1.5, 2.0, 3.0],
+    "atr_period": [7, 14, 21, 50],
+}
+
+CONTRACT_SIZE = 100.0   # XAUUSD: 100 oz per lot
+EXIT_TP, EXIT_SL, EXIT_OPEN = 1, 2, 3
+
+
+# -----------------------------------------------------------------------------------------
+#  Inputs
+# -----------------------------------------------------------------------------------------
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int) -> np.ndarray:
+    """
+    MT5 ``iATR``: simple moving average of the true range (NaN for the first ``period - 1`` bars).
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+
+    prev_close = np.empty_like(close)
+    prev_close[0] = close[0]
+    prev_close[1:] = close[:-1]
+    true_range = np.maximum(high, prev_close) - np.minimum(low, prev_close)
+    true_range[0] = high[0] - low[0]
+
+    sums = np.concatenate(([0.0], np.cumsum(true_range)))
+    values = np.full(len(close), np.nan)
+    values[period - 1:] = (sums[period:] - sums[:-period]) / period
+    return values
+
+
+def signal_probabilities(model, data: pd.DataFrame) -> np.ndarray:
+    """
+    ``P(up)`` per bar from the features of that (closed) bar; NaN where features are undefined.
+
+    ``model`` is a fitted sklearn classifier or an onnxruntime ``InferenceSession`` / model
+    path. Features follow ``feature_engine`` (the notebook's definitions).
+    """
+    from feature_engine import FEATURE_NAMES, build_dataset
+
+    X, _, rows = build_dataset(data, drop_last=False)
+    proba = np.full(len(data), np.nan)
+    if isinstance(model, str) or hasattr(model, "get_inputs"):
+        from onnx_utils import make_session, positive_proba
+
+        session = make_session(model) if isinstance(model, str) else model
+        input_name = session.get_inputs()[0].name
+        proba[rows] = np.concatenate([positive_proba(session.run(None, {input_name: X[i:i + 4096]}))
+                                      for i in range(0, len(X), 4096)])
+    else:
+        proba[rows] = model.predict_proba(pd.DataFrame(X, columns=FEATURE_NAMES))[:, 1]
+    return proba
+
+
+# -----------------------------------------------------------------------------------------
+#  Simulation core
+# -----------------------------------------------------------------------------------------
+
+def resolve_exits(open_, high, low, close, entries, directions, atr_values, tp_multiplier,
+                  sl_multiplier, spread=0.0, max_hold=None) -> dict:
+    """
+    Entry/exit prices of independent trades, vectorized over the holding offset.
+
+    Args:
+        open_, high, low, close (np.ndarray): Bid prices.
+        entries (np.ndarray): Bar index of each entry (trade opens at that bar's open).
+        directions (np.ndarray): +1 for BUY, -1 for SELL.
+        atr_values (np.ndarray): ATR of the bar before each entry.
+        tp_multiplier, sl_multiplier (float): ATR multipliers.
+        spread (float): Ask - bid, in price units.
+        max_hold (int): Close at market after this many bars (None = hold until TP/SL).
+
+    Returns:
+        dict: ``entry_price``, ``exit_price``, ``exit_bar`` and ``reason`` arrays.
+    """
+    n_bars = len(close)
+    entries = np.asarray(entries, dtype=np.int64)
+    directions = np.asarray(directions, dtype=np.int8)
+    buy = directions == 1
+
+    # BUY fills at the ask and exits at the bid; SELL fills at the bid and exits at the ask
+    entry_price = open_[entries] + np.where(buy, spread, 0.0)
+    tp = entry_price + directions * atr_values * tp_multiplier
+    sl = entry_price - directions * atr_values * sl_multiplier
+    exit_shift = np.where(buy, 0.0, spread)
+
+    exit_price = np.full(len(entries), np.nan)
+    exit_bar = np.full(len(entries), n_bars - 1, dtype=np.int64)
+    reason = np.zeros(len(entries), dtype=np.int8)
+
+    active = np.arange(len(entries))
+    offset = 0
+    while active.size:
+        bar = entries[active] + offset
+        ended = bar >= n_bars
+        if max_hold is not None and offset >= max_hold:
+            ended[:] = True
+        if ended.any():
+            done = active[ended]
+            # Close at market on the last bar held: entry + max_hold - 1, or the final bar
+            exit_bar[done] = np.clip(entries[done] + offset - 1, entries[done], n_bars - 1)
+            exit_price[done] = close[exit_bar[done]] + exit_shift[done]
+            reason[done] = EXIT_OPEN
+            active, bar = active[~ended], bar[~ended]
+            if not active.size:
+                break
+
+        is_buy = buy[active]
+        shift = exit_shift[active]
+        bar_open, bar_high, bar_low = open_[bar] + shift, high[bar] + shift, low[bar] + shift
+        hit_tp = np.where(is_buy, bar_high >= tp[active], bar_low <= tp[active])
+        hit_sl = np.where(is_buy, bar_low <= sl[active], bar_high >= sl[active])
+
+        resolved = hit_tp | hit_sl
+        if resolved.any():
+            idx = active[resolved]
+            stopped = hit_sl[resolved]      # both touched: assume the stop came first
+            level = np.where(stopped, sl[idx], tp[idx])
+            # A bar that opens beyond the level (gap) fills at its open
+            beyond = (bar_open[resolved] - level) * directions[idx]
+            gapped = (offset > 0) & np.where(stopped, beyond <= 0, beyond >= 0)
+            exit_price[idx] = np.where(gapped, bar_open[resolved], level)
+            exit_bar[idx] = bar[resolved]
+            reason[idx] = np.where(stopped, EXIT_SL, EXIT_TP)
+            active = active[~resolved]
+        offset += 1
+
+    return {"entry_price": entry_price, "exit_price": exit_price, "exit_bar": exit_bar, "reason": reason}
+
+
+def chain_trades(entries: np.ndarray, exit_bars: np.ndarray) -> np.ndarray:
+    """
+    Positions (into ``entries``) of the trades actually taken when only one can be open.
+
+    After a trade exits on bar ``x`` the next entry is the first candidate on or after ``x + 1``.
+    """
+    taken = []
+    i = 0
+    while i < len(entries):
+        taken.append(i)
+        i = int(np.searchsorted(entries, exit_bars[i] + 1))
+    return np.asarray(taken, dtype=np.int64)
+
+
+def trade_statistics(trades: dict, initial_balance: float = 10_000.0) -> dict:
+    """Summary statistics of a trade list (see :func:`simulate`)."""
+    profit = trades["profit"]
+    balance = initial_balance + np.cumsum(profit)
+    peak = np.maximum.accumulate(np.concatenate(([initial_balance], balance)))[1:]
+    drawdown = peak - balance
+    wins, losses = profit[profit > 0], profit[profit < 0]
+    return {
+        "trades": int(len(profit)),
+        "buys": int((trades["direction"] == 1).sum()),
+        "sells": int((trades["direction"] == -1).sum()),
+        "win_rate": float(len(wins) / len(profit)) if len(profit) else 0.0,
+        "net_profit": float(profit.sum()),
+        "profit_factor": float(wins.sum() / -losses.sum()) if len(losses) else float("inf") if len(wins) else 0.0,
+        "avg_trade": float(profit.mean()) if len(profit) else 0.0,
+        "max_drawdown": float(drawdown.max()) if len(profit) else 0.0,
+        "max_drawdown_pct": float((drawdown / peak).max() * 100) if len(profit) else 0.0,
+        "tp_exits": int((trades["reason"] == EXIT_TP).sum()),
+        "sl_exits": int((trades["reason"] == EXIT_SL).sum()),
+        "open_at_end": int((trades["reason"] == EXIT_OPEN).sum()),
+        "avg_bars_held": float((trades["exit_bar"] - trades["entry_bar"] + 1).mean()) if len(profit) else 0.0,
+        "final_balance": float(balance[-1]) if len(profit) else initial_balance,
+    }
+
+
+def _candidate_entries(proba: np.ndarray, atr_values: np.ndarray, min_threshold: float) -> tuple:
+    """Entry bars, directions, confidences and ATR of every bar whose signal passes ``min_threshold``."""
+    signal_bar = np.arange(len(proba) - 1)
+    p = proba[:-1]
+    confidence = np.maximum(p, 1.0 - p)
+    a = atr_values[:-1]
+    ok = np.isfinite(p) & np.isfinite(a) & (a > 0) & (confidence > min_threshold)
+    bars = signal_bar[ok]
+    directions = np.where(p[ok] > 0.5, 1, -1).astype(np.int8)
+    return bars + 1, directions, confidence[ok], a[ok]
+
+
+def _taken_trades(resolved: dict, entries, directions, confidence, threshold, lotsize, contract_size) -> dict:
+    keep = np.flatnonzero(confidence > threshold)
+    taken = keep[chain_trades(entries[keep], resolved["exit_bar"][keep])]
+    direction = directions[taken]
+    profit = (resolved["exit_price"][taken] - resolved["entry_price"][taken]) * direction * lotsize * contract_size
+    return {"entry_bar": entries[taken], "exit_bar": resolved["exit_bar"][taken], "direction": direction,
+            "entry_price": resolved["entry_price"][taken], "exit_price": resolved["exit_price"][taken],
+            "reason": resolved["reason"][taken], "profit": profit}
+
+
+def simulate(bars, proba: np.ndarray, confidence_threshold: float = 0.55, tp_multiplier: float = 1.5,
+             sl_multiplier: float = 1.0, atr_period: int = 14, max_positions: int = 1, lotsize: float = 0.1,
+             spread: float = 0.0, contract_size: float = CONTRACT_SIZE, initial_balance: float = 10_000.0,
+             max_hold: int = None) -> tuple:
+    """
+    Simulate the EA with one set of inputs.
+
+    Args:
+        bars: DataFrame with ``<OPEN> <HIGH> <LOW> <CLOSE>`` or a dict of ``open/high/low/close``.
+        proba (np.ndarray): ``P(up)`` per bar from that bar's features (see :func:`signal_probabilities`).
+        max_positions (int): Accepted for parity with the EA inputs; see the module docstring.
+        spread (float): Ask - bid, in price units.
+        contract_size (float): Units per lot (P&L = price move * lotsize * contract_size).
+
+    Returns:
+        tuple: ``(trades, stats)`` - a dict of per-trade arrays and :func:`trade_statistics`.
+    """
+    open_, high, low, close = _price_arrays(bars)
+    atr_values = atr(high, low, close, atr_period)
+    entries, directions, confidence, entry_atr = _candidate_entries(proba, atr_values, confidence_threshold)
+    resolved = resolve_exits(open_, high, low, close, entries, directions, entry_atr,
+                             tp_multiplier, sl_multiplier, spread, max_hold)
+    trades = _taken_trades(resolved, entries, directions, confidence, confidence_threshold, lotsize, contract_size)
+    return trades, trade_statistics(trades, initial_balance)
+
+
+def equity_curve(trades: dict, n_bars: int, initial_balance: float = 10_000.0) -> np.ndarray:
+    """Closed-trade balance at the end of every bar."""
+    realized = np.zeros(n_bars)
+    np.add.at(realized, trades["exit_bar"], trades["profit"])
+    return initial_balance + np.cumsum(realized)
+
+
+def _price_arrays(bars) -> tuple:
+    if isinstance(bars, pd.DataFrame):
+        return tuple(bars[name].to_numpy(dtype=np.float64) for name in ("<OPEN>", "<HIGH>", "<LOW>", "<CLOSE>"))
+    return tuple(np.asarray(bars[name], dtype=np.float64) for name in ("open", "high", "low", "close"))
+
+
+# -----------------------------------------------------------------------------------------
+#  Parallel parameter sweep
+# -----------------------------------------------------------------------------------------
+
+def _run_group(task: tuple) -> list:
+    """Worker task: every threshold of one ``(atr_period, tp, sl)`` group."""
+    atr_period, tp_multiplier, sl_multiplier, thresholds, settings = task
+    state = worker_state()
+    open_, high, low, close = (state[name] for name in ("open", "high", "low", "close"))
+    proba, atr_values = state["proba"], state[f"atr_{atr_period}"]
+
+    entries, directions, confidence, entry_atr = _candidate_entries(proba, atr_values, min(thresholds))
+    resolved = resolve_exits(open_, high, low, close, entries, directions, entry_atr, tp_multiplier,
+                             sl_multiplier, settings["spread"], settings["max_hold"])
+
+    results = []
+    for threshold in thresholds:
+        trades = _taken_trades(resolved, entries, directions, confidence, threshold,
+                               settings["lotsize"], settings["contract_size"])
+        params = {"confidence_threshold": threshold, "tp_multiplier": tp_multiplier,
+                  "sl_multiplier": sl_multiplier, "atr_period": atr_period}
+        stats = trade_statistics(trades, settings["initial_balance"])
+        results.append((params, stats, trades if settings["keep_trades"] else None))
+    return results
+
+
+def parameter_sweep(bars, proba: np.ndarray, grid: dict = None, lotsize: float = 0.1, spread: float = 0.0,
+                    contract_size: float = CONTRACT_SIZE, initial_balance: float = 10_000.0,
+                    max_hold: int = None, n_jobs: int = None, keep_trades: bool = False) -> tuple:
+    """
+    Simulate every combination of EA inputs in ``grid`` on a process pool.
+
+    Prices, probabilities and one ATR series per ``atr_period`` are computed once and placed
+    in shared memory; each task covers all thresholds of one ``(atr_period, tp, sl)`` group.
+
+    Args:
+        bars, proba: As :func:`simulate`.
+        grid (dict): Lists of ``confidence_threshold``, ``tp_multiplier``, ``sl_multiplier``
+            and ``atr_period`` values (default ``DEFAULT_GRID``).
+        n_jobs (int): Worker processes (default: all cores).
+        keep_trades (bool): Also return the trade list of every combination
+            (use :func:`equity_curve` to turn one into a curve).
+
+    Returns:
+        tuple: ``(results, trades)`` - a DataFrame with one row of parameters and statistics
+        per combination, sorted by net profit, and a list of trade dicts aligned with the
+        DataFrame's ``combo`` column (None unless ``keep_trades``).
+    """
+    grid = {**DEFAULT_GRID, **(grid or {})}
+    open_, high, low, close = _price_arrays(bars)
+    proba = np.asarray(proba, dtype=np.float64)
+
+    arrays = {"open": open_, "high": high, "low": low, "close": close, "proba": proba}
+    for period in grid["atr_period"]:
+        arrays[f"atr_{period}"] = atr(high, low, close, period)
+
+    settings = {"lotsize": lotsize, "spread": spread, "contract_size": contract_size,
+                "initial_balance": initial_balance, "max_hold": max_hold, "keep_trades": keep_trades}
+    thresholds = sorted(grid["confidence_threshold"])
+    tasks = [(period, tp, sl, thresholds, settings) for period, tp, sl in
+             itertools.product(grid["atr_period"], grid["tp_multiplier"], grid["sl_multiplier"])]
+
+    n_jobs = n_jobs or os.cpu_count() or 1
+    rows, all_trades = [], []
+    with SharedArrays(**arrays) as shared:
+        spec = {"arrays": shared.spec, "model": None, "threshold": None}
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks)), initializer=attach_shared,
+                                 initargs=(spec,)) as pool:
+            for group in pool.map(_run_group, tasks, chunksize=max(1, len(tasks) // (n_jobs * 4))):
+                for params, stats, trades in group:
+                    rows.append({"combo": len(rows), **params, **stats})
+                    all_trades.append(trades)
+
+    results = pd.DataFrame(rows).sort_values("net_profit", ascending=False).reset_index(drop=True)
+    return results, (all_trades if keep_trades else None)
+
+
+if __name__ == "__main__":
+    import argparse
+    import pickle
+
+    from bar_store import load_bars
+
+    parser = argparse.ArgumentParser(description="Sweep the EA's inputs on historical bars")
+    parser.add_argument("path", nargs="?", default="XAUUSDm_H1_201801020600_202412310000.csv",
+                        help="MT5 CSV export or bar store directory")
+    parser.add_argument("--model", default="xauusd_optimized_model.onnx",
+                        help="ONNX model or pickled sklearn model producing the signals")
+    parser.add_argument("--spread", type=float, default=0.0, help="Ask - bid in price units")
+    parser.add_argument("--jobs", type=int, default=None)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--out", default="trade_sweep.csv")
+    args = parser.parse_args()
+
+    bars = load_bars(args.path)
+    if args.model.endswith(".onnx"):
+        model = args.model
+    else:
+        with open(args.model, "rb") as f:
+            model = pickle.load(f)
+    proba = signal_probabilities(model, bars)
+    print("⚠️  Signals come from a model fitted on this history unless the bars are out-of-sample")
+
+    n_combos = int(np.prod([len(v) for v in DEFAULT_GRID.values()]))
+    print(f"🔄 Simulating {n_combos:,} input combinations on {len(bars):,} bars")
+    started = time.perf_counter()
+    results, _ = parameter_sweep(bars, proba, spread=args.spread, n_jobs=args.jobs)
+    elapsed = time.perf_counter() - started
+    print(f"✅ {len(results):,} combinations in {elapsed:.1f}s ({len(results) / elapsed:,.0f}/s)")
+
+    default = results[(results["confidence_threshold"] == EA_INPUTS["confidence_threshold"])
+                      & (results["tp_multiplier"] == EA_INPUTS["tp_multiplier"])
+                      & (results["sl_multiplier"] == EA_INPUTS["sl_multiplier"])
+                      & (results["atr_period"] == EA_INPUTS["atr_period"])]
+    if len(default):
+        print(f"📌 EA defaults: net {default['net_profit'].iloc[0]:,.2f}, "
+              f"{default['trades'].iloc[0]} trades, max DD {default['max_drawdown_pct'].iloc[0]:.1f}%")
+    print(results.head(args.top).to_string(index=False))
+    results.to_csv(args.out, index=False)
+    print(f"📝 Saved results to: {args.out}")
@@ -0,0 +1,363 @@
+"""
+Nightly multi-symbol / multi-timeframe training pipeline.
+
+A JSON manifest lists the datasets; every job runs
+
+    load -> features -> walk-forward -> final fit -> ONNX export
+
+in its own process and writes an artifact directory:
+
+    artifacts/
+        summary.csv                 # one row per job
+        XAUUSDm_H1/
+            model.onnx              # final model (plain probability tensor, MT5-friendly)
+            feature_names.txt       # same layout as optimized_feature_names.txt
+            walk_forward.csv        # <TRGT> / Predictions per tested row
+            metrics.json            # status, precision, rows, per-stage timings
+            error.txt               # traceback, if the job failed
+
+Manifest::
+
+    {
+      "defaults": {"cores": 2, "timeout": 3600, "memory_mb": 8192,
+                   "model": {"n_estimators": 200, "max_depth": 15, "min_samples_split": 25,
+                             "min_samples_leaf": 10, "max_features": 0.8}},
+      "jobs": [
+        {"symbol": "XAUUSDm", "timeframe": "H1", "path": "XAUUSDm_H1_201801020600_202412310000.csv"},
+        {"symbol": "EURUSDm", "timeframe": "M15"}
+      ]
+    }
+
+``path`` defaults to the ``history_sync`` bar store of the symbol/timeframe. Jobs are started
+largest dataset first, up to ``cpu_count // cores`` at a time; each one gets ``cores`` CPU
+threads, an optional address-space limit (``memory_mb``, POSIX only) and a wall-clock
+``timeout`` after which it is killed, so one slow symbol cannot hold up the others. On POSIX
+every job runs in its own process group, so a kill also takes down the job's worker pool.
+"""
+
+import json
+import multiprocessing
+import os
+import signal
+import time
+import traceback
+from contextlib import contextmanager
+
+import pandas as pd
+
+from model_registry import write_json_atomic
+
+DEFAULT_OUT_DIR = "artifacts"
+
+# The notebook's optimized_model
+DEFAULT_MODEL_PARAMS = {
+    "n_estimators": 200,
+    "min_samples_split": 25,
+    "max_depth": 15,
+    "min_samples_leaf": 10,
+    "max_features": 0.8,
+    "random_state": 1,
+}
+
+DEFAULT_JOB = {
+    "start": 2500,
+    "step": 250,
+    "threshold": None,
+    "cores": 1,
+    "timeout": 6 * 3600,
+    "memory_mb": None,
+    "zipmap": False,
+    "target_opset": 11,
+    "history_root": "history",
+    "cache_dir": None,
+}
+
+
+def load_manifest(path: str) -> list:
+    """Read a manifest and return fully populated job dicts (defaults merged, names and paths filled)."""
+    with open(path, "r") as file:
+        manifest = json.load(file)
+
+    defaults = {**DEFAULT_JOB, **manifest.get("defaults", {})}
+    jobs = []
+    for entry in manifest["jobs"]:
+        job = {**defaults, **entry}
+        job["model"] = {**DEFAULT_MODEL_PARAMS, **defaults.get("model", {}), **entry.get("model", {})}
+        job.setdefault("name", f"{job['symbol']}_{job['timeframe']}")
+        if not job.get("path"):
+            from history_sync import store_path
+
+            job["path"] = store_path(job["history_root"], job["symbol"], job["timeframe"])
+        jobs.append(job)
+
+    names = [job["name"] for job in jobs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate job names in manifest: {duplicates}")
+    return jobs
+
+
+def write_feature_names(path: str, predictors: list, symbol: str, precision: float) -> None:
+    """Write the feature list in the notebook's ``optimized_feature_names.txt`` layout."""
+    with open(path, "w") as file:
+        file.write(f"# Features for {symbol} ML Model\n")
+        file.write(f"# Model precision: {precision:.4f}\n")
+        file.write(f"# Total features: {len(predictors)}\n\n")
+        for i, feature in enumerate(predictors):
+            file.write(f"{i}: {feature}\n")
+
+
+THREAD_VARIABLES = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+
+@contextmanager
+def _thread_limits(cores: int):
+    """
+    Set the BLAS/OpenMP thread variables in this process while a job process is started.
+
+    They must be in the environment the child inherits: the pools are sized when numpy is
+    first imported, which in the spawned child happens before any job code runs.
+    """
+    saved = {variable: os.environ.get(variable) for variable in THREAD_VARIABLES}
+    os.environ.update({variable: str(cores) for variable in THREAD_VARIABLES})
+    try:
+        yield
+    finally:
+        for variable, value in saved.items():
+            if value is None:
+                os.environ.pop(variable, None)
+            else:
+                os.environ[variable] = value
+
+
+def _kill_job(process) -> None:
+    """Kill a job process together with its process group (its worker pool)."""
+    if hasattr(os, "killpg"):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass        # not (yet) a group leader
+    process.kill()
+    process.join()
+
+
+def _apply_limits(job: dict) -> None:
+    """Restrict the current (job) process: own process group and, where supported, address space."""
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()
+    if job.get("memory_mb"):
+        try:
+            import resource
+            limit = int(job["memory_mb"]) * 1024 ** 2
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            pass
+
+
+def run_job(job: dict, out_dir: str) -> dict:
+    """
+    Run one job in the current process and write its artifacts.
+
+    Returns:
+        dict: The job's metrics (also written to ``metrics.json``).
+    """
+    import numpy as np
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.metrics import precision_score
+
+    from bar_store import load_bars
+    from experiment_cache import make_key
+    from feature_engine import FEATURE_NAMES, TARGET, feature_frame
+    from onnx_export import export_forest
+    from onnx_utils import make_session, probabilities
+    from profiling import Profiler
+
+    job_dir = os.path.join(out_dir, job["name"])
+    os.makedirs(job_dir, exist_ok=True)
+    profiler = Profiler()
+    metrics = {"name": job["name"], "symbol": job["symbol"], "timeframe": job["timeframe"],
+               "path": job["path"], "status": "running", "started": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+    with profiler.stage("load") as record:
+        bars = load_bars(job["path"])
+        record["items"] = len(bars)
+    with profiler.stage("features", items=len(bars)):
+        data = feature_frame(bars)
+    metrics.update({"bars": len(bars), "rows": len(data)})
+
+    model = RandomForestClassifier(**{**job["model"], "n_jobs": job["cores"]})
+    with profiler.stage("walk_forward") as record:
+        if job.get("cache_dir"):
+            from experiment_cache import ExperimentCache, cached_backtestor
+
+            cache = ExperimentCache(job["cache_dir"])
+            predictions = cached_backtestor(cache, data, model, FEATURE_NAMES, job["start"], job["step"],
+                                            job["threshold"])
+            metrics["cache_hits"] = cache.hits
+            cache.close()
+        else:
+            from backtest import parallel_backtestor
+
+            predictions = parallel_backtestor(data, model, FEATURE_NAMES, job["start"], job["step"],
+                                              n_jobs=job["cores"], threshold=job["threshold"])
+        record["items"] = len(predictions)
+    predictions.to_csv(os.path.join(job_dir, "walk_forward.csv"))
+    metrics["tested_rows"] = len(predictions)
+    metrics["precision"] = float(precision_score(predictions[TARGET], predictions["Predictions"], zero_division=0))
+    metrics["predicted_positive_rate"] = float(predictions["Predictions"].mean())
+
+    X = data[FEATURE_NAMES].to_numpy(dtype=np.float32)
+    metrics["data_hash"] = make_key(X, data[TARGET].to_numpy())
+    metrics["model"] = job["model"]
+    with profiler.stage("final_fit", items=len(X)):
+        model.fit(X, data[TARGET].to_numpy())
+
+    with profiler.stage("onnx_export"):
+        proto = export_forest(model, len(FEATURE_NAMES), zipmap=job["zipmap"], target_opset=job["target_opset"])
+        payload = proto.SerializeToString()
+        with open(os.path.join(job_dir, "model.onnx"), "wb") as file:
+            file.write(payload)
+        check = X[-min(len(X), 1000):]
+        session = make_session(payload)
+        onnx_proba = probabilities(session.run(None, {session.get_inputs()[0].name: check}))
+        metrics["onnx_max_abs_diff"] = float(np.abs(onnx_proba - model.predict_proba(check)).max())
+    metrics["onnx_kb"] = len(payload) / 1024
+    write_feature_names(os.path.join(job_dir, "feature_names.txt"), FEATURE_NAMES, job["symbol"],
+                        metrics["precision"])
+
+    metrics["stages"] = {record["stage"]: record["wall_s"] for record in profiler.records}
+    metrics["peak_rss_mb"] = max((record["rss_peak_mb"] or 0) for record in profiler.records)
+    metrics["status"] = "ok"
+    write_json_atomic(os.path.join(job_dir, "metrics.json"), metrics)
+    return metrics
+
+
+def _job_process(job: dict, out_dir: str) -> None:
+    """Child-process entry point: apply limits, run, record failures."""
+    _apply_limits(job)
+    try:
+        run_job(job, out_dir)
+    except BaseException as error:
+        job_dir = os.path.join(out_dir, job["name"])
+        os.makedirs(job_dir, exist_ok=True)
+        with open(os.path.join(job_dir, "error.txt"), "w") as file:
+            file.write(traceback.format_exc())
+        status = "out_of_memory" if isinstance(error, MemoryError) else "failed"
+        write_json_atomic(os.path.join(job_dir, "metrics.json"),
+                    {"name": job["name"], "symbol": job["symbol"], "timeframe": job["timeframe"],
+                     "status": status, "error": f"{type(error).__name__}: {error}"})
+        raise SystemExit(1)
+
+
+def _dataset_size(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def run_pipeline(jobs: list, out_dir: str = DEFAULT_OUT_DIR, max_cores: int = None, poll: float = 0.2,
+                 verbose: bool = True) -> pd.DataFrame:
+    """
+    Run every job in its own process within a core budget and collect a summary.
+
+    Args:
+        jobs (list): Job dicts from :func:`load_manifest`.
+        out_dir (str): Artifact root.
+        max_cores (int): Total cores shared by concurrent jobs (default: all).
+        poll (float): Seconds between scheduler checks.
+
+    Returns:
+        pd.DataFrame: One row per job (also written to ``summary.csv``).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    max_cores = max_cores or os.cpu_count() or 1
+    context = multiprocessing.get_context("spawn")
+
+    pending = sorted(jobs, key=lambda job: _dataset_size(job["path"]), reverse=True)
+    running = {}            # name -> (process, job, started)
+    finished = {}
+    started_all = time.perf_counter()
+
+    # Jobs run in their own process groups and do not see Ctrl-C: take them down on the way out
+    try:
+        while pending or running:
+            # Start jobs while the core budget allows (always allow one, even if it asks for more)
+            used = sum(job["cores"] for _, job, _ in running.values())
+            while pending and (not running or used + pending[0]["cores"] <= max_cores):
+                job = pending.pop(0)
+                metrics_path = os.path.join(out_dir, job["name"], "metrics.json")
+                if os.path.exists(metrics_path):
+                    os.remove(metrics_path)
+                process = context.Process(target=_job_process, args=(job, out_dir), name=job["name"])
+                with _thread_limits(job["cores"]):
+                    process.start()
+                running[job["name"]] = (process, job, time.perf_counter())
+                used += job["cores"]
+                if verbose:
+                    print(f"🚀 Started {job['name']} ({job['cores']} cores)")
+
+            time.sleep(poll)
+            for name, (process, job, started) in list(running.items()):
+                elapsed = time.perf_counter() - started
+                if process.is_alive() and elapsed > job["timeout"]:
+                    _kill_job(process)
+                    finished[name] = {"status": "timeout", "error": f"killed after {job['timeout']}s"}
+                elif not process.is_alive():
+                    process.join()
+                    finished[name] = {}
+                else:
+                    continue
+                del running[name]
+
+                metrics_path = os.path.join(out_dir, name, "metrics.json")
+                metrics = {}
+                if os.path.exists(metrics_path) and "status" not in finished[name]:
+                    with open(metrics_path, "r") as file:
+                        metrics = json.load(file)
+                elif "status" not in finished[name]:
+                    # Killed without a word (e.g. by the OOM killer)
+                    metrics = {"status": "crashed", "error": f"exit code {process.exitcode}"}
+                finished[name] = {"name": name, "symbol": job["symbol"], "timeframe": job["timeframe"],
+                                  **finished[name], **metrics, "seconds": elapsed}
+                if verbose:
+                    icon = "✅" if finished[name]["status"] == "ok" else "❌"
+                    print(f"{icon} {name}: {finished[name]['status']} in {elapsed:.1f}s")
+    except BaseException:
+        for process, _, _ in running.values():
+            _kill_job(process)
+        raise
+
+    rows = []
+    for job in jobs:
+        result = finished[job["name"]]
+        row = {key: result.get(key) for key in ("name", "symbol", "timeframe", "status", "bars", "rows",
+                                                "tested_rows", "precision", "onnx_kb", "onnx_max_abs_diff",
+                                                "peak_rss_mb", "seconds", "error")}
+        for stage, seconds in result.get("stages", {}).items():
+            row[f"{stage}_s"] = seconds
+        rows.append(row)
+    summary = pd.DataFrame(rows)
+    summary.attrs["wall_seconds"] = time.perf_counter() - started_all
+    summary.to_csv(os.path.join(out_dir, "summary.csv"), index=False)
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train and export models for every dataset in a manifest")
+    parser.add_argument("manifest", help="JSON manifest of symbol/timeframe datasets")
+    parser.add_argument("--out-dir", default=DEFAULT_OUT_DIR)
+    parser.add_argument("--max-cores", type=int, default=None, help="Core budget shared by concurrent jobs")
+    parser.add_argument("--only", nargs="+", default=None, help="Run only these job names")
+    args = parser.parse_args()
+
+    jobs = load_manifest(args.manifest)
+    if args.only:
+        jobs = [job for job in jobs if job["name"] in args.only]
+    print(f"📋 {len(jobs)} jobs -> {args.out_dir}")
+    summary = run_pipeline(jobs, args.out_dir, args.max_cores)
+    print(summary.to_string(index=False))
+    print(f"⏱️  Total: {summary.attrs['wall_seconds']:.1f}s")
+    if (summary["status"] != "ok").any():
+        raise SystemExit(1)
@@ -2,6 +2,13 @@ import onnx
 import onnxruntime as ort
 import numpy as np
 import os
+import sys
+import json
+import time
+import hashlib
+import platform
+
+DEFAULT_BATCH_SIZES = [1, 4, 16, 64, 256, 1024, 4096]
 
 def verify_onnx_model(model_path):
     """Verify ONNX model compatibility with MetaTrader 5"""
@@ -139,7 +146,156 @@ def create_mt5_compatible_model(input_model_path, output_model_path):
         print(f"❌ Error converting model: {str(e)}")
         return False
 
+def load_feature_rows(data_path):
+    """Real 19-feature rows from an MT5 CSV export (or bar store) via the notebook's feature definitions"""
+    from bar_store import load_bars
+    from feature_engine import build_dataset
+
+    X, y, _ = build_dataset(load_bars(data_path))
+    return X, y
+
+def benchmark_onnx_model(model_path, X, sklearn_model=None, batch_sizes=None, min_runs=20, min_seconds=0.5, load_runs=5):
+    """Replay real feature rows through the model and measure load time, latency, throughput, RSS and parity"""
+    
+    from onnx_utils import probabilities
+    from profiling import peak_rss_mb
+    
+    batch_sizes = batch_sizes or DEFAULT_BATCH_SIZES
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    
+    with open(model_path, 'rb') as f:
+        payload = f.read()
+    model = onnx.load_from_string(payload)
+    
+    result = {
+        "model": os.path.abspath(model_path),
+        "sha256": hashlib.sha256(payload).hexdigest(),
+        "size_bytes": len(payload),
+        "opsets": {opset.domain or "ai.onnx": opset.version for opset in model.opset_import},
+        "mt5_opset_ok": all(opset.version <= 14 for opset in model.opset_import if opset.domain in ("", "ai.onnx")),
+        "rows": int(len(X)),
+        "environment": {"python": platform.python_version(), "onnxruntime": ort.__version__,
+                        "onnx": onnx.__version__, "platform": platform.platform()},
+    }
+    
+    # Load time (fresh session each time)
+    load_times = []
+    for _ in range(load_runs):
+        started = time.perf_counter()
+        session = ort.InferenceSession(payload, providers=["CPUExecutionProvider"])
+        load_times.append(time.perf_counter() - started)
+    result["load_ms"] = {"median": float(np.median(load_times) * 1000), "min": float(np.min(load_times) * 1000)}
+    
+    input_name = session.get_inputs()[0].name
+    
+    # Latency per batch size, cycling through the real rows
+    result["batches"] = []
+    for batch_size in batch_sizes:
+        if batch_size > len(X):
+            continue
+        latencies = []
+        offset = 0
+        started_all = time.perf_counter()
+        while len(latencies) < min_runs or time.perf_counter() - started_all < min_seconds:
+            if offset + batch_size > len(X):
+                offset = 0
+            batch = X[offset:offset + batch_size]
+            offset += batch_size
+            started = time.perf_counter()
+            session.run(None, {input_name: batch})
+            latencies.append(time.perf_counter() - started)
+        latencies = np.array(latencies) * 1000
+        result["batches"].append({
+            "batch_size": batch_size,
+            "runs": int(len(latencies)),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p90_ms": float(np.percentile(latencies, 90)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "mean_ms": float(latencies.mean()),
+            "rows_per_second": float(batch_size / (latencies.mean() / 1000)),
+        })
+    
+    # Parity against sklearn on every row
+    if sklearn_model is not None:
+        outputs = [session.run(None, {input_name: X[i:i + 4096]}) for i in range(0, len(X), 4096)]
+        onnx_proba = np.concatenate([probabilities(out) for out in outputs])
+        onnx_labels = np.concatenate([np.asarray(out[0]).reshape(-1) for out in outputs])
+        sk_proba = sklearn_model.predict_proba(X)
+        sk_labels = sklearn_model.predict(X)
+        deviation = np.abs(onnx_proba - sk_proba)
+        result["parity"] = {
+            "class_agreement": float((onnx_labels == sk_labels).mean()),
+            "class_mismatches": int((onnx_labels != sk_labels).sum()),
+            "max_abs_proba_diff": float(deviation.max()),
+            "mean_abs_proba_diff": float(deviation.mean()),
+        }
+    
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+def print_benchmark(result):
+    """Human-readable summary of a benchmark_onnx_model result"""
+    print(f"\n📊 Benchmark: {os.path.basename(result['model'])} ({result['size_bytes'] / 1024:.1f} KB)")
+    print(f"🎯 Opsets: {result['opsets']} {'✅' if result['mt5_opset_ok'] else '⚠️  opset > 14'}")
+    print(f"📥 Load time: {result['load_ms']['median']:.2f} ms (min {result['load_ms']['min']:.2f} ms)")
+    print(f"{'batch':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'rows/s':>13}")
+    for row in result["batches"]:
+        print(f"{row['batch_size']:>7} {row['p50_ms']:>9.3f} {row['p90_ms']:>9.3f} {row['p99_ms']:>9.3f} {row['rows_per_second']:>13,.0f}")
+    if "parity" in result:
+        parity = result["parity"]
+        status = "✅" if parity["class_mismatches"] == 0 else "⚠️ "
+        print(f"{status} Parity: class agreement {parity['class_agreement']:.4%}, max |Δp| {parity['max_abs_proba_diff']:.2e}")
+    if result["peak_rss_mb"] is not None:
+        print(f"💾 Peak RSS: {result['peak_rss_mb']:.1f} MB")
+
+def run_benchmark_cli(argv):
+    """Benchmark/validation mode: python verify_onnx_model.py --benchmark MODEL [options]"""
+    import argparse
+    import pickle
+    
+    parser = argparse.ArgumentParser(description="Benchmark and validate ONNX models on real feature rows")
+    parser.add_argument("--benchmark", nargs="+", required=True, metavar="MODEL", help="ONNX model(s) to benchmark")
+    parser.add_argument("--data", default="XAUUSDm_H1_201801020600_202412310000.csv",
+                        help="MT5 CSV export or bar store directory used to build real feature rows")
+    parser.add_argument("--sklearn-model", default=None, help="Pickled sklearn model for class/probability parity")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=DEFAULT_BATCH_SIZES)
+    parser.add_argument("--mt5-compatible", action="store_true",
+                        help="Also benchmark the create_mt5_compatible_model conversion of each model")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+    
+    print(f"📥 Building real feature rows from: {args.data}")
+    X, _ = load_feature_rows(args.data)
+    
+    sklearn_model = None
+    if args.sklearn_model:
+        with open(args.sklearn_model, 'rb') as f:
+            sklearn_model = pickle.load(f)
+    
+    model_paths = list(args.benchmark)
+    if args.mt5_compatible:
+        for path in list(model_paths):
+            converted = f"{os.path.splitext(path)[0]}_mt5_compatible.onnx"
+            if create_mt5_compatible_model(path, converted):
+                model_paths.append(converted)
+    
+    results = []
+    for path in model_paths:
+        result = benchmark_onnx_model(path, X, sklearn_model=sklearn_model, batch_sizes=args.batch_sizes)
+        print_benchmark(result)
+        results.append(result)
+    
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"data": os.path.abspath(args.data), "results": results}, f, indent=2)
+        print(f"\n📝 JSON results saved to: {args.json}")
+    return results
+
 if __name__ == "__main__":
+    if "--benchmark" in sys.argv:
+        run_benchmark_cli(sys.argv[1:])
+        sys.exit(0)
+    
     # Check current directory for ONNX files
     current_dir = os.getcwd()
     onnx_files = [f for f in os.listdir(current_dir) if f.endswith('.onnx')]